@@ -10,15 +10,115 @@ DB_CONFIG = {
     'user': os.getenv('DB_USER'),
     'password': os.getenv('DB_PASSWORD'),
     'target_session_attrs': 'read-write',
+    'pool': {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        'health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30')),
+    },
     # 'sslmode': 'verify-full',
     # 'sslrootcert': 'root.crt'
 }
 
+# How async code reaches the database: 'threads' runs the psycopg2 pool on a
+# bounded thread pool, 'native' uses a separate psycopg 3 async pool
+DB_ASYNC_MODE = os.getenv('DB_ASYNC_MODE', 'threads')
+
 BOT_TOKEN = os.getenv('BOT_TOKEN')
+# Bot API endpoint; point it at scripts/webhook_harness.py to measure latency locally
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', 'https://api.telegram.org/bot')
+
+# How updates arrive: 'polling' (getUpdates) or 'webhook'. Webhook mode listens on
+# WEBHOOK_LISTEN:WEBHOOK_PORT/WEBHOOK_PATH behind the public WEBHOOK_URL and falls
+# back to polling when it is not configured or cannot start.
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # public base URL, e.g. https://bot.example.com
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
 ADMIN_USER_IDS = list(map(int, os.getenv('ADMIN_USER_IDS', '').split(',')))
 GROUP_CHAT_ID = os.getenv('GROUP_CHAT_ID')
 
+# Updates of different users are handled in parallel, at most UPDATE_CONCURRENCY
+# at a time; one user's updates always run one after another, in order
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '8'))
+UPDATE_MAX_PENDING = 256
+
+# Seconds a cached baby row stays valid (other instances' edits show up after this)
+BABY_CACHE_TTL = 300
+
+# In-memory LRU in front of user_states (conversation state)
+USER_STATE_CACHE_SIZE = 1000
+USER_STATE_CACHE_TTL = 600
+
+# PTB persistence (user_data etc.): staged in memory, written every
+# PERSISTENCE_UPDATE_INTERVAL seconds in one batch and on shutdown
+PERSISTENCE_UPDATE_INTERVAL = int(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '30'))
+PERSISTENCE_FLUSH_DELAY = 1.0
+
+# Group notifications go through the notification_outbox table and a background
+# sender. Telegram allows ~1 message/s per chat and 20 messages/min per group.
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_POLL_INTERVAL = 5
+OUTBOX_RETRY_BASE_SECONDS = 5
+OUTBOX_RETRY_MAX_SECONDS = 600
+OUTBOX_DRAIN_TIMEOUT = 10
+CHAT_MIN_SEND_INTERVAL = 1.0
+GROUP_MAX_MESSAGES_PER_MINUTE = 20
+# Notifications for the same chat and baby queued within this many seconds are
+# sent as one message; each one waits this long before it can go out (0 disables)
+NOTIFICATION_COALESCE_SECONDS = int(os.getenv('NOTIFICATION_COALESCE_SECONDS', '10'))
+
+# Optional pinned per-baby status message in the group, edited in place
+STATUS_MESSAGE_ENABLED = os.getenv('STATUS_MESSAGE_ENABLED', '0') == '1'
+STATUS_MESSAGE_PIN = True
+STATUS_UPDATE_INTERVAL = 60
+STATUS_MAX_EDITS_PER_MINUTE = 3
+
 FEEDING_INTERVAL_HOURS = 3
 REMINDER_MINUTES_BEFORE = 30
 
-TIMEZONE = 'Europe/Moscow'
\ No newline at end of file
+# Due reminders are claimed in batches; failed sends are retried with
+# exponential backoff (base * 2^(attempt-1), capped) up to REMINDER_MAX_ATTEMPTS
+REMINDER_CLAIM_BATCH = 100
+REMINDER_MAX_ATTEMPTS = 5
+REMINDER_RETRY_BASE_SECONDS = 30
+REMINDER_RETRY_MAX_SECONDS = 900
+# A claimed reminder is leased for this long; if its worker dies before sending
+# it, another claim picks it up once the lease has passed
+REMINDER_LEASE_SECONDS = 300
+# With leader election, the leader also sweeps for due unsent reminders this
+# often, so reminders whose run_once job died with another instance are still sent
+REMINDER_SWEEP_INTERVAL = 15 * 60
+
+TIMEZONE = 'Europe/Moscow'
+
+# Only one running instance (the holder of this advisory lock) runs scheduled
+# jobs; standbys check every LEADER_CHECK_INTERVAL seconds and take over. Off
+# by default, for a single instance. The lock is session-level, so it is held
+# on its own connection straight to Postgres (LEADER_DB_HOST/PORT), not
+# through the pgbouncer on DB_PORT.
+LEADER_ELECTION_ENABLED = os.getenv('LEADER_ELECTION_ENABLED', '0') == '1'
+LEADER_DB_HOST = os.getenv('LEADER_DB_HOST', DB_CONFIG['host'])
+LEADER_DB_PORT = os.getenv('LEADER_DB_PORT', '5432')
+LEADER_LOCK_KEY = 4201002
+LEADER_CHECK_INTERVAL = 5
+
+# Count the partial days of a stats period in Postgres (one aggregate row)
+# instead of fetching their events and sessions and counting in Python
+STATS_AGGREGATE_IN_SQL = os.getenv('STATS_AGGREGATE_IN_SQL', '1') == '1'
+# Keep the last day of history in memory for the today / 24h stats, reloaded
+# from the database every STATS_CACHE_RECONCILE_INTERVAL seconds
+STATS_CACHE_ENABLED = os.getenv('STATS_CACHE_ENABLED', '1') == '1'
+STATS_CACHE_RECONCILE_INTERVAL = int(os.getenv('STATS_CACHE_RECONCILE_INTERVAL', '300'))
+
+# Monthly partitions of the events table
+EVENTS_PARTITIONS_AHEAD = 3
+# Detach and archive partitions older than this many months (0 keeps everything)
+EVENTS_RETENTION_MONTHS = int(os.getenv('EVENTS_RETENTION_MONTHS', '0'))
+EVENTS_ARCHIVE_DIR = os.getenv('EVENTS_ARCHIVE_DIR', 'archive')
\ No newline at end of file
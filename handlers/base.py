@@ -2,6 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from models.baby import Baby
 from models.user import UserState
+from utils import callback_data as cb
 from utils.keyboards import main_menu_keyboard, gender_selection_keyboard, time_selection_keyboard
 import logging
 
@@ -18,14 +19,42 @@ class BaseHandler:
             await update.message.reply_text("❌ У вас нет доступа к этому боту.")
             return
 
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
         if not baby:
-            UserState.set_state(user.id, "awaiting_baby_name")
+            await UserState.set_state_async(user.id, "awaiting_baby_name")
             await update.message.reply_text("👶 Привет! Давайте добавим ребенка. Введите имя:")
             return
 
         await BaseHandler.show_main_menu(update, context)
 
+    @staticmethod
+    async def db_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        from config import ADMIN_USER_IDS, DB_ASYNC_MODE, OUTBOX_MAX_ATTEMPTS
+        from services.database import db
+        from services.async_database import adb
+        from services.leader_election import leader
+        from models.notification import Notification
+        from services.stats_cache import stats_cache
+
+        if update.effective_user.id not in ADMIN_USER_IDS:
+            await update.message.reply_text("❌ У вас нет доступа к этому боту.")
+            return
+
+        text = "🗄 Пул соединений БД:\n" + "\n".join(
+            f"  • {key}: {value}" for key, value in db.get_pool_stats().items())
+        if DB_ASYNC_MODE == 'native':
+            text += "\n\n⚡ Async пул:\n" + "\n".join(
+                f"  • {key}: {value}" for key, value in adb.get_pool_stats().items())
+        text += "\n\n👶 Кэш детей:\n" + "\n".join(
+            f"  • {key}: {value}" for key, value in Baby.get_cache_stats().items())
+        text += "\n\n💬 Кэш состояний:\n" + "\n".join(
+            f"  • {key}: {value}" for key, value in UserState.get_cache_stats().items())
+        text += "\n\n📊 Кэш статистики:\n" + "\n".join(
+            f"  • {key}: {value}" for key, value in stats_cache.get_stats().items())
+        text += f"\n\n👑 Лидер фоновых задач: {'да' if leader.is_leader else 'нет'}"
+        text += f"\n📬 Уведомлений в очереди: {await Notification.count_pending_async(OUTBOX_MAX_ATTEMPTS)}"
+        await update.message.reply_text(text)
+
     @staticmethod
     async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text = "Выберите действие:"
@@ -50,7 +79,7 @@ class BaseHandler:
     @staticmethod
     async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        user_state = UserState.get_state(user_id)
+        user_state = await UserState.get_state_async(user_id)
 
         if not user_state:
             await update.message.reply_text("Пожалуйста, используйте кнопки меню.", reply_markup=main_menu_keyboard())
@@ -60,7 +89,7 @@ class BaseHandler:
         text = update.message.text.strip()
 
         if state == "awaiting_baby_name":
-            UserState.set_state(user_id, "awaiting_baby_birthdate", {"name": text})
+            await UserState.set_state_async(user_id, "awaiting_baby_birthdate", {"name": text})
             await update.message.reply_text("Введите дату рождения ребенка (ДД.ММ.ГГГГ):")
 
         elif state == "awaiting_baby_birthdate":
@@ -70,7 +99,7 @@ class BaseHandler:
                 state_data = user_state.get('data', {})
                 baby_name = state_data.get('name', '')
 
-                UserState.set_state(user_id, "awaiting_baby_gender", {
+                await UserState.set_state_async(user_id, "awaiting_baby_gender", {
                     "name": baby_name,
                     "birth_date": birth_date
                 })
@@ -100,7 +129,7 @@ class BaseHandler:
 
             if action_type == "bottle_feeding":
                 from services.event_service import EventService
-                UserState.clear_state(user_id)
+                await UserState.clear_state_async(user_id)
                 volume = state_data.get('volume')
                 await EventService.add_bottle_feeding(context, baby_id, user_id, user_name, volume, custom_time)
                 await update.message.reply_text(
@@ -135,7 +164,7 @@ class BaseHandler:
                     reply_markup=main_menu_keyboard()
                 )
             elif action_type == "breast_end":
-                UserState.set_state(user_id, "awaiting_breast_side", {
+                await UserState.set_state_async(user_id, "awaiting_breast_side", {
                     "baby_id": baby_id,
                     "timestamp": custom_time
                 })
@@ -147,7 +176,7 @@ class BaseHandler:
                 volume = int(text)
                 await update.message.reply_text(
                     "Когда было кормление?",
-                    reply_markup=time_selection_keyboard("bottle_feeding")
+                    reply_markup=time_selection_keyboard(cb.BOTTLE_TIME)
                 )
                 logger.info(f"Set bootle volume: {volume}")
                 context.user_data['bottle_volume'] = volume
@@ -158,7 +187,7 @@ class BaseHandler:
                 #
                 # from services.event_service import EventService
                 # await EventService.add_bottle_feeding(context, baby_id, user_id, user_name, volume, timestamp)
-                # UserState.clear_state(user_id)
+                # await UserState.clear_state_async(user_id)
                 #
                 # await update.message.reply_text(
                 #     f"✅ Кормление {volume}мл записано! Выберите следующее действие:",
@@ -168,15 +197,19 @@ class BaseHandler:
             except ValueError:
                 await update.message.reply_text("❌ Введите число (объем в мл)")
 
+        elif state == "awaiting_stats_range":
+            from handlers.stats import StatsHandler
+            await StatsHandler.handle_stats_range_input(update, context, text)
+
         elif state == "awaiting_weight":
             try:
                 weight = int(text)
-                baby = Baby.get_current()
+                baby = await Baby.get_current_async()
                 user_name = update.effective_user.first_name
                 if baby:
                     from services.event_service import EventService
                     await EventService.add_weight(context, baby['id'], user_id, user_name, weight)
-                    UserState.clear_state(user_id)
+                    await UserState.clear_state_async(user_id)
                     await update.message.reply_text(
                         f"✅ Вес {weight}г записан! Выберите следующее действие:",
                         reply_markup=main_menu_keyboard()
@@ -192,7 +225,7 @@ class BaseHandler:
         await query.answer()
 
         user_id = update.effective_user.id
-        user_state = UserState.get_state(user_id)
+        user_state = await UserState.get_state_async(user_id)
 
         if not user_state or user_state['state'] != "awaiting_baby_gender":
             await query.edit_message_text("❌ Ошибка: неверное состояние")
@@ -206,8 +239,8 @@ class BaseHandler:
             await query.edit_message_text("❌ Ошибка: данные ребенка не найдены")
             return
 
-        baby_id = Baby.add(baby_name, birth_date, gender)
-        UserState.clear_state(user_id)
+        baby_id = await Baby.add_async(baby_name, birth_date, gender)
+        await UserState.clear_state_async(user_id)
 
         gender_text = "мальчик" if gender == "male" else "девочка"
         await query.edit_message_text(
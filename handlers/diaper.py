@@ -26,7 +26,7 @@ class DiaperHandler:
 
         user_id = update.effective_user.id
         user_name = update.effective_user.first_name
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
 
         if not baby:
             await query.edit_message_text("❌ Сначала добавьте ребенка")
@@ -5,6 +5,7 @@ from models.event import Event
 from models.user import UserState
 from services.event_service import EventService
 from services.notification_service import NotificationService
+from utils import callback_data as cb
 from utils.keyboards import *
 from utils.time_utils import get_time_with_offset
 import logging
@@ -18,13 +19,13 @@ class FeedingHandler:
         query = update.callback_query
         await query.answer()
 
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
         if not baby:
             await query.edit_message_text("❌ Сначала добавьте ребенка")
             return
 
         # Проверяем, нет ли уже активного кормления
-        active_feeding = Event.get_active_breast_feeding(baby['id'])
+        active_feeding = await Event.get_active_breast_feeding_async(baby['id'])
         if active_feeding:
             start_time = active_feeding['timestamp'].astimezone(context.bot.defaults.tzinfo).strftime('%H:%M')
             await query.edit_message_text(
@@ -35,7 +36,7 @@ class FeedingHandler:
 
         await query.edit_message_text(
             "Когда началось кормление?",
-            reply_markup=time_selection_keyboard("breast_start")
+            reply_markup=time_selection_keyboard(cb.BREAST_TIME, "start")
         )
 
     @staticmethod
@@ -43,13 +44,13 @@ class FeedingHandler:
         query = update.callback_query
         await query.answer()
 
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
         if not baby:
             await query.edit_message_text("❌ Сначала добавьте ребенка")
             return
 
         # Проверяем, есть ли активное кормление
-        active_feeding = Event.get_active_breast_feeding(baby['id'])
+        active_feeding = await Event.get_active_breast_feeding_async(baby['id'])
         if not active_feeding:
             await query.edit_message_text(
                 "❌ Нет активного кормления для завершения.",
@@ -60,7 +61,7 @@ class FeedingHandler:
         start_time = active_feeding['timestamp'].astimezone(context.bot.defaults.tzinfo).strftime('%H:%M')
         await query.edit_message_text(
             f"Кормление начато в {start_time}. Когда оно закончилось?",
-            reply_markup=time_selection_keyboard("breast_end")
+            reply_markup=time_selection_keyboard(cb.BREAST_TIME, "end")
         )
 
     @staticmethod
@@ -68,7 +69,7 @@ class FeedingHandler:
         query = update.callback_query
         await query.answer()
 
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
         if not baby:
             await query.edit_message_text("❌ Сначала добавьте ребенка")
             return
@@ -83,12 +84,12 @@ class FeedingHandler:
         query = update.callback_query
         await query.answer()
 
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
         if not baby:
             await query.edit_message_text("❌ Сначала добавьте ребенка")
             return
 
-        next_time = EventService.get_next_feeding_time(baby['id'])
+        next_time = await EventService.get_next_feeding_time(baby['id'])
         if next_time:
             message = NotificationService.format_next_feeding(baby, next_time)
         else:
@@ -101,10 +102,10 @@ class FeedingHandler:
         await query.answer()
 
         user_id = update.effective_user.id
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
 
         if volume_str == "custom":
-            UserState.set_state(user_id, "awaiting_bottle_volume", {
+            await UserState.set_state_async(user_id, "awaiting_bottle_volume", {
                 "baby_id": baby['id']
             })
             await query.edit_message_text("Введите объем смеси в мл:")
@@ -115,7 +116,7 @@ class FeedingHandler:
             message_text = "Когда было кормление?"
             await query.edit_message_text(
                 message_text,
-                reply_markup=time_selection_keyboard("bottle_feeding")
+                reply_markup=time_selection_keyboard(cb.BOTTLE_TIME)
             )
             context.user_data['bottle_volume'] = volume
         except ValueError:
@@ -128,7 +129,7 @@ class FeedingHandler:
 
         user_id = update.effective_user.id
         user_name = update.effective_user.first_name
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
         volume = context.user_data.get('bottle_volume')
         logger.info(f"Get bootle volume: {volume}")
 
@@ -137,7 +138,7 @@ class FeedingHandler:
             return
 
         if minutes_str == "custom":
-            UserState.set_state(user_id, "awaiting_custom_time", {
+            await UserState.set_state_async(user_id, "awaiting_custom_time", {
                 "action_type": "bottle_feeding",
                 "baby_id": baby['id'],
                 "volume": volume
@@ -164,10 +165,10 @@ class FeedingHandler:
 
         user_id = update.effective_user.id
         user_name = update.effective_user.first_name
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
 
         if minutes_str == "custom":
-            UserState.set_state(user_id, "awaiting_custom_time", {
+            await UserState.set_state_async(user_id, "awaiting_custom_time", {
                 "action_type": f"breast_{action}",
                 "baby_id": baby['id']
             })
@@ -185,7 +186,7 @@ class FeedingHandler:
             )
         elif action == "end":
             # For breast end, we need to ask for breast side
-            UserState.set_state(user_id, "awaiting_breast_side", {
+            await UserState.set_state_async(user_id, "awaiting_breast_side", {
                 "baby_id": baby['id'],
                 "timestamp": timestamp
             })
@@ -198,13 +199,13 @@ class FeedingHandler:
 
         user_id = update.effective_user.id
         user_name = update.effective_user.first_name
-        baby = Baby.get_current()
-        user_state = UserState.get_state(user_id)
+        baby = await Baby.get_current_async()
+        user_state = await UserState.get_state_async(user_id)
         state_data = user_state.get('data', {})
         timestamp = state_data.get('timestamp')
 
         result = await EventService.end_breast_feeding(context, baby['id'], user_id, user_name, breast_side, timestamp)
-        UserState.clear_state(user_id)
+        await UserState.clear_state_async(user_id)
 
         if result:
             event_id, duration = result
@@ -0,0 +1,74 @@
+import inspect
+from telegram import Update
+from telegram.ext import ContextTypes
+from handlers.base import BaseHandler
+from handlers.feeding import FeedingHandler
+from handlers.sleep import SleepHandler
+from handlers.weight import WeightHandler
+from handlers.diaper import DiaperHandler
+from handlers.stats import StatsHandler
+from utils import callback_data as cb
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackRouter:
+    """The single CallbackQueryHandler callback: decodes callback_data once and
+    dispatches by action through a dict, passing the decoded arguments along"""
+
+    def __init__(self):
+        self.routes = {}
+        self._signatures = {}  # action -> handler signature, to check the decoded arguments against
+
+    def add(self, action, handler):
+        if action in self.routes:
+            raise ValueError(f"Route for {action} registered twice")
+        self.routes[action] = handler
+        self._signatures[action] = inspect.signature(handler)
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        try:
+            action, args = cb.decode(query.data)
+            handler = self.routes[action]
+            # Old or hand-crafted buttons may carry the wrong number of arguments
+            self._signatures[action].bind(update, context, *args)
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Unhandled callback data: {query.data}")
+            await query.answer()
+            return
+        await handler(update, context, *args)
+
+
+def build_router():
+    router = CallbackRouter()
+    router.add(cb.MAIN_MENU, BaseHandler.handle_main_menu_callback)
+    router.add(cb.GENDER, BaseHandler.handle_gender_selection)
+
+    router.add(cb.SLEEP_START_MENU, SleepHandler.handle_sleep_start_menu)
+    router.add(cb.SLEEP_END_MENU, SleepHandler.handle_sleep_end_menu)
+    router.add(cb.SLEEP_TIME, SleepHandler.handle_sleep_time)
+
+    router.add(cb.BREAST_START_MENU, FeedingHandler.handle_breast_start_menu)
+    router.add(cb.BREAST_END_MENU, FeedingHandler.handle_breast_end_menu)
+    router.add(cb.BREAST_TIME, FeedingHandler.handle_breast_time)
+    router.add(cb.BREAST_SIDE, FeedingHandler.handle_breast_side)
+
+    router.add(cb.BOTTLE_FEEDING, FeedingHandler.handle_bottle_feeding)
+    router.add(cb.BOTTLE_VOLUME, FeedingHandler.handle_bottle_volume)
+    router.add(cb.BOTTLE_TIME, FeedingHandler.handle_bottle_time)
+    router.add(cb.NEXT_FEEDING, FeedingHandler.handle_next_feeding)
+
+    router.add(cb.STATS, StatsHandler.handle_stats)
+    router.add(cb.STATS_PERIOD, StatsHandler.handle_stats_period)
+
+    router.add(cb.WEIGHT, WeightHandler.handle_weight)
+
+    router.add(cb.DIAPER, DiaperHandler.handle_diaper)
+    router.add(cb.DIAPER_TYPE, DiaperHandler.handle_diaper_type)
+
+    missing = cb.ACTIONS - router.routes.keys()
+    if missing:
+        raise RuntimeError(f"No route for callback actions: {', '.join(sorted(missing))}")
+    return router
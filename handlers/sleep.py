@@ -4,6 +4,7 @@ from models.baby import Baby
 from models.event import Event
 from models.user import UserState
 from services.event_service import EventService
+from utils import callback_data as cb
 from utils.keyboards import *
 from utils.time_utils import get_time_with_offset
 import logging
@@ -17,12 +18,12 @@ class SleepHandler:
         query = update.callback_query
         await query.answer()
 
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
         if not baby:
             await query.edit_message_text("❌ Сначала добавьте ребенка")
             return
 
-        active_sleep = Event.get_active_sleep(baby['id'])
+        active_sleep = await Event.get_active_sleep_async(baby['id'])
         if active_sleep:
             start_time = active_sleep['timestamp'].astimezone(context.bot.defaults.tzinfo).strftime('%H:%M')
             await query.edit_message_text(
@@ -33,7 +34,7 @@ class SleepHandler:
 
         await query.edit_message_text(
             "Когда начался сон?",
-            reply_markup=time_selection_keyboard("sleep_start")
+            reply_markup=time_selection_keyboard(cb.SLEEP_TIME, "start")
         )
 
     @staticmethod
@@ -41,12 +42,12 @@ class SleepHandler:
         query = update.callback_query
         await query.answer()
 
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
         if not baby:
             await query.edit_message_text("❌ Сначала добавьте ребенка")
             return
 
-        active_sleep = Event.get_active_sleep(baby['id'])
+        active_sleep = await Event.get_active_sleep_async(baby['id'])
         if not active_sleep:
             await query.edit_message_text(
                 "❌ Нет активного сна для завершения.",
@@ -57,7 +58,7 @@ class SleepHandler:
         start_time = active_sleep['timestamp'].astimezone(context.bot.defaults.tzinfo).strftime('%H:%M')
         await query.edit_message_text(
             f"Сон начат в {start_time}. Когда он закончился?",
-            reply_markup=time_selection_keyboard("sleep_end")
+            reply_markup=time_selection_keyboard(cb.SLEEP_TIME, "end")
         )
 
     @staticmethod
@@ -67,10 +68,10 @@ class SleepHandler:
 
         user_id = update.effective_user.id
         user_name = update.effective_user.first_name
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
 
         if minutes_str == "custom":
-            UserState.set_state(user_id, "awaiting_custom_time", {
+            await UserState.set_state_async(user_id, "awaiting_custom_time", {
                 "action_type": f"sleep_{action}",
                 "baby_id": baby['id']
             })
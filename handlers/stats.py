@@ -1,21 +1,34 @@
+from datetime import datetime, timedelta
+import pytz
 from telegram import Update
 from telegram.ext import ContextTypes
+from config import TIMEZONE
 from models.baby import Baby
+from models.user import UserState
 from services.stats_service import StatsService
+from services.period_stats_service import PeriodStatsService
 from utils.keyboards import stats_period_keyboard, main_menu_keyboard
+from utils.time_utils import parse_date_range
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class StatsHandler:
+    # Periods computed by PeriodStatsService, in days back from now
+    LONG_PERIODS = {'week': 7, 'month': 30}
+
+    @staticmethod
+    def _local_midnight(day):
+        return pytz.timezone(TIMEZONE).localize(datetime.combine(day, datetime.min.time()))
+
     @staticmethod
     async def handle_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
 
         try:
-            baby = Baby.get_current()
+            baby = await Baby.get_current_async()
             if not baby:
                 await query.edit_message_text("❌ Сначала добавьте ребенка")
                 return
@@ -37,11 +50,29 @@ class StatsHandler:
         await query.answer()
 
         try:
-            baby = Baby.get_current()
+            baby = await Baby.get_current_async()
             if not baby:
                 await query.edit_message_text("❌ Сначала добавьте ребенка")
                 return
 
+            if period == "custom":
+                await UserState.set_state_async(update.effective_user.id, "awaiting_stats_range")
+                await query.edit_message_text("Введите период в формате ДД.ММ.ГГГГ-ДД.ММ.ГГГГ (или одну дату):")
+                return
+
+            if period in StatsHandler.LONG_PERIODS or period == "all":
+                now = datetime.now(pytz.timezone(TIMEZONE))
+                if period == "all":
+                    start_time = StatsHandler._local_midnight(baby['birth_date'])
+                else:
+                    start_time = now - timedelta(days=StatsHandler.LONG_PERIODS[period])
+                stats = await PeriodStatsService.get_period_stats(baby['id'], start_time, now)
+                await query.edit_message_text(
+                    PeriodStatsService.format_stats(stats),
+                    reply_markup=main_menu_keyboard()
+                )
+                return
+
             if period == "today":
                 period_hours = None
                 period_name = "сегодня"
@@ -55,7 +86,7 @@ class StatsHandler:
                 period_hours = 24
                 period_name = "последние 24 часа"
 
-            stats = StatsService.get_stats(baby['id'], period_hours)
+            stats = await StatsService.get_stats(baby['id'], period_hours)
 
             if stats:
                 stats_text = StatsService.format_stats(stats)
@@ -73,4 +104,39 @@ class StatsHandler:
             await query.edit_message_text(
                 "❌ Произошла ошибка при получении статистики",
                 reply_markup=main_menu_keyboard()
-            )
\ No newline at end of file
+            )
+
+    @staticmethod
+    async def handle_stats_range_input(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+        """Message in the awaiting_stats_range state: show stats for the entered dates"""
+        date_range = parse_date_range(text)
+        if not date_range:
+            await update.message.reply_text("❌ Неверный формат. Используйте ДД.ММ.ГГГГ-ДД.ММ.ГГГГ")
+            return
+
+        now = datetime.now(pytz.timezone(TIMEZONE))
+        first_date, last_date = date_range
+        start_time = StatsHandler._local_midnight(first_date)
+        end_time = min(StatsHandler._local_midnight(last_date + timedelta(days=1)), now)
+        if start_time >= end_time:
+            await update.message.reply_text("❌ Период еще не начался. Введите другие даты")
+            return
+
+        await UserState.clear_state_async(update.effective_user.id)
+        try:
+            baby = await Baby.get_current_async()
+            if not baby:
+                await update.message.reply_text("❌ Сначала добавьте ребенка")
+                return
+
+            stats = await PeriodStatsService.get_period_stats(baby['id'], start_time, end_time)
+            await update.message.reply_text(
+                PeriodStatsService.format_stats(stats),
+                reply_markup=main_menu_keyboard()
+            )
+        except Exception as e:
+            logger.error(f"Error in handle_stats_range_input: {e}")
+            await update.message.reply_text(
+                "❌ Произошла ошибка при получении статистики",
+                reply_markup=main_menu_keyboard()
+            )
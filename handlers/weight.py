@@ -15,11 +15,11 @@ class WeightHandler:
         await query.answer()
 
         user_id = update.effective_user.id
-        baby = Baby.get_current()
+        baby = await Baby.get_current_async()
 
         if not baby:
             await query.edit_message_text("❌ Сначала добавьте ребенка")
             return
 
-        UserState.set_state(user_id, "awaiting_weight")
+        await UserState.set_state_async(user_id, "awaiting_weight")
         await query.edit_message_text("Введите вес ребенка в граммах:")
\ No newline at end of file
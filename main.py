@@ -4,21 +4,18 @@ import pytz
 import sys
 from systemd import journal
 
-from config import BOT_TOKEN, TIMEZONE
-
-# Импорты моделей
-from models.baby import Baby
-from models.event import Event
-from models.user import UserState
-from models.reminder import Reminder
+from config import BOT_TOKEN, TIMEZONE, TELEGRAM_BASE_URL
+from services.database import db
+from services.async_database import adb
+from services.persistence import PostgresPersistence
+from services.leader_election import leader
+from services.notification_service import outbox
+from services.stats_cache import stats_cache
+from services.update_processor import PerUserUpdateProcessor
 
 # Импорты обработчиков
 from handlers.base import BaseHandler
-from handlers.feeding import FeedingHandler
-from handlers.sleep import SleepHandler
-from handlers.weight import WeightHandler
-from handlers.diaper import DiaperHandler
-from handlers.stats import StatsHandler
+from handlers.router import build_router
 
 # Configure logging
 logging.basicConfig(
@@ -35,18 +32,45 @@ logger = logging.getLogger(__name__)
 
 
 def init_database():
-    """Initialize all database tables"""
-    Baby.create_table()
-    Event.create_table()
-    UserState.create_table()
-    Reminder.create_table()
-    logger.info("Database tables initialized")
+    """Bring the database schema up to date and fill the daily_stats rollup on first start"""
+    from models.daily_stats import DailyStats
+    from services.migrations import migrate
+
+    db.open()
+    migrate()
+    count = DailyStats.rebuild(if_not_built=True)
+    if count is not None:
+        logger.info(f"Built daily_stats rollup: {count} day row(s)")
 
 
-async def check_reminders(context):
-    """Check and send reminders"""
+async def on_startup(application):
+    """Open async resources once the event loop is running"""
     from services.reminder_service import ReminderService
-    await ReminderService.check_and_send_reminders(context)
+
+    await adb.open()
+    outbox.start(application.bot)
+    try:
+        logger.info(f"Stats cache loaded for {await stats_cache.load()} baby(ies)")
+    except Exception as e:
+        logger.error(f"Could not load the stats cache, stats will be read from the database: {e}")
+    # With leader election the reminders are restored by whichever instance wins it
+    if not leader.enabled:
+        await ReminderService.restore_reminders(application.job_queue)
+
+
+async def on_stop(application):
+    """Deliver queued notifications while the bot is still usable"""
+    await outbox.stop()
+
+
+async def on_shutdown(application):
+    await leader.resign()
+    await adb.close()
+
+
+async def on_elected(context):
+    from services.reminder_service import ReminderService
+    await ReminderService.restore_reminders(context.job_queue)
 
 
 def setup_handlers(application):
@@ -54,136 +78,133 @@ def setup_handlers(application):
 
     # Command handlers
     application.add_handler(CommandHandler("start", BaseHandler.start))
+    application.add_handler(CommandHandler("dbstats", BaseHandler.db_stats))
 
-    # Callback query handlers
-    application.add_handler(CallbackQueryHandler(
-        BaseHandler.handle_main_menu_callback,
-        pattern="^main_menu$"
-    ))
-
-    # Gender selection handler
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: BaseHandler.handle_gender_selection(update, context,
-                                                                    update.callback_query.data.replace("gender_", "")),
-        pattern="^gender_"
-    ))
-
-    # Sleep handlers
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: SleepHandler.handle_sleep_start_menu(update, context),
-        pattern="^sleep_start_menu$"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: SleepHandler.handle_sleep_end_menu(update, context),
-        pattern="^sleep_end_menu$"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: SleepHandler.handle_sleep_time(update, context, "start",
-                                                               update.callback_query.data.replace("time_sleep_start_",
-                                                                                                  "")),
-        pattern="^time_sleep_start_"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: SleepHandler.handle_sleep_time(update, context, "end",
-                                                               update.callback_query.data.replace("time_sleep_end_",
-                                                                                                  "")),
-        pattern="^time_sleep_end_"
-    ))
-
-    # Breast feeding handlers
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_breast_start_menu(update, context),
-        pattern="^breast_start_menu$"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_breast_end_menu(update, context),
-        pattern="^breast_end_menu$"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_breast_time(update, context, "start",
-                                                                  update.callback_query.data.replace(
-                                                                      "time_breast_start_", "")),
-        pattern="^time_breast_start_"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_breast_time(update, context, "end",
-                                                                  update.callback_query.data.replace("time_breast_end_",
-                                                                                                     "")),
-        pattern="^time_breast_end_"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_breast_side(update, context,
-                                                                  update.callback_query.data.replace("breast_", "")),
-        pattern="^breast_"
-    ))
-
-    # Bottle feeding handlers
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_bottle_feeding(update, context),
-        pattern="^bottle_feeding$"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_bottle_volume(update, context,
-                                                                    update.callback_query.data.replace("volume_", "")),
-        pattern="^volume_"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_bottle_time(update, context, update.callback_query.data.replace(
-            "time_bottle_feeding_", "")),
-        pattern="^time_bottle_feeding_"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: FeedingHandler.handle_next_feeding(update, context),
-        pattern="^next_feeding$"
-    ))
-
-    # Stats handlers
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: StatsHandler.handle_stats(update, context),
-        pattern="^stats$"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: StatsHandler.handle_stats_period(update, context,
-                                                                 update.callback_query.data.replace("stats_", "")),
-        pattern="^stats_"
-    ))
-
-    # Weight handler
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: WeightHandler.handle_weight(update, context),
-        pattern="^weight$"
-    ))
-
-    # Diaper handlers
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: DiaperHandler.handle_diaper(update, context),
-        pattern="^diaper$"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        lambda update, context: DiaperHandler.handle_diaper_type(update, context,
-                                                                 update.callback_query.data.replace("diaper_", "")),
-        pattern="^diaper_"
-    ))
+    # All inline buttons go through one router (see utils/callback_data.py)
+    application.add_handler(CallbackQueryHandler(build_router().handle))
 
     # Message handler
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, BaseHandler.handle_message))
 
 
 def setup_job_queue(application):
-    """Setup job queue for reminders"""
+    """Setup periodic maintenance jobs (reminders themselves are run_once jobs).
+
+    Periodic jobs only run on the leader instance; standbys keep checking
+    whether they should take over.
+    """
     job_queue = application.job_queue
 
-    # Check reminders every minute
+    from config import LEADER_CHECK_INTERVAL
+    leader.on_elected(on_elected)
+    job_queue.run_repeating(
+        leader.check,
+        interval=LEADER_CHECK_INTERVAL,
+        first=0,
+        name="leader_election"
+    )
+
+    # Reminder jobs live in the memory of the instance that scheduled them. With
+    # several instances, send any due reminder whose job was lost with its instance;
+    # a single instance restores its reminders at startup and needs no polling
+    from config import REMINDER_SWEEP_INTERVAL
+    from services.reminder_service import ReminderService
+    if leader.enabled:
+        job_queue.run_repeating(
+            leader.gated(ReminderService.check_and_send_reminders),
+            interval=REMINDER_SWEEP_INTERVAL,
+            first=REMINDER_SWEEP_INTERVAL,
+            name="reminder_sweep"
+        )
+
+    # Drop old sent reminders once a day
     job_queue.run_repeating(
-        check_reminders,
-        interval=60,  # 60 seconds = 1 minute
-        first=10,  # Start after 10 seconds
-        name="reminder_check"
+        leader.gated(ReminderService.cleanup_old_reminders),
+        interval=24 * 60 * 60,
+        first=120,
+        name="reminder_cleanup"
+    )
+
+    # Drop delivered outbox notifications once a day
+    from services.notification_service import NotificationService
+    job_queue.run_repeating(
+        leader.gated(NotificationService.cleanup_outbox),
+        interval=24 * 60 * 60,
+        first=180,
+        name="outbox_cleanup"
+    )
+
+    # Keep the pinned status messages current
+    from config import STATUS_MESSAGE_ENABLED, STATUS_UPDATE_INTERVAL
+    if STATUS_MESSAGE_ENABLED:
+        from services.status_service import StatusService
+        job_queue.run_repeating(
+            leader.gated(StatusService.update_status_messages),
+            interval=STATUS_UPDATE_INTERVAL,
+            first=15,
+            name="status_update"
+        )
+
+    # Every instance keeps its own stats cache: reload it periodically to pick up
+    # writes made elsewhere, and right after midnight when "today" starts over
+    if stats_cache.enabled:
+        from datetime import time
+        job_queue.run_repeating(
+            stats_cache.reconcile,
+            interval=stats_cache.reconcile_interval,
+            first=stats_cache.reconcile_interval,
+            name="stats_cache_reconcile"
+        )
+        job_queue.run_daily(
+            stats_cache.reconcile,
+            time=time(0, 0, 5),
+            name="stats_cache_midnight"
+        )
+
+    # Create upcoming events partitions and archive expired ones once a day
+    from services.partition_service import PartitionService
+    job_queue.run_repeating(
+        leader.gated(PartitionService.run_maintenance),
+        interval=24 * 60 * 60,
+        first=60,
+        name="partition_maintenance"
     )
 
     logger.info("Job queue setup completed")
 
 
+def run(application):
+    """Serve updates with a webhook when configured, otherwise (or if that fails) by polling"""
+    from telegram.error import TelegramError
+    from config import (BOT_MODE, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET_TOKEN,
+                        WEBHOOK_MAX_CONNECTIONS)
+
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_URL:
+            logger.warning("BOT_MODE is webhook but WEBHOOK_URL is not set, using polling")
+        else:
+            if not WEBHOOK_SECRET_TOKEN:
+                logger.warning("WEBHOOK_SECRET_TOKEN is not set, webhook requests are not authenticated")
+            try:
+                logger.info(f"Bot starting with webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+                application.run_webhook(
+                    listen=WEBHOOK_LISTEN,
+                    port=WEBHOOK_PORT,
+                    url_path=WEBHOOK_PATH,
+                    webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                    secret_token=WEBHOOK_SECRET_TOKEN,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                    # Keep the loop open so polling can take over on failure
+                    close_loop=False,
+                )
+                return
+            except (RuntimeError, OSError, TelegramError) as e:
+                logger.error(f"Webhook mode failed, falling back to polling: {e}")
+
+    logger.info("Bot starting with polling...")
+    application.run_polling()
+
+
 def main():
     # Initialize database
     logger.info("Initializing database...")
@@ -194,7 +215,18 @@ def main():
     defaults = Defaults(tzinfo=pytz.timezone(TIMEZONE))
 
     # Create application with job queue
-    application = Application.builder().token(BOT_TOKEN).defaults(defaults).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(TELEGRAM_BASE_URL)
+        .defaults(defaults)
+        .persistence(PostgresPersistence())
+        .concurrent_updates(PerUserUpdateProcessor())
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
 
     # Setup handlers
     setup_handlers(application)
@@ -203,8 +235,8 @@ def main():
     setup_job_queue(application)
 
     # Start the bot
-    logger.info("Bot starting...")
-    application.run_polling()
+    run(application)
+    db.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,144 @@
+"""
+Maintenance commands for the baby tracker database.
+
+Usage: python manage.py <command> [options]
+"""
+import argparse
+import logging
+import sys
+from datetime import date
+
+from config import EVENTS_PARTITIONS_AHEAD, EVENTS_ARCHIVE_DIR
+from services.database import db
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO,
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(args):
+    """Apply pending schema migrations"""
+    from services.migrations import migrate as run_migrations
+
+    run_migrations(args.target)
+
+
+def migration_status(args):
+    """Show which schema migrations have been applied"""
+    from services.migrations import get_status
+
+    for version, name, applied in get_status():
+        logger.info(f"{version:04d}_{name}: {'applied' if applied else 'pending'}")
+
+
+def rebuild_open_sessions(args):
+    """Re-derive the open_sessions table from the events history"""
+    from models.event import Event
+
+    count = Event.rebuild_open_sessions()
+    logger.info(f"Rebuilt open_sessions: {count} open session(s)")
+
+
+def rebuild_sessions(args):
+    """Re-derive the completed sessions table from start/end events"""
+    from models.session import Session
+
+    count = Session.rebuild(args.since)
+    logger.info(f"Rebuilt sessions: {count} completed session(s); run rebuild-daily-stats "
+                "(with the same --since) to refresh the rollup")
+
+
+def rebuild_daily_stats(args):
+    """Recompute the daily_stats rollup from events and sessions"""
+    from models.daily_stats import DailyStats
+
+    count = DailyStats.rebuild(args.since)
+    logger.info(f"Rebuilt daily_stats: {count} day row(s)")
+
+
+def check_indexes(args):
+    """EXPLAIN the hot event queries and fail if any of them is not served by an index"""
+    from models.event import Event
+
+    report = Event.explain_hot_queries(args.baby_id, disable_seqscan=args.no_seqscan)
+    for entry in report:
+        status = "ok" if entry['ok'] else "NOT INDEXED"
+        logger.info(f"{entry['name']}: {status} ({', '.join(entry['scans'])})")
+    if not all(entry['ok'] for entry in report):
+        sys.exit(1)
+
+
+def ensure_partitions(args):
+    """Create the upcoming monthly partitions of the events table"""
+    from services.partition_service import PartitionService
+
+    created = PartitionService.ensure_partitions(args.months_ahead)
+    logger.info(f"Events partitions ensured: {', '.join(created)}")
+
+
+def archive_events(args):
+    """Dump old monthly events partitions to compressed CSV files and drop them"""
+    from services.partition_service import PartitionService
+
+    archived = PartitionService.archive_partitions(args.older_than_months, args.output_dir)
+    logger.info(f"Archived {len(archived)} partition(s)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Baby tracker maintenance commands")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = commands.add_parser('migrate', help=migrate.__doc__)
+    migrate_parser.add_argument('--target', type=int, help="stop after this migration version")
+    migrate_parser.set_defaults(func=migrate)
+
+    status = commands.add_parser('migration-status', help=migration_status.__doc__)
+    status.set_defaults(func=migration_status)
+
+    rebuild = commands.add_parser('rebuild-open-sessions', help=rebuild_open_sessions.__doc__)
+    rebuild.set_defaults(func=rebuild_open_sessions)
+
+    rebuild = commands.add_parser('rebuild-sessions', help=rebuild_sessions.__doc__)
+    rebuild.add_argument('--since', type=date.fromisoformat,
+                         help="only rebuild sessions ending from this date (YYYY-MM-DD); required once events "
+                              "have been archived, sessions of archived months cannot be rebuilt")
+    rebuild.set_defaults(func=rebuild_sessions)
+
+    rebuild = commands.add_parser('rebuild-daily-stats', help=rebuild_daily_stats.__doc__)
+    rebuild.add_argument('--since', type=date.fromisoformat,
+                         help="only rebuild days from this date (YYYY-MM-DD); required once events have been "
+                              "archived, days of archived months cannot be rebuilt")
+    rebuild.set_defaults(func=rebuild_daily_stats)
+
+    check = commands.add_parser('check-indexes', help=check_indexes.__doc__)
+    check.add_argument('--baby-id', type=int, default=1)
+    check.add_argument('--no-seqscan', action='store_true',
+                       help="disable sequential scans, for small databases where they always win")
+    check.set_defaults(func=check_indexes)
+
+    partitions = commands.add_parser('ensure-partitions', help=ensure_partitions.__doc__)
+    partitions.add_argument('--months-ahead', type=int, default=EVENTS_PARTITIONS_AHEAD)
+    partitions.set_defaults(func=ensure_partitions)
+
+    archive = commands.add_parser('archive-events', help=archive_events.__doc__)
+    archive.add_argument('--older-than-months', type=int, required=True)
+    archive.add_argument('--output-dir', default=EVENTS_ARCHIVE_DIR)
+    archive.set_defaults(func=archive_events)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    try:
+        args.func(args)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+-- One row per baby and session kind while a sleep / breast feeding is in progress
+
+CREATE TABLE IF NOT EXISTS open_sessions (
+    baby_id INTEGER NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    event_id INTEGER NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (baby_id, kind)
+);
+
+-- Derive the open sessions from history: the latest start with no end after it
+DELETE FROM open_sessions;
+
+INSERT INTO open_sessions (baby_id, kind, event_id, started_at)
+SELECT DISTINCT ON (s.baby_id, k.kind) s.baby_id, k.kind, s.id, s.timestamp
+FROM (VALUES ('sleep', 'sleep_start', 'sleep_end'),
+             ('breast_feeding', 'breast_feeding_start', 'breast_feeding_end')) AS k (kind, start_type, end_type)
+JOIN events s ON s.event_type = k.start_type
+WHERE NOT EXISTS (
+    SELECT 1 FROM events e
+    WHERE e.baby_id = s.baby_id
+    AND e.event_type = k.end_type
+    AND e.timestamp > s.timestamp
+)
+ORDER BY s.baby_id, k.kind, s.timestamp DESC;
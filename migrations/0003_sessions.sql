@@ -0,0 +1,30 @@
+-- Completed sleep / breast-feeding sessions, written when a session is closed
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id SERIAL PRIMARY KEY,
+    baby_id INTEGER NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    start_event_id INTEGER NOT NULL,
+    end_event_id INTEGER NOT NULL UNIQUE,
+    start_time TIMESTAMP WITH TIME ZONE NOT NULL,
+    end_time TIMESTAMP WITH TIME ZONE NOT NULL,
+    duration INTEGER,
+    side VARCHAR(10),
+    created_by BIGINT
+);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_baby_kind_end ON sessions(baby_id, kind, end_time);
+
+-- Backfill: pair every end event with the latest start of the same kind before it
+INSERT INTO sessions (baby_id, kind, start_event_id, end_event_id, start_time, end_time, duration, side, created_by)
+SELECT e.baby_id, k.kind, s.id, e.id, s.timestamp, e.timestamp, e.duration, e.notes, e.created_by
+FROM (VALUES ('sleep', 'sleep_start', 'sleep_end'),
+             ('breast_feeding', 'breast_feeding_start', 'breast_feeding_end')) AS k (kind, start_type, end_type)
+JOIN events e ON e.event_type = k.end_type
+CROSS JOIN LATERAL (
+    SELECT id, timestamp FROM events
+    WHERE baby_id = e.baby_id AND event_type = k.start_type AND timestamp <= e.timestamp
+    ORDER BY timestamp DESC
+    LIMIT 1
+) s
+ON CONFLICT (end_event_id) DO NOTHING;
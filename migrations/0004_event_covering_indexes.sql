@@ -0,0 +1,17 @@
+-- migrate: no-transaction
+-- Covering indexes for the hot event lookups, built without blocking writes.
+-- The single-purpose indexes they supersede are dropped afterwards.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_baby_type_ts
+    ON events (baby_id, event_type, timestamp DESC) INCLUDE (id, amount, duration, notes);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_baby_ts
+    ON events (baby_id, timestamp DESC) INCLUDE (id, event_type, amount, duration, notes);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_events_baby_id;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_events_timestamp;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_events_type;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_events_baby_type;
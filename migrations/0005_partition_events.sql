@@ -0,0 +1,74 @@
+-- Range-partition events by month on timestamp.
+-- Runs in one transaction and holds an exclusive lock on events while rows are copied.
+
+-- Creates the partition for the (UTC) month containing `month` unless it exists
+CREATE OR REPLACE FUNCTION create_events_partition(month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::date;
+    partition_name TEXT := 'events_' || to_char(start_date, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF events FOR VALUES FROM (%L) TO (%L)',
+            partition_name,
+            start_date::timestamp AT TIME ZONE 'UTC',
+            (start_date + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE events RENAME TO events_unpartitioned;
+ALTER TABLE events_unpartitioned RENAME CONSTRAINT events_pkey TO events_unpartitioned_pkey;
+DROP INDEX IF EXISTS idx_events_baby_type_ts;
+DROP INDEX IF EXISTS idx_events_baby_ts;
+
+-- The partition key has to be part of the primary key
+CREATE TABLE events (
+    id INTEGER NOT NULL DEFAULT nextval('events_id_seq'),
+    baby_id INTEGER NOT NULL,
+    event_type VARCHAR(50) NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    amount INTEGER,
+    notes TEXT,
+    duration INTEGER,
+    created_by BIGINT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Keep the id sequence alive when the old table is dropped
+ALTER SEQUENCE events_id_seq OWNED BY events.id;
+
+-- Catches rows outside every monthly partition (e.g. far-future typos)
+CREATE TABLE events_default PARTITION OF events DEFAULT;
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT MIN(timestamp) FROM events_unpartitioned), now()) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '3 months',
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        PERFORM create_events_partition(month);
+    END LOOP;
+END;
+$$;
+
+INSERT INTO events (id, baby_id, event_type, timestamp, amount, notes, duration, created_by, created_at)
+SELECT id, baby_id, event_type, COALESCE(timestamp, created_at, CURRENT_TIMESTAMP), amount, notes, duration,
+       created_by, created_at
+FROM events_unpartitioned;
+
+DROP TABLE events_unpartitioned;
+
+CREATE INDEX idx_events_baby_type_ts
+    ON events (baby_id, event_type, timestamp DESC) INCLUDE (id, amount, duration, notes);
+
+CREATE INDEX idx_events_baby_ts
+    ON events (baby_id, timestamp DESC) INCLUDE (id, event_type, amount, duration, notes);
@@ -0,0 +1,9 @@
+-- Storage for python-telegram-bot persistence (user_data, chat_data, bot_data, conversations)
+
+CREATE TABLE IF NOT EXISTS bot_persistence (
+    kind VARCHAR(100) NOT NULL,
+    key TEXT NOT NULL,
+    data JSONB NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (kind, key)
+);
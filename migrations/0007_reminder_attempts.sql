@@ -0,0 +1,6 @@
+-- Delivery attempts per reminder, used for retry backoff
+
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+
+-- Claiming only ever looks at unsent reminders
+CREATE INDEX IF NOT EXISTS idx_reminders_unsent ON reminders(scheduled_time) WHERE sent = FALSE;
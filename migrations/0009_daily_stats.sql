@@ -0,0 +1,29 @@
+-- Per-baby per-day rollup of the stats counters, kept up to date by the event
+-- and session-close statements. Days are local days in the bot's TIMEZONE,
+-- which SQL does not know: the bot fills it at startup (see 0010), or run
+-- `python manage.py rebuild-daily-stats`.
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    baby_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    bottle_feedings INTEGER NOT NULL DEFAULT 0,
+    bottle_ml INTEGER NOT NULL DEFAULT 0,
+    last_bottle_at TIMESTAMP WITH TIME ZONE,
+    last_bottle_ml INTEGER,
+    sleep_sessions INTEGER NOT NULL DEFAULT 0,
+    sleep_minutes INTEGER NOT NULL DEFAULT 0,
+    last_sleep_end TIMESTAMP WITH TIME ZONE,
+    last_sleep_duration INTEGER,
+    breast_sessions INTEGER NOT NULL DEFAULT 0,
+    breast_minutes INTEGER NOT NULL DEFAULT 0,
+    breast_left INTEGER NOT NULL DEFAULT 0,
+    breast_right INTEGER NOT NULL DEFAULT 0,
+    diaper_changes INTEGER NOT NULL DEFAULT 0,
+    diapers_wet INTEGER NOT NULL DEFAULT 0,
+    diapers_dirty INTEGER NOT NULL DEFAULT 0,
+    diapers_mixed INTEGER NOT NULL DEFAULT 0,
+    last_weight INTEGER,
+    last_weight_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (baby_id, day)
+);
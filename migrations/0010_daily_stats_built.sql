@@ -0,0 +1,8 @@
+-- Marks the daily_stats rollup as built. 0009 creates it empty; until a full
+-- rebuild has run (done at startup when this row is missing) StatsService
+-- counts whole days from events and sessions instead of the rollup.
+
+CREATE TABLE IF NOT EXISTS daily_stats_built (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    built_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
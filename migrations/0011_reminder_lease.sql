@@ -0,0 +1,4 @@
+-- Claimed reminders stay unsent until delivered; claimed_until leases them to
+-- the worker sending them, and once it passes they can be claimed again
+
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMP WITH TIME ZONE;
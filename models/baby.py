@@ -1,42 +1,141 @@
+import threading
+import time
 from services.database import db
+from services.async_database import adb
+from config import BABY_CACHE_TTL
+
+
+class BabyCache:
+    """Process-local cache of baby rows by id plus a pointer to the current baby.
+
+    Entries expire after `ttl` seconds so changes made by another instance are
+    picked up eventually; writes through Baby invalidate immediately.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_id = {}  # id -> (row, expires_at)
+        self._current = None  # (id, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, baby_id):
+        with self._lock:
+            entry = self._by_id.get(baby_id)
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, baby):
+        if baby is None:
+            return None
+        baby = dict(baby)
+        with self._lock:
+            self._by_id[baby['id']] = (baby, time.monotonic() + self.ttl)
+        return baby
+
+    def get_current(self):
+        with self._lock:
+            if self._current and self._current[1] > time.monotonic():
+                entry = self._by_id.get(self._current[0])
+                if entry and entry[1] > time.monotonic():
+                    self.hits += 1
+                    return entry[0]
+            self.misses += 1
+            return None
+
+    def set_current(self, baby):
+        baby = self.put(baby)
+        if baby is not None:
+            with self._lock:
+                self._current = (baby['id'], time.monotonic() + self.ttl)
+        return baby
+
+    def invalidate(self, baby_id=None):
+        with self._lock:
+            if baby_id is None:
+                self._by_id.clear()
+            else:
+                self._by_id.pop(baby_id, None)
+            self._current = None
+
+    def get_stats(self):
+        with self._lock:
+            return {'size': len(self._by_id), 'hits': self.hits, 'misses': self.misses}
 
 
 class Baby:
+    _INSERT = "INSERT INTO babies (name, birth_date, gender) VALUES (%s, %s, %s) RETURNING id"
+    _SELECT_ALL = "SELECT * FROM babies ORDER BY created_at DESC"
+    _SELECT_CURRENT = "SELECT * FROM babies ORDER BY created_at DESC LIMIT 1"
+    _SELECT_BY_ID = "SELECT * FROM babies WHERE id = %s"
+    _UPDATE_GENDER = "UPDATE babies SET gender = %s WHERE id = %s"
+
+    cache = BabyCache(BABY_CACHE_TTL)
+
     @staticmethod
-    def create_table():
-        query = """
-        CREATE TABLE IF NOT EXISTS babies (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            birth_date DATE NOT NULL,
-            gender VARCHAR(10) NOT NULL DEFAULT 'unknown',
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-        db.execute_query(query)
+    def get_cache_stats():
+        return Baby.cache.get_stats()
 
     @staticmethod
     def add(name, birth_date, gender='unknown'):
-        query = "INSERT INTO babies (name, birth_date, gender) VALUES (%s, %s, %s) RETURNING id"
-        result = db.fetch_one(query, (name, birth_date, gender))
+        result = db.fetch_one(Baby._INSERT, (name, birth_date, gender))
+        Baby.cache.invalidate()
         return result['id'] if result else None
 
     @staticmethod
     def get_all():
-        query = "SELECT * FROM babies ORDER BY created_at DESC"
-        return db.fetch_all(query)
+        return db.fetch_all(Baby._SELECT_ALL)
 
     @staticmethod
     def get_by_id(baby_id):
-        query = "SELECT * FROM babies WHERE id = %s"
-        return db.fetch_one(query, (baby_id,))
+        baby = Baby.cache.get(baby_id)
+        if baby is None:
+            baby = Baby.cache.put(db.fetch_one(Baby._SELECT_BY_ID, (baby_id,)))
+        return baby
 
     @staticmethod
     def get_current():
-        babies = Baby.get_all()
-        return babies[0] if babies else None
+        baby = Baby.cache.get_current()
+        if baby is None:
+            baby = Baby.cache.set_current(db.fetch_one(Baby._SELECT_CURRENT))
+        return baby
 
     @staticmethod
     def update_gender(baby_id, gender):
-        query = "UPDATE babies SET gender = %s WHERE id = %s"
-        db.execute_query(query, (gender, baby_id))
\ No newline at end of file
+        db.execute_query(Baby._UPDATE_GENDER, (gender, baby_id))
+        Baby.cache.invalidate(baby_id)
+
+    # Async variants for use from handlers/services running on the event loop
+
+    @staticmethod
+    async def add_async(name, birth_date, gender='unknown'):
+        result = await adb.fetch_one(Baby._INSERT, (name, birth_date, gender))
+        Baby.cache.invalidate()
+        return result['id'] if result else None
+
+    @staticmethod
+    async def get_all_async():
+        return await adb.fetch_all(Baby._SELECT_ALL)
+
+    @staticmethod
+    async def get_by_id_async(baby_id):
+        baby = Baby.cache.get(baby_id)
+        if baby is None:
+            baby = Baby.cache.put(await adb.fetch_one(Baby._SELECT_BY_ID, (baby_id,)))
+        return baby
+
+    @staticmethod
+    async def get_current_async():
+        baby = Baby.cache.get_current()
+        if baby is None:
+            baby = Baby.cache.set_current(await adb.fetch_one(Baby._SELECT_CURRENT))
+        return baby
+
+    @staticmethod
+    async def update_gender_async(baby_id, gender):
+        await adb.execute_query(Baby._UPDATE_GENDER, (gender, baby_id))
+        Baby.cache.invalidate(baby_id)
@@ -0,0 +1,209 @@
+from services.database import db
+from services.async_database import adb
+from config import TIMEZONE
+
+
+class DailyStats:
+    """Per-baby per-day rollup of the stats counters.
+
+    Events are counted on their local day, completed sessions on the local day
+    they ended, the same way StatsService counts them from the raw tables. The
+    FOLD_* statements aggregate the rows of ``{source}`` and add them to the
+    rollup; Event embeds them in its insert / close statements with the new row
+    as the source, so the rollup is written in the same statement as the event.
+    Type names are spelled out because this module is imported by models.event.
+    """
+
+    # Adds a batch of per-day counters to the existing row. The "last" columns
+    # keep whichever of the two values is more recent.
+    _MERGE = """
+    ON CONFLICT (baby_id, day) DO UPDATE SET
+        bottle_feedings = daily_stats.bottle_feedings + EXCLUDED.bottle_feedings,
+        bottle_ml = daily_stats.bottle_ml + EXCLUDED.bottle_ml,
+        last_bottle_ml = CASE WHEN EXCLUDED.last_bottle_at >= daily_stats.last_bottle_at
+                                   OR daily_stats.last_bottle_at IS NULL
+                              THEN EXCLUDED.last_bottle_ml ELSE daily_stats.last_bottle_ml END,
+        last_bottle_at = GREATEST(daily_stats.last_bottle_at, EXCLUDED.last_bottle_at),
+        sleep_sessions = daily_stats.sleep_sessions + EXCLUDED.sleep_sessions,
+        sleep_minutes = daily_stats.sleep_minutes + EXCLUDED.sleep_minutes,
+        last_sleep_duration = CASE WHEN EXCLUDED.last_sleep_end >= daily_stats.last_sleep_end
+                                        OR daily_stats.last_sleep_end IS NULL
+                                   THEN EXCLUDED.last_sleep_duration ELSE daily_stats.last_sleep_duration END,
+        last_sleep_end = GREATEST(daily_stats.last_sleep_end, EXCLUDED.last_sleep_end),
+        breast_sessions = daily_stats.breast_sessions + EXCLUDED.breast_sessions,
+        breast_minutes = daily_stats.breast_minutes + EXCLUDED.breast_minutes,
+        breast_left = daily_stats.breast_left + EXCLUDED.breast_left,
+        breast_right = daily_stats.breast_right + EXCLUDED.breast_right,
+        diaper_changes = daily_stats.diaper_changes + EXCLUDED.diaper_changes,
+        diapers_wet = daily_stats.diapers_wet + EXCLUDED.diapers_wet,
+        diapers_dirty = daily_stats.diapers_dirty + EXCLUDED.diapers_dirty,
+        diapers_mixed = daily_stats.diapers_mixed + EXCLUDED.diapers_mixed,
+        last_weight = CASE WHEN EXCLUDED.last_weight_at >= daily_stats.last_weight_at
+                                OR daily_stats.last_weight_at IS NULL
+                           THEN EXCLUDED.last_weight ELSE daily_stats.last_weight END,
+        last_weight_at = GREATEST(daily_stats.last_weight_at, EXCLUDED.last_weight_at),
+        updated_at = NOW()
+    """
+
+    # Aggregates over events / sessions rows, named like the daily_stats columns.
+    # Diaper notes hold either the type code or its Russian name.
+    _EVENT_AGGREGATES = """
+           COUNT(*) FILTER (WHERE event_type = 'bottle_feeding') AS bottle_feedings,
+           COALESCE(SUM(amount) FILTER (WHERE event_type = 'bottle_feeding'), 0) AS bottle_ml,
+           MAX(timestamp) FILTER (WHERE event_type = 'bottle_feeding') AS last_bottle_at,
+           (ARRAY_AGG(amount ORDER BY timestamp DESC)
+                FILTER (WHERE event_type = 'bottle_feeding'))[1] AS last_bottle_ml,
+           COUNT(*) FILTER (WHERE event_type = 'diaper') AS diaper_changes,
+           COUNT(*) FILTER (WHERE event_type = 'diaper' AND notes IN ('wet', 'мокрый')) AS diapers_wet,
+           COUNT(*) FILTER (WHERE event_type = 'diaper' AND notes IN ('dirty', 'грязный')) AS diapers_dirty,
+           COUNT(*) FILTER (WHERE event_type = 'diaper' AND notes IN ('mixed', 'смешанный')) AS diapers_mixed,
+           (ARRAY_AGG(amount ORDER BY timestamp DESC) FILTER (WHERE event_type = 'weight'))[1] AS last_weight,
+           MAX(timestamp) FILTER (WHERE event_type = 'weight') AS last_weight_at"""
+
+    _SESSION_AGGREGATES = """
+           COUNT(*) FILTER (WHERE kind = 'sleep') AS sleep_sessions,
+           COALESCE(SUM(duration) FILTER (WHERE kind = 'sleep'), 0) AS sleep_minutes,
+           MAX(end_time) FILTER (WHERE kind = 'sleep') AS last_sleep_end,
+           (ARRAY_AGG(duration ORDER BY end_time DESC) FILTER (WHERE kind = 'sleep'))[1] AS last_sleep_duration,
+           COUNT(*) FILTER (WHERE kind = 'breast_feeding') AS breast_sessions,
+           COALESCE(SUM(duration) FILTER (WHERE kind = 'breast_feeding'), 0) AS breast_minutes,
+           COUNT(*) FILTER (WHERE kind = 'breast_feeding' AND side = 'left') AS breast_left,
+           COUNT(*) FILTER (WHERE kind = 'breast_feeding' AND side = 'right') AS breast_right"""
+
+    FOLD_EVENTS = """
+    INSERT INTO daily_stats (baby_id, day, bottle_feedings, bottle_ml, last_bottle_at, last_bottle_ml,
+                             diaper_changes, diapers_wet, diapers_dirty, diapers_mixed, last_weight, last_weight_at)
+    SELECT baby_id, (timestamp AT TIME ZONE %(tz)s)::date,""" + _EVENT_AGGREGATES + """
+    FROM {source}
+    WHERE event_type IN ('bottle_feeding', 'diaper', 'weight')
+    GROUP BY 1, 2
+    """ + _MERGE
+
+    FOLD_SESSIONS = """
+    INSERT INTO daily_stats (baby_id, day, sleep_sessions, sleep_minutes, last_sleep_end, last_sleep_duration,
+                             breast_sessions, breast_minutes, breast_left, breast_right)
+    SELECT baby_id, (end_time AT TIME ZONE %(tz)s)::date,""" + _SESSION_AGGREGATES + """
+    FROM {source}
+    GROUP BY 1, 2
+    """ + _MERGE
+
+    # The same counters for an arbitrary [start, end), as one row shaped like a
+    # daily_stats row; each side is a single index range scan
+    _AGGREGATE_RANGE = """
+    SELECT * FROM (
+        SELECT""" + _EVENT_AGGREGATES + """
+        FROM events
+        WHERE baby_id = %(baby_id)s AND timestamp >= %(start)s AND timestamp < %(end)s
+          AND event_type IN ('bottle_feeding', 'diaper', 'weight')
+    ) event_totals
+    CROSS JOIN (
+        SELECT""" + _SESSION_AGGREGATES + """
+        FROM sessions
+        WHERE baby_id = %(baby_id)s AND end_time >= %(start)s AND end_time < %(end)s
+    ) session_totals
+    """
+
+    _SELECT_RANGE = """
+    SELECT * FROM daily_stats
+    WHERE baby_id = %s AND day >= %s AND day <= %s
+    ORDER BY day
+    """
+
+    # Rollup days in the rebuilt range before the oldest event left: their events
+    # were archived, so a rebuild would drop their counters for good
+    _ARCHIVED_IN_RANGE = """
+    SELECT EXISTS (
+        SELECT 1 FROM daily_stats
+        WHERE (%(since)s::date IS NULL OR day >= %(since)s::date)
+          AND day < COALESCE((SELECT (MIN(timestamp) AT TIME ZONE %(tz)s)::date FROM events), 'infinity')
+    ) AS archived
+    """
+
+    _IS_BUILT = "SELECT EXISTS (SELECT 1 FROM daily_stats_built) AS built"
+
+    _MARK_BUILT = """
+    INSERT INTO daily_stats_built (id, built_at) VALUES (TRUE, NOW())
+    ON CONFLICT (id) DO UPDATE SET built_at = EXCLUDED.built_at
+    """
+
+    # Once built, the rollup stays built for the life of the process
+    _built = False
+
+    @staticmethod
+    def rebuild(since=None, if_not_built=False):
+        """Recompute the rollup from events and sessions, for days from `since` (a date) on or for all days.
+
+        Returns the number of day rows written, or None when `if_not_built` is
+        set and a full rebuild has already run. Only a full rebuild marks the
+        rollup as built. Days whose events partitions were archived are gone
+        from the events table, so rebuilding them is refused: rebuild from a
+        date after the archived months to keep their rollup rows.
+        """
+        # Cheap check first: the lock below stalls every event write of the running instances
+        if if_not_built and DailyStats.is_built():
+            return None
+        params = {'tz': TIMEZONE, 'since': since}
+        with db.get_connection() as conn:
+            with db.get_cursor(conn) as cur:
+                # Live writers wait for the rebuild instead of adding to rows it replaces
+                cur.execute("LOCK TABLE daily_stats IN EXCLUSIVE MODE")
+                if if_not_built:
+                    # Checked again under the lock, so instances starting together build it once
+                    cur.execute(DailyStats._IS_BUILT)
+                    if cur.fetchone()['built']:
+                        return None
+                cur.execute(DailyStats._ARCHIVED_IN_RANGE, params)
+                if cur.fetchone()['archived']:
+                    raise RuntimeError("Some rollup days to rebuild have their events archived; "
+                                       "rebuild with a `since` date after the archived months")
+                cur.execute("DELETE FROM daily_stats WHERE %(since)s::date IS NULL OR day >= %(since)s::date", params)
+                cur.execute(DailyStats.FOLD_EVENTS.format(source="""(
+                    SELECT * FROM events
+                    WHERE %(since)s::date IS NULL OR timestamp >= (%(since)s::date::timestamp AT TIME ZONE %(tz)s)
+                ) AS src"""), params)
+                cur.execute(DailyStats.FOLD_SESSIONS.format(source="""(
+                    SELECT * FROM sessions
+                    WHERE %(since)s::date IS NULL OR end_time >= (%(since)s::date::timestamp AT TIME ZONE %(tz)s)
+                ) AS src"""), params)
+                if since is None:
+                    cur.execute(DailyStats._MARK_BUILT)
+                cur.execute("SELECT COUNT(*) AS count FROM daily_stats WHERE %(since)s::date IS NULL "
+                            "OR day >= %(since)s::date", params)
+                return cur.fetchone()['count']
+
+    @staticmethod
+    def is_built():
+        """Whether a full rebuild has filled the rollup; until then it misses the days before it was created"""
+        if not DailyStats._built:
+            DailyStats._built = db.fetch_one(DailyStats._IS_BUILT)['built']
+        return DailyStats._built
+
+    @staticmethod
+    def get_range(baby_id, first_day, last_day):
+        """Rollup rows for the local days first_day..last_day inclusive, oldest first"""
+        return db.fetch_all(DailyStats._SELECT_RANGE, (baby_id, first_day, last_day))
+
+    @staticmethod
+    def aggregate_range(baby_id, start_time, end_time):
+        """Counters for events and sessions within [start_time, end_time), computed in Postgres"""
+        return db.fetch_one(DailyStats._AGGREGATE_RANGE, {'baby_id': baby_id, 'start': start_time, 'end': end_time})
+
+    # Async variants for use from handlers/services running on the event loop
+
+    @staticmethod
+    async def is_built_async():
+        """Whether a full rebuild has filled the rollup; until then it misses the days before it was created"""
+        if not DailyStats._built:
+            DailyStats._built = (await adb.fetch_one(DailyStats._IS_BUILT))['built']
+        return DailyStats._built
+
+    @staticmethod
+    async def get_range_async(baby_id, first_day, last_day):
+        """Rollup rows for the local days first_day..last_day inclusive, oldest first"""
+        return await adb.fetch_all(DailyStats._SELECT_RANGE, (baby_id, first_day, last_day))
+
+    @staticmethod
+    async def aggregate_range_async(baby_id, start_time, end_time):
+        """Counters for events and sessions within [start_time, end_time), computed in Postgres"""
+        return await adb.fetch_one(DailyStats._AGGREGATE_RANGE,
+                                   {'baby_id': baby_id, 'start': start_time, 'end': end_time})
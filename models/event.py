@@ -1,7 +1,10 @@
 from services.database import db
-from datetime import datetime
+from services.async_database import adb
+from datetime import datetime, timedelta
+import json
 import pytz
 from config import TIMEZONE
+from models.daily_stats import DailyStats
 
 
 class Event:
@@ -13,92 +16,306 @@ class Event:
     WEIGHT = 'weight'
     DIAPER = 'diaper'
 
+    # Session kinds tracked in open_sessions, with their start/end event types
+    SESSION_SLEEP = 'sleep'
+    SESSION_BREAST_FEEDING = 'breast_feeding'
+    SESSION_TYPES = {
+        SESSION_SLEEP: (SLEEP_START, SLEEP_END),
+        SESSION_BREAST_FEEDING: (BREAST_FEEDING_START, BREAST_FEEDING_END),
+    }
+    SESSION_KIND_BY_START = {start: kind for kind, (start, _) in SESSION_TYPES.items()}
+
+    # Columns covered by the event indexes; hot queries select only these
+    COLUMNS = "id, baby_id, event_type, timestamp, amount, duration, notes"
+
+    _NEW_EVENT = """
+    new_event AS (
+        INSERT INTO events (baby_id, event_type, timestamp, amount, notes, duration, created_by)
+        VALUES (%(baby_id)s, %(event_type)s, %(timestamp)s, %(amount)s, %(notes)s, %(duration)s, %(created_by)s)
+        RETURNING id, baby_id, event_type, timestamp, amount, notes
+    )"""
+
+    # Bottle feedings, diapers and weights are added to the daily_stats rollup in the same statement
+    _INSERT = f"""
+    WITH {_NEW_EVENT},
+    rollup AS ({DailyStats.FOLD_EVENTS.format(source='new_event')})
+    SELECT id FROM new_event
+    """
+
+    # A start event also becomes the open session of its kind, in the same statement.
+    # A back-dated start never replaces a later one that is already open.
+    _INSERT_START = f"""
+    WITH {_NEW_EVENT},
+    open_session AS (
+        INSERT INTO open_sessions (baby_id, kind, event_id, started_at)
+        SELECT baby_id, %(kind)s, id, timestamp FROM new_event
+        ON CONFLICT (baby_id, kind) DO UPDATE
+        SET event_id = EXCLUDED.event_id, started_at = EXCLUDED.started_at
+        WHERE open_sessions.started_at <= EXCLUDED.started_at
+    )
+    SELECT id FROM new_event
+    """
+
+    _SELECT_LAST_BY_TYPE = f"""
+    SELECT {COLUMNS} FROM events
+    WHERE baby_id = %s AND event_type = %s
+    ORDER BY timestamp DESC
+    LIMIT 1
+    """
+
+    _SELECT_SINCE = f"""
+    SELECT {COLUMNS} FROM events
+    WHERE baby_id = %s AND timestamp >= %s AND event_type = ANY(%s)
+    ORDER BY timestamp DESC
+    """
+
+    _SELECT_BETWEEN = f"""
+    SELECT {COLUMNS} FROM events
+    WHERE baby_id = %s AND timestamp >= %s AND timestamp < %s AND event_type = ANY(%s)
+    ORDER BY timestamp DESC
+    """
+
+    # The period's events as parallel arrays in one row, oldest first: epoch
+    # seconds, the index of the type in the given list, and the amount (0 if none)
+    _SELECT_COLUMNS = """
+    SELECT COALESCE(ARRAY_AGG(EXTRACT(EPOCH FROM timestamp)::bigint ORDER BY timestamp), '{}') AS timestamps,
+           COALESCE(ARRAY_AGG(array_position(%(types)s::text[], event_type::text) - 1 ORDER BY timestamp),
+                    '{}') AS types,
+           COALESCE(ARRAY_AGG(COALESCE(amount, 0) ORDER BY timestamp), '{}') AS amounts
+    FROM events
+    WHERE baby_id = %(baby_id)s AND timestamp >= %(start)s AND timestamp < %(end)s AND event_type = ANY(%(types)s)
+    """
+
+    _SELECT_BY_PERIOD = """
+    SELECT * FROM events
+    WHERE baby_id = %s AND event_type = %s
+    AND timestamp >= NOW() - %s * INTERVAL '1 hour'
+    ORDER BY timestamp DESC
+    """
+
+    # Joining on the partition key as well lets Postgres probe a single partition
+    _SELECT_ACTIVE = """
+    SELECT events.* FROM open_sessions
+    JOIN events ON events.id = open_sessions.event_id AND events.timestamp = open_sessions.started_at
+    WHERE open_sessions.baby_id = %s AND open_sessions.kind = %s
+    """
+
+    _SELECT_OPEN_SESSIONS = "SELECT baby_id, kind, started_at FROM open_sessions"
+
+    # Closes the open session in one statement: removes it from open_sessions,
+    # inserts the end event, records the completed session and adds it to the
+    # daily_stats rollup. Deleting the
+    # open_sessions row locks it, so a concurrent close of the same session
+    # finds nothing and inserts no second end event.
+    _CLOSE_SESSION = f"""
+    WITH open_session AS (
+        DELETE FROM open_sessions
+        WHERE baby_id = %(baby_id)s AND kind = %(kind)s
+        RETURNING event_id, started_at
+    ),
+    end_event AS (
+        INSERT INTO events (baby_id, event_type, timestamp, notes, duration, created_by)
+        SELECT %(baby_id)s, %(end_type)s, %(end_time)s, %(notes)s,
+               TRUNC(EXTRACT(EPOCH FROM (%(end_time)s::timestamptz - started_at)) / 60)::int,
+               %(created_by)s
+        FROM open_session
+        RETURNING *
+    ),
+    session AS (
+        INSERT INTO sessions (baby_id, kind, start_event_id, end_event_id, start_time, end_time, duration, side,
+                              created_by)
+        SELECT end_event.baby_id, %(kind)s, open_session.event_id, end_event.id, open_session.started_at,
+               end_event.timestamp, end_event.duration, end_event.notes, end_event.created_by
+        FROM end_event
+        CROSS JOIN open_session
+        RETURNING baby_id, kind, end_time, duration, side
+    ),
+    rollup AS ({DailyStats.FOLD_SESSIONS.format(source='session')})
+    SELECT end_event.id, end_event.timestamp, end_event.duration,
+           open_session.event_id AS start_id, open_session.started_at AS start_timestamp,
+           row_to_json(babies) AS baby
+    FROM end_event
+    CROSS JOIN open_session
+    JOIN babies ON babies.id = end_event.baby_id
+    """
+
+    # Latest start per baby that has no end event after it
+    _REBUILD_OPEN_SESSIONS = """
+    INSERT INTO open_sessions (baby_id, kind, event_id, started_at)
+    SELECT DISTINCT ON (s.baby_id) s.baby_id, %s, s.id, s.timestamp
+    FROM events s
+    WHERE s.event_type = %s
+    AND NOT EXISTS (
+        SELECT 1 FROM events e
+        WHERE e.baby_id = s.baby_id
+        AND e.event_type = %s
+        AND e.timestamp > s.timestamp
+    )
+    ORDER BY s.baby_id, s.timestamp DESC
+    """
+
     @staticmethod
-    def create_table():
-        query = """
-        CREATE TABLE IF NOT EXISTS events (
-            id SERIAL PRIMARY KEY,
-            baby_id INTEGER NOT NULL,
-            event_type VARCHAR(50) NOT NULL,
-            timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-            amount INTEGER,
-            notes TEXT,
-            duration INTEGER,
-            created_by BIGINT,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-        db.execute_query(query)
+    def rebuild_open_sessions():
+        """Re-derive open_sessions from the events history and return the number of open sessions"""
+        with db.get_connection() as conn:
+            with db.get_cursor(conn) as cur:
+                cur.execute("DELETE FROM open_sessions")
+                count = 0
+                for kind, (start_type, end_type) in Event.SESSION_TYPES.items():
+                    cur.execute(Event._REBUILD_OPEN_SESSIONS, (kind, start_type, end_type))
+                    count += cur.rowcount
+                return count
 
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_events_baby_id ON events(baby_id)",
-            "CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type)",
-            "CREATE INDEX IF NOT EXISTS idx_events_baby_type ON events(baby_id, event_type)"
-        ]
-        for index_query in indexes:
-            db.execute_query(index_query)
+    @staticmethod
+    def _insert_query(baby_id, event_type, created_by, amount, notes, duration, timestamp):
+        params = {'baby_id': baby_id, 'event_type': event_type, 'timestamp': timestamp, 'amount': amount,
+                  'notes': notes, 'duration': duration, 'created_by': created_by, 'tz': TIMEZONE}
+        kind = Event.SESSION_KIND_BY_START.get(event_type)
+        if kind:
+            return Event._INSERT_START, dict(params, kind=kind)
+        return Event._INSERT, params
 
     @staticmethod
     def add(baby_id, event_type, created_by, amount=None, notes=None, duration=None, timestamp=None):
         if timestamp is None:
             timestamp = datetime.now(pytz.timezone(TIMEZONE))
 
-        query = """
-        INSERT INTO events (baby_id, event_type, timestamp, amount, notes, duration, created_by)
-        VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
-        """
-        result = db.fetch_one(query, (baby_id, event_type, timestamp, amount, notes, duration, created_by))
+        query, params = Event._insert_query(baby_id, event_type, created_by, amount, notes, duration, timestamp)
+        result = db.fetch_one(query, params)
         return result['id'] if result else None
 
     @staticmethod
     def get_last_by_type(baby_id, event_type):
-        query = """
-        SELECT * FROM events 
-        WHERE baby_id = %s AND event_type = %s 
-        ORDER BY timestamp DESC 
-        LIMIT 1
+        return db.fetch_one(Event._SELECT_LAST_BY_TYPE, (baby_id, event_type))
+
+    @staticmethod
+    def get_since(baby_id, start_time, event_types):
+        """Events of the given types since start_time, newest first"""
+        return db.fetch_all(Event._SELECT_SINCE, (baby_id, start_time, list(event_types)))
+
+    @staticmethod
+    def explain_hot_queries(baby_id, disable_seqscan=False):
+        """EXPLAIN the hot event lookups and report which scan nodes they use.
+
+        Returns a list of {'name', 'scans', 'ok'} dicts; a query is ok when every
+        scan is an index or index-only scan and there is no explicit sort.
+        With disable_seqscan the planner is told to avoid sequential scans, which
+        is useful on small databases where a seq scan is always cheapest.
         """
-        return db.fetch_one(query, (baby_id, event_type))
+        since = datetime.now(pytz.timezone(TIMEZONE)) - timedelta(days=1)
+        hot_queries = [
+            ('get_last_by_type', Event._SELECT_LAST_BY_TYPE, (baby_id, Event.BOTTLE_FEEDING)),
+            ('get_since', Event._SELECT_SINCE,
+             (baby_id, since, [Event.BOTTLE_FEEDING, Event.DIAPER, Event.WEIGHT])),
+            ('get_active', Event._SELECT_ACTIVE, (baby_id, Event.SESSION_SLEEP)),
+        ]
+
+        def collect_nodes(plan, nodes):
+            nodes.append(plan['Node Type'])
+            for child in plan.get('Plans', []):
+                collect_nodes(child, nodes)
+            return nodes
+
+        report = []
+        with db.get_connection() as conn:
+            with db.get_cursor(conn) as cur:
+                if disable_seqscan:
+                    cur.execute("SET LOCAL enable_seqscan = off")
+                for name, query, params in hot_queries:
+                    cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                    explained = cur.fetchone()[0]
+                    if isinstance(explained, str):
+                        explained = json.loads(explained)
+                    plan = explained[0]['Plan']
+                    nodes = collect_nodes(plan, [])
+                    scans = [node for node in nodes if 'Scan' in node]
+                    ok = all(node in ('Index Scan', 'Index Only Scan') for node in scans) and 'Sort' not in nodes
+                    report.append({'name': name, 'scans': scans, 'ok': ok})
+        return report
 
     @staticmethod
     def get_events_by_period(baby_id, event_type, hours=24):
-        query = """
-        SELECT * FROM events 
-        WHERE baby_id = %s AND event_type = %s 
-        AND timestamp >= NOW() - INTERVAL '%s hours'
-        ORDER BY timestamp DESC
-        """
-        return db.fetch_all(query, (baby_id, event_type, hours))
+        return db.fetch_all(Event._SELECT_BY_PERIOD, (baby_id, event_type, hours))
 
     @staticmethod
     def get_active_sleep(baby_id):
-        query = """
-        SELECT * FROM events 
-        WHERE baby_id = %s AND event_type = %s 
-        AND NOT EXISTS (
-            SELECT 1 FROM events e2 
-            WHERE e2.baby_id = events.baby_id 
-            AND e2.event_type = %s 
-            AND e2.timestamp > events.timestamp
-        )
-        ORDER BY timestamp DESC 
-        LIMIT 1
-        """
-        return db.fetch_one(query, (baby_id, Event.SLEEP_START, Event.SLEEP_END))
+        return db.fetch_one(Event._SELECT_ACTIVE, (baby_id, Event.SESSION_SLEEP))
 
     @staticmethod
     def get_active_breast_feeding(baby_id):
-        query = """
-        SELECT * FROM events 
-        WHERE baby_id = %s AND event_type = %s 
-        AND NOT EXISTS (
-            SELECT 1 FROM events e2 
-            WHERE e2.baby_id = events.baby_id 
-            AND e2.event_type = %s 
-            AND e2.timestamp > events.timestamp
-        )
-        ORDER BY timestamp DESC 
-        LIMIT 1
+        return db.fetch_one(Event._SELECT_ACTIVE, (baby_id, Event.SESSION_BREAST_FEEDING))
+
+    # Async variants for use from handlers/services running on the event loop
+
+    @staticmethod
+    async def add_async(baby_id, event_type, created_by, amount=None, notes=None, duration=None, timestamp=None,
+                        tx=None):
+        """`tx` is an open ``adb.transaction()`` to run in, if any"""
+        if timestamp is None:
+            timestamp = datetime.now(pytz.timezone(TIMEZONE))
+
+        query, params = Event._insert_query(baby_id, event_type, created_by, amount, notes, duration, timestamp)
+        result = await (tx or adb).fetch_one(query, params)
+        return result['id'] if result else None
+
+    @staticmethod
+    async def close_session_async(baby_id, kind, created_by, end_time=None, notes=None, tx=None):
+        """Close the open session of `kind`, computing its duration and recording it in sessions.
+
+        Returns a row with the end event (id, timestamp, duration), the start
+        event (start_id, start_timestamp) and the baby as a dict, or None when
+        there is no open session. `tx` is an open ``adb.transaction()`` to run in.
         """
-        return db.fetch_one(query, (baby_id, Event.BREAST_FEEDING_START, Event.BREAST_FEEDING_END))
\ No newline at end of file
+        if end_time is None:
+            end_time = datetime.now(pytz.timezone(TIMEZONE))
+
+        return await (tx or adb).fetch_one(Event._CLOSE_SESSION, {
+            'baby_id': baby_id,
+            'kind': kind,
+            'end_type': Event.SESSION_TYPES[kind][1],
+            'end_time': end_time,
+            'notes': notes,
+            'created_by': created_by,
+            'tz': TIMEZONE,
+        })
+
+    @staticmethod
+    async def get_last_by_type_async(baby_id, event_type):
+        return await adb.fetch_one(Event._SELECT_LAST_BY_TYPE, (baby_id, event_type))
+
+    @staticmethod
+    async def get_since_async(baby_id, start_time, event_types):
+        """Events of the given types since start_time, newest first"""
+        return await adb.fetch_all(Event._SELECT_SINCE, (baby_id, start_time, list(event_types)))
+
+    @staticmethod
+    async def get_between_async(baby_id, start_time, end_time, event_types):
+        """Events of the given types within [start_time, end_time), newest first"""
+        return await adb.fetch_all(Event._SELECT_BETWEEN, (baby_id, start_time, end_time, list(event_types)))
+
+    @staticmethod
+    async def get_columns_async(baby_id, start_time, end_time, event_types):
+        """Events within [start_time, end_time) as {'timestamps', 'types', 'amounts'} lists, oldest first.
+
+        `types` holds each event's index in `event_types`; one row is transferred
+        however long the period is.
+        """
+        return await adb.fetch_one(Event._SELECT_COLUMNS, {'baby_id': baby_id, 'start': start_time,
+                                                           'end': end_time, 'types': list(event_types)})
+
+    @staticmethod
+    async def get_events_by_period_async(baby_id, event_type, hours=24):
+        return await adb.fetch_all(Event._SELECT_BY_PERIOD, (baby_id, event_type, hours))
+
+    @staticmethod
+    async def get_open_sessions_async():
+        """Every session in progress, for all babies: rows of (baby_id, kind, started_at)"""
+        return await adb.fetch_all(Event._SELECT_OPEN_SESSIONS)
+
+    @staticmethod
+    async def get_active_sleep_async(baby_id):
+        return await adb.fetch_one(Event._SELECT_ACTIVE, (baby_id, Event.SESSION_SLEEP))
+
+    @staticmethod
+    async def get_active_breast_feeding_async(baby_id):
+        return await adb.fetch_one(Event._SELECT_ACTIVE, (baby_id, Event.SESSION_BREAST_FEEDING))
@@ -0,0 +1,92 @@
+from services.async_database import adb
+
+
+class Notification:
+    """Outgoing group messages (the notification outbox)"""
+
+    # next_attempt_at is pushed `delay` seconds ahead to leave room for coalescing
+    _INSERT = """
+    INSERT INTO notification_outbox (chat_id, baby_id, text, user_name, event_time, next_attempt_at)
+    VALUES (%s, %s, %s, %s, %s, NOW() + %s * INTERVAL '1 second') RETURNING id
+    """
+
+    # Leases a batch of due messages: next_attempt_at moves `lease` seconds ahead,
+    # so a sender that dies mid-batch only delays them. Fresh messages for the same
+    # chat and baby as a due one are taken along early so they can be merged with
+    # it. Rows that used up their attempts stay in the table, unsent, for inspection.
+    # RETURNING has no defined order; the outer SELECT hands the rows to coalesce oldest first.
+    _CLAIM_DUE = """
+    WITH due AS (
+        SELECT id, chat_id, baby_id FROM notification_outbox
+        WHERE sent_at IS NULL AND next_attempt_at <= NOW() AND attempts < %(max_attempts)s
+    ),
+    claimed AS (
+        UPDATE notification_outbox o
+        SET attempts = o.attempts + 1, next_attempt_at = NOW() + %(lease)s * INTERVAL '1 second'
+        WHERE o.id IN (
+            SELECT n.id FROM notification_outbox n
+            WHERE n.sent_at IS NULL AND n.attempts < %(max_attempts)s
+              AND (n.id IN (SELECT id FROM due)
+                   OR (n.attempts = 0 AND EXISTS (
+                       SELECT 1 FROM due
+                       WHERE due.chat_id = n.chat_id AND due.baby_id IS NOT DISTINCT FROM n.baby_id)))
+            ORDER BY n.id
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING o.*
+    )
+    SELECT * FROM claimed ORDER BY created_at, id
+    """
+
+    _MARK_SENT = "UPDATE notification_outbox SET sent_at = NOW(), last_error = NULL WHERE id = ANY(%s)"
+
+    _RETRY = """
+    UPDATE notification_outbox
+    SET next_attempt_at = NOW() + %s * INTERVAL '1 second', last_error = %s
+    WHERE id = ANY(%s)
+    """
+
+    _GIVE_UP = "UPDATE notification_outbox SET attempts = %s, last_error = %s WHERE id = ANY(%s)"
+
+    _COUNT_PENDING = """
+    SELECT COUNT(*) AS pending FROM notification_outbox
+    WHERE sent_at IS NULL AND attempts < %s
+    """
+
+    _DELETE_OLD = "DELETE FROM notification_outbox WHERE sent_at < NOW() - %s * INTERVAL '1 day'"
+
+    @staticmethod
+    async def enqueue_async(chat_id, text, user_name=None, event_time=None, baby_id=None, delay=0, tx=None):
+        """`tx` is the ``adb.transaction()`` that writes the event, so both commit together"""
+        result = await (tx or adb).fetch_one(Notification._INSERT,
+                                             (chat_id, baby_id, text, user_name, event_time, delay))
+        return result['id'] if result else None
+
+    @staticmethod
+    async def claim_due_async(limit, lease, max_attempts):
+        """Lease up to `limit` due rows, oldest first"""
+        return await adb.fetch_all(Notification._CLAIM_DUE,
+                                   {'lease': lease, 'max_attempts': max_attempts, 'limit': limit})
+
+    @staticmethod
+    async def mark_sent_async(ids):
+        await adb.execute_query(Notification._MARK_SENT, (list(ids),))
+
+    @staticmethod
+    async def retry_async(ids, delay, error):
+        await adb.execute_query(Notification._RETRY, (delay, error, list(ids)))
+
+    @staticmethod
+    async def give_up_async(ids, max_attempts, error):
+        await adb.execute_query(Notification._GIVE_UP, (max_attempts, error, list(ids)))
+
+    @staticmethod
+    async def count_pending_async(max_attempts):
+        result = await adb.fetch_one(Notification._COUNT_PENDING, (max_attempts,))
+        return result['pending'] if result else 0
+
+    @staticmethod
+    async def delete_old_async(days=7):
+        """Delete sent messages older than `days` and return the count"""
+        return await adb.execute_query(Notification._DELETE_OLD, (days,))
@@ -1,56 +1,141 @@
 from services.database import db
+from services.async_database import adb
 from datetime import datetime
 import pytz
 from config import TIMEZONE
 
 
 class Reminder:
-    @staticmethod
-    def create_table():
-        query = """
-        CREATE TABLE IF NOT EXISTS reminders (
-            id SERIAL PRIMARY KEY,
-            baby_id INTEGER NOT NULL,
-            reminder_type VARCHAR(50) NOT NULL,
-            scheduled_time TIMESTAMP WITH TIME ZONE NOT NULL,
-            sent BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-        db.execute_query(query)
-
-        # Create index for performance
-        db.execute_query(
-            "CREATE INDEX IF NOT EXISTS idx_reminders_scheduled ON reminders(scheduled_time, sent)"
-        )
+    _INSERT = """
+    INSERT INTO reminders (baby_id, reminder_type, scheduled_time)
+    VALUES (%s, %s, %s) RETURNING id
+    """
+
+    _SELECT_PENDING = """
+    SELECT * FROM reminders 
+    WHERE scheduled_time <= NOW() AND sent = FALSE
+    ORDER BY scheduled_time ASC
+    """
+
+    _SELECT_UNSENT = """
+    SELECT * FROM reminders
+    WHERE sent = FALSE
+    ORDER BY scheduled_time ASC
+    """
+
+    # Leases a batch of due reminders and returns them with their baby: claimed_until
+    # moves `lease` seconds ahead, so a worker that dies before sending only delays
+    # them. Rows locked or leased by another worker are skipped, so each reminder
+    # is claimed only once at a time.
+    _CLAIM_DUE = """
+    WITH due AS (
+        SELECT id FROM reminders
+        WHERE scheduled_time <= NOW() AND sent = FALSE
+          AND (claimed_until IS NULL OR claimed_until < NOW())
+        ORDER BY scheduled_time ASC
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ), claimed AS (
+        UPDATE reminders r
+        SET attempts = r.attempts + 1, claimed_until = NOW() + %s * INTERVAL '1 second'
+        FROM due
+        WHERE r.id = due.id
+        RETURNING r.*
+    )
+    SELECT claimed.*, row_to_json(b) AS baby
+    FROM claimed
+    LEFT JOIN babies b ON b.id = claimed.baby_id
+    ORDER BY claimed.scheduled_time ASC
+    """
+
+    # Puts failed reminders back with exponential backoff. Those that ran out of
+    # attempts or were replaced by a newer reminder of the same type are given up
+    # (marked sent); `requeued` tells them apart.
+    _REQUEUE = """
+    WITH failed AS (
+        SELECT r.id,
+               r.attempts < %(max_attempts)s AND NOT EXISTS (
+                   SELECT 1 FROM reminders n
+                   WHERE n.baby_id = r.baby_id AND n.reminder_type = r.reminder_type
+                     AND n.sent = FALSE AND n.id > r.id
+               ) AS requeued
+        FROM reminders r
+        WHERE r.id = ANY(%(ids)s)
+    )
+    UPDATE reminders r
+    SET sent = NOT failed.requeued,
+        claimed_until = NULL,
+        scheduled_time = CASE WHEN failed.requeued
+                              THEN NOW() + LEAST(%(base_delay)s * power(2, r.attempts - 1), %(max_delay)s)
+                                           * INTERVAL '1 second'
+                              ELSE r.scheduled_time END
+    FROM failed
+    WHERE r.id = failed.id
+    RETURNING r.id, r.baby_id, r.reminder_type, r.scheduled_time, failed.requeued
+    """
+
+    _MARK_SENT = "UPDATE reminders SET sent = TRUE, claimed_until = NULL WHERE id = %s"
+
+    _DELETE_OLD = "DELETE FROM reminders WHERE sent = TRUE AND created_at < NOW() - %s * INTERVAL '1 day'"
 
     @staticmethod
     def add(baby_id, reminder_type, scheduled_time):
-        query = """
-        INSERT INTO reminders (baby_id, reminder_type, scheduled_time)
-        VALUES (%s, %s, %s) RETURNING id
-        """
-        result = db.fetch_one(query, (baby_id, reminder_type, scheduled_time))
+        result = db.fetch_one(Reminder._INSERT, (baby_id, reminder_type, scheduled_time))
         return result['id'] if result else None
 
     @staticmethod
     def get_pending_reminders():
         """Get reminders that are due and not sent"""
-        query = """
-        SELECT * FROM reminders 
-        WHERE scheduled_time <= NOW() AND sent = FALSE
-        ORDER BY scheduled_time ASC
-        """
-        return db.fetch_all(query)
+        return db.fetch_all(Reminder._SELECT_PENDING)
+
+    @staticmethod
+    def get_unsent_reminders():
+        """All reminders not sent yet, due or not"""
+        return db.fetch_all(Reminder._SELECT_UNSENT)
 
     @staticmethod
     def mark_as_sent(reminder_id):
-        query = "UPDATE reminders SET sent = TRUE WHERE id = %s"
-        db.execute_query(query, (reminder_id,))
+        db.execute_query(Reminder._MARK_SENT, (reminder_id,))
 
     @staticmethod
     def delete_old_reminders(days=7):
         """Delete old sent reminders and return count of deleted rows"""
-        query = "DELETE FROM reminders WHERE sent = TRUE AND created_at < NOW() - INTERVAL '%s days'"
-        result = db.execute_query(query, (days,))
-        return result
\ No newline at end of file
+        result = db.execute_query(Reminder._DELETE_OLD, (days,))
+        return result
+
+    # Async variants for use from handlers/services running on the event loop
+
+    @staticmethod
+    async def add_async(baby_id, reminder_type, scheduled_time):
+        result = await adb.fetch_one(Reminder._INSERT, (baby_id, reminder_type, scheduled_time))
+        return result['id'] if result else None
+
+    @staticmethod
+    async def get_pending_reminders_async():
+        """Get reminders that are due and not sent"""
+        return await adb.fetch_all(Reminder._SELECT_PENDING)
+
+    @staticmethod
+    async def get_unsent_reminders_async():
+        """All reminders not sent yet, due or not"""
+        return await adb.fetch_all(Reminder._SELECT_UNSENT)
+
+    @staticmethod
+    async def claim_due_async(limit, lease):
+        """Atomically lease up to `limit` due reminders for `lease` seconds; each row carries its baby as `baby`"""
+        return await adb.fetch_all(Reminder._CLAIM_DUE, (limit, lease))
+
+    @staticmethod
+    async def requeue_async(reminder_ids, base_delay, max_delay, max_attempts):
+        """Return failed reminders to the queue or give them up; returns the rows, with `requeued`"""
+        return await adb.fetch_all(Reminder._REQUEUE, {'ids': list(reminder_ids), 'base_delay': base_delay,
+                                                       'max_delay': max_delay, 'max_attempts': max_attempts})
+
+    @staticmethod
+    async def mark_as_sent_async(reminder_id):
+        await adb.execute_query(Reminder._MARK_SENT, (reminder_id,))
+
+    @staticmethod
+    async def delete_old_reminders_async(days=7):
+        """Delete old sent reminders and return count of deleted rows"""
+        return await adb.execute_query(Reminder._DELETE_OLD, (days,))
@@ -0,0 +1,96 @@
+from services.database import db
+from services.async_database import adb
+from config import TIMEZONE
+
+
+class Session:
+    """Completed sleep / breast-feeding sessions, written when a session is closed"""
+
+    _SELECT_BY_PERIOD = """
+    SELECT * FROM sessions
+    WHERE baby_id = %s AND kind = %s AND end_time >= %s AND end_time < %s
+    ORDER BY end_time DESC
+    """
+
+    # Sessions that ended in the period as parallel arrays in one row, oldest
+    # first: end in epoch seconds, duration in minutes, kind index in the given
+    # list, side (0 unknown, 1 left, 2 right)
+    _SELECT_COLUMNS = """
+    SELECT COALESCE(ARRAY_AGG(EXTRACT(EPOCH FROM end_time)::bigint ORDER BY end_time), '{}') AS end_times,
+           COALESCE(ARRAY_AGG(COALESCE(duration, 0) ORDER BY end_time), '{}') AS durations,
+           COALESCE(ARRAY_AGG(array_position(%(kinds)s::text[], kind::text) - 1 ORDER BY end_time), '{}') AS kinds,
+           COALESCE(ARRAY_AGG(CASE side WHEN 'left' THEN 1 WHEN 'right' THEN 2 ELSE 0 END ORDER BY end_time),
+                    '{}') AS sides
+    FROM sessions
+    WHERE baby_id = %(baby_id)s AND end_time >= %(start)s AND end_time < %(end)s AND kind = ANY(%(kinds)s)
+    """
+
+    # Pairs every end event (from `since` on) with the latest start of the same kind before it
+    _REBUILD = """
+    INSERT INTO sessions (baby_id, kind, start_event_id, end_event_id, start_time, end_time, duration, side,
+                          created_by)
+    SELECT e.baby_id, %(kind)s, s.id, e.id, s.timestamp, e.timestamp, e.duration, e.notes, e.created_by
+    FROM events e
+    CROSS JOIN LATERAL (
+        SELECT id, timestamp FROM events
+        WHERE baby_id = e.baby_id AND event_type = %(start_type)s AND timestamp <= e.timestamp
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ) s
+    WHERE e.event_type = %(end_type)s
+      AND (%(since)s::date IS NULL OR e.timestamp >= (%(since)s::date::timestamp AT TIME ZONE %(tz)s))
+    ON CONFLICT (end_event_id) DO NOTHING
+    """
+
+    # Sessions in the rebuilt range that ended before the oldest event left: their
+    # events were archived, so a rebuild would delete them for good
+    _ARCHIVED_IN_RANGE = """
+    SELECT EXISTS (
+        SELECT 1 FROM sessions
+        WHERE (%(since)s::date IS NULL OR end_time >= (%(since)s::date::timestamp AT TIME ZONE %(tz)s))
+          AND end_time < COALESCE((SELECT MIN(timestamp) FROM events), 'infinity')
+    ) AS archived
+    """
+
+    @staticmethod
+    def rebuild(since=None):
+        """Re-derive completed sessions from start/end events, for those ending from `since` (a date) on or all.
+
+        Returns the number of sessions written. Refuses to replace sessions
+        whose events were archived: rebuild from a date after the archived
+        months instead.
+        """
+        from models.event import Event
+
+        params = {'tz': TIMEZONE, 'since': since}
+        with db.get_connection() as conn:
+            with db.get_cursor(conn) as cur:
+                cur.execute(Session._ARCHIVED_IN_RANGE, params)
+                if cur.fetchone()['archived']:
+                    raise RuntimeError("Some sessions to rebuild have their events archived; "
+                                       "rebuild with a `since` date after the archived months")
+                cur.execute("DELETE FROM sessions WHERE %(since)s::date IS NULL "
+                            "OR end_time >= (%(since)s::date::timestamp AT TIME ZONE %(tz)s)", params)
+                count = 0
+                for kind, (start_type, end_type) in Event.SESSION_TYPES.items():
+                    cur.execute(Session._REBUILD, dict(params, kind=kind, start_type=start_type, end_type=end_type))
+                    count += cur.rowcount
+                return count
+
+    @staticmethod
+    def get_by_period(baby_id, kind, start_time, end_time):
+        """Sessions of `kind` that ended within [start_time, end_time), newest first"""
+        return db.fetch_all(Session._SELECT_BY_PERIOD, (baby_id, kind, start_time, end_time))
+
+    # Async variants for use from handlers/services running on the event loop
+
+    @staticmethod
+    async def get_by_period_async(baby_id, kind, start_time, end_time):
+        """Sessions of `kind` that ended within [start_time, end_time), newest first"""
+        return await adb.fetch_all(Session._SELECT_BY_PERIOD, (baby_id, kind, start_time, end_time))
+
+    @staticmethod
+    async def get_columns_async(baby_id, start_time, end_time, kinds):
+        """Sessions that ended within [start_time, end_time) as {'end_times', 'durations', 'kinds', 'sides'} lists"""
+        return await adb.fetch_one(Session._SELECT_COLUMNS, {'baby_id': baby_id, 'start': start_time,
+                                                             'end': end_time, 'kinds': list(kinds)})
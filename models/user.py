@@ -1,46 +1,145 @@
 import json
+import threading
+import time
+from collections import OrderedDict
 from services.database import db
+from services.async_database import adb
+from utils.serialization import dumps, loads
+from config import USER_STATE_CACHE_SIZE, USER_STATE_CACHE_TTL
+
+
+class StateCache:
+    """Bounded LRU of decoded user states with a TTL.
+
+    A cached ``None`` means "no state in the database", so users who are not in
+    a multi-step flow don't cost a query per message either.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (state or None, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """Returns (found, state)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return True, entry[0]
+            if entry:
+                del self._entries[user_id]
+            self.misses += 1
+            return False, None
+
+    def put(self, user_id, state):
+        with self._lock:
+            self._entries[user_id] = (state, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def get_stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
 
 
 class UserState:
-    @staticmethod
-    def create_table():
-        query = """
-        CREATE TABLE IF NOT EXISTS user_states (
-            user_id BIGINT PRIMARY KEY,
-            state VARCHAR(100),
-            data JSONB,
-            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-        db.execute_query(query)
+    _UPSERT = """
+    INSERT INTO user_states (user_id, state, data)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (user_id)
+    DO UPDATE SET state = EXCLUDED.state, data = EXCLUDED.data, updated_at = CURRENT_TIMESTAMP
+    """
+    _SELECT = "SELECT state, data FROM user_states WHERE user_id = %s"
+    _DELETE = "DELETE FROM user_states WHERE user_id = %s"
+
+    # Write-through: reads are served from memory, every write also goes to Postgres
+    cache = StateCache(USER_STATE_CACHE_SIZE, USER_STATE_CACHE_TTL)
 
     @staticmethod
-    def set_state(user_id, state, data=None):
-        json_data = json.dumps(data) if data is not None else None
-        query = """
-        INSERT INTO user_states (user_id, state, data)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (user_id) 
-        DO UPDATE SET state = EXCLUDED.state, data = EXCLUDED.data, updated_at = CURRENT_TIMESTAMP
-        """
-        db.execute_query(query, (user_id, state, json_data))
+    def get_cache_stats():
+        return UserState.cache.get_stats()
 
     @staticmethod
-    def get_state(user_id):
-        query = "SELECT state, data FROM user_states WHERE user_id = %s"
-        result = db.fetch_one(query, (user_id,))
+    def _decode(result):
         if result and result['data']:
             try:
-                data_dict = json.loads(result['data'])
-                return {'state': result['state'], 'data': data_dict}
-            except (json.JSONDecodeError, TypeError):
+                return {'state': result['state'], 'data': loads(result['data'])}
+            except (json.JSONDecodeError, TypeError, ValueError):
                 return {'state': result['state'], 'data': result['data']}
         elif result:
             return {'state': result['state'], 'data': {}}
         return None
 
+    @staticmethod
+    def _encode(user_id, state, data):
+        json_data = dumps(data) if data is not None else None
+        # Cache exactly what a database read would return
+        cached = {'state': state, 'data': loads(json_data) if json_data else {}}
+        return (user_id, state, json_data), cached
+
+    @staticmethod
+    def set_state(user_id, state, data=None):
+        params, cached = UserState._encode(user_id, state, data)
+        try:
+            db.execute_query(UserState._UPSERT, params)
+        except Exception:
+            # The write may or may not have landed; let the next read ask Postgres
+            UserState.cache.invalidate(user_id)
+            raise
+        UserState.cache.put(user_id, cached)
+
+    @staticmethod
+    def get_state(user_id):
+        found, state = UserState.cache.get(user_id)
+        if not found:
+            state = UserState._decode(db.fetch_one(UserState._SELECT, (user_id,)))
+            UserState.cache.put(user_id, state)
+        return state
+
     @staticmethod
     def clear_state(user_id):
-        query = "DELETE FROM user_states WHERE user_id = %s"
-        db.execute_query(query, (user_id,))
\ No newline at end of file
+        try:
+            db.execute_query(UserState._DELETE, (user_id,))
+        except Exception:
+            UserState.cache.invalidate(user_id)
+            raise
+        UserState.cache.put(user_id, None)
+
+    # Async variants for use from handlers/services running on the event loop
+
+    @staticmethod
+    async def set_state_async(user_id, state, data=None):
+        params, cached = UserState._encode(user_id, state, data)
+        try:
+            await adb.execute_query(UserState._UPSERT, params)
+        except Exception:
+            UserState.cache.invalidate(user_id)
+            raise
+        UserState.cache.put(user_id, cached)
+
+    @staticmethod
+    async def get_state_async(user_id):
+        found, state = UserState.cache.get(user_id)
+        if not found:
+            state = UserState._decode(await adb.fetch_one(UserState._SELECT, (user_id,)))
+            UserState.cache.put(user_id, state)
+        return state
+
+    @staticmethod
+    async def clear_state_async(user_id):
+        try:
+            await adb.execute_query(UserState._DELETE, (user_id,))
+        except Exception:
+            UserState.cache.invalidate(user_id)
+            raise
+        UserState.cache.put(user_id, None)
@@ -0,0 +1,161 @@
+"""
+Compare the two ways StatsService counts a period that is not in the rollup:
+fetching events and sessions row by row and counting in Python, or one
+aggregate query counted by Postgres (STATS_AGGREGATE_IN_SQL).
+
+The script seeds a throwaway baby with `--days` days of history (bottles and
+diapers every 3 hours, a daily weight, sleeps every 4 hours, breast feedings
+every 3 hours, with their sessions), times both paths over a few period
+lengths, checks that format_stats renders the same text for both, and deletes
+the baby's data again unless `--keep` is given. It uses the database from the
+usual DB_* settings:
+
+    python scripts/stats_benchmark.py --days 365 --runs 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+import pytz
+
+from config import TIMEZONE
+from services.async_database import adb
+from services.database import db
+from services.stats_service import StatsService
+
+PERIODS = [('24h', 1), ('7 days', 7), ('30 days', 30), ('365 days', 365)]
+
+_SEED_EVENTS = """
+INSERT INTO events (baby_id, event_type, timestamp, amount, notes, created_by)
+SELECT %(baby_id)s, 'bottle_feeding', t, 60 + (random() * 90)::int, NULL, 0
+FROM generate_series(NOW() - %(days)s * INTERVAL '1 day', NOW(), INTERVAL '3 hours') AS t
+UNION ALL
+SELECT %(baby_id)s, 'diaper', t + INTERVAL '1 hour', NULL,
+       (ARRAY['мокрый', 'грязный', 'смешанный'])[1 + floor(random() * 3)::int], 0
+FROM generate_series(NOW() - %(days)s * INTERVAL '1 day', NOW() - INTERVAL '1 hour', INTERVAL '3 hours') AS t
+UNION ALL
+SELECT %(baby_id)s, 'weight', t, 3500 + n * 25, NULL, 0
+FROM generate_series(NOW() - %(days)s * INTERVAL '1 day', NOW(), INTERVAL '1 day') WITH ORDINALITY AS s (t, n)
+"""
+
+# Start and end events plus the completed session, the way a session close writes them
+_SEED_SESSIONS = """
+WITH plan AS MATERIALIZED (
+    SELECT t AS start_time, 20 + (random() * 100)::int AS duration,
+           CASE WHEN %(with_side)s THEN (ARRAY['left', 'right'])[1 + floor(random() * 2)::int] END AS side
+    FROM generate_series(NOW() - %(days)s * INTERVAL '1 day', NOW() - INTERVAL '3 hours', %(every)s::interval) AS t
+),
+starts AS (
+    INSERT INTO events (baby_id, event_type, timestamp, created_by)
+    SELECT %(baby_id)s, %(start_type)s, start_time, 0 FROM plan
+    RETURNING id, timestamp
+),
+ends AS (
+    INSERT INTO events (baby_id, event_type, timestamp, notes, duration, created_by)
+    SELECT %(baby_id)s, %(end_type)s, start_time + duration * INTERVAL '1 minute', side, duration, 0 FROM plan
+    RETURNING id, timestamp, notes, duration
+)
+INSERT INTO sessions (baby_id, kind, start_event_id, end_event_id, start_time, end_time, duration, side, created_by)
+SELECT %(baby_id)s, %(kind)s, starts.id, ends.id, starts.timestamp, ends.timestamp, ends.duration, ends.notes, 0
+FROM starts
+JOIN ends ON ends.timestamp - ends.duration * INTERVAL '1 minute' = starts.timestamp
+"""
+
+
+def ensure_past_partitions(days):
+    """Monthly partitions for the seeded range; months already spilled into events_default are skipped"""
+    months = db.fetch_all("""
+    SELECT generate_series(date_trunc('month', (NOW() - %s * INTERVAL '1 day') AT TIME ZONE 'UTC'),
+                           date_trunc('month', NOW() AT TIME ZONE 'UTC'), INTERVAL '1 month')::date AS month
+    """, (days,))
+    for row in months:
+        try:
+            db.fetch_one("SELECT create_events_partition(%s)", (row['month'],))
+        except psycopg2.Error as e:
+            print(f"Partition for {row['month']:%Y-%m} not created: {str(e).strip()}")
+
+
+def create_baby(days):
+    return db.fetch_one("INSERT INTO babies (name, birth_date, gender) VALUES (%s, %s, %s) RETURNING *",
+                        ('Benchmark', (datetime.now() - timedelta(days=days)).date(), 'unknown'))
+
+
+def seed(baby, days):
+    started = time.perf_counter()
+    ensure_past_partitions(days)
+    db.execute_query(_SEED_EVENTS, {'baby_id': baby['id'], 'days': days})
+    for kind, start_type, end_type, every, with_side in (
+            ('sleep', 'sleep_start', 'sleep_end', '4 hours', False),
+            ('breast_feeding', 'breast_feeding_start', 'breast_feeding_end', '3 hours', True)):
+        db.execute_query(_SEED_SESSIONS, {'baby_id': baby['id'], 'days': days, 'kind': kind, 'every': every,
+                                          'start_type': start_type, 'end_type': end_type, 'with_side': with_side})
+    counts = db.fetch_one("""
+    SELECT (SELECT COUNT(*) FROM events WHERE baby_id = %(id)s) AS events,
+           (SELECT COUNT(*) FROM sessions WHERE baby_id = %(id)s) AS sessions
+    """, {'id': baby['id']})
+    db.execute_query("ANALYZE events")
+    db.execute_query("ANALYZE sessions")
+    print(f"Seeded baby {baby['id']}: {counts['events']} events, {counts['sessions']} sessions "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+def cleanup(baby_id):
+    for table in ('events', 'sessions', 'open_sessions', 'daily_stats', 'reminders'):
+        db.execute_query(f"DELETE FROM {table} WHERE baby_id = %s", (baby_id,))
+    db.execute_query("DELETE FROM babies WHERE id = %s", (baby_id,))
+
+
+async def time_path(add_range, baby, start_time, end_time, runs):
+    timings = []
+    stats = None
+    for _ in range(runs):
+        stats = StatsService._empty_stats(baby, start_time)
+        started = time.perf_counter()
+        await add_range(stats, baby['id'], start_time, end_time)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), stats
+
+
+async def benchmark(baby, runs):
+    await adb.open()
+    try:
+        now = datetime.now(pytz.timezone(TIMEZONE))
+        print(f"{'period':>10}  {'python ms':>10}  {'sql ms':>8}  {'speedup':>8}  same output")
+        for name, days in PERIODS:
+            start_time = now - timedelta(days=days)
+            raw_ms, raw_stats = await time_path(StatsService._add_raw, baby, start_time, now, runs)
+            sql_ms, sql_stats = await time_path(StatsService._add_aggregated, baby, start_time, now, runs)
+            same = StatsService.format_stats(raw_stats) == StatsService.format_stats(sql_stats)
+            print(f"{name:>10}  {raw_ms:>10.2f}  {sql_ms:>8.2f}  {raw_ms / sql_ms:>7.1f}x  {'yes' if same else 'NO'}")
+    finally:
+        await adb.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Python-side against SQL-side stats aggregation")
+    parser.add_argument('--days', type=int, default=365, help="days of history to seed")
+    parser.add_argument('--runs', type=int, default=20, help="timed runs per path and period (median is shown)")
+    parser.add_argument('--keep', action='store_true', help="keep the seeded baby and its data")
+    args = parser.parse_args()
+
+    baby = create_baby(args.days)
+    try:
+        seed(baby, args.days)
+        asyncio.run(benchmark(baby, args.runs))
+    finally:
+        if args.keep:
+            print(f"Kept seeded baby {baby['id']}")
+        else:
+            cleanup(baby['id'])
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Local stand-in for the Telegram Bot API, for measuring update-to-reply latency.
+
+The harness serves the Bot API methods the bot uses, feeds it synthetic updates
+and times each one from delivery to the bot's first reply (answerCallbackQuery
+or sendMessage/editMessageText for that chat). Delivery follows the bot's mode:
+if it registered a webhook the updates are POSTed to it with the secret token,
+if it polls they are handed out through getUpdates. Standard library only.
+
+    python scripts/webhook_harness.py --user-id 123 --count 200
+
+then start the bot against it, e.g. for webhook mode:
+
+    TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot BOT_MODE=webhook \\
+    WEBHOOK_URL=http://127.0.0.1:8443 WEBHOOK_SECRET_TOKEN=secret python main.py
+
+`--user-id` must be in ADMIN_USER_IDS. `--kind menu` taps the main menu button
+(no database work), `--kind start` sends /start (reads the current baby).
+"""
+import argparse
+import json
+import queue
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Harness', 'username': 'harness_bot',
+            'can_join_groups': True, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+
+# Methods that count as "the bot replied"
+REPLY_METHODS = {'answerCallbackQuery', 'sendMessage', 'editMessageText'}
+
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.webhook_url = None
+        self.secret_token = None
+        self.webhook_ready = threading.Event()
+        self.poll_queue = queue.Queue()
+        self.sent_at = {}  # correlation key -> perf_counter when the update was delivered
+        self.latencies = []
+        self.done = threading.Event()
+        self.message_id = 1000
+
+    # Bot API side
+
+    def handle_method(self, method, params):
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'setWebhook':
+            self.webhook_url = params.get('url')
+            self.secret_token = params.get('secret_token')
+            print(f"Bot registered webhook {self.webhook_url}")
+            self.webhook_ready.set()
+            return True
+        if method == 'getUpdates':
+            return self.get_updates(params)
+        if method in REPLY_METHODS:
+            self.record_reply(method, params)
+        if method in ('sendMessage', 'editMessageText'):
+            with self.lock:
+                self.message_id += 1
+                message_id = self.message_id
+            return {'message_id': message_id, 'date': int(time.time()), 'text': params.get('text', ''),
+                    'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'}}
+        return True
+
+    def get_updates(self, params):
+        # Long polling: wait for the first update, then return whatever else is queued
+        timeout = float(params.get('timeout') or 0)
+        updates = []
+        try:
+            updates.append(self.poll_queue.get(timeout=timeout))
+            while True:
+                updates.append(self.poll_queue.get_nowait())
+        except queue.Empty:
+            pass
+        return updates
+
+    def record_reply(self, method, params):
+        key = (f"cb:{params['callback_query_id']}" if method == 'answerCallbackQuery'
+               else f"chat:{params.get('chat_id')}")
+        with self.lock:
+            started = self.sent_at.pop(key, None)
+            if started is None:
+                return
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            if len(self.latencies) >= self.args.count:
+                self.done.set()
+
+    # Synthetic updates
+
+    def make_update(self, n):
+        user = {'id': self.args.user_id, 'is_bot': False, 'first_name': 'Harness'}
+        chat = {'id': self.args.user_id + n, 'type': 'private'}
+        if self.args.kind == 'menu':
+            return {'update_id': n, 'callback_query': {
+                'id': str(n), 'from': user, 'chat_instance': str(n), 'data': 'main_menu',
+                'message': {'message_id': n, 'date': int(time.time()), 'chat': chat, 'from': BOT_USER,
+                            'text': 'Выберите действие:'}}}
+        return {'update_id': n, 'message': {
+            'message_id': n, 'date': int(time.time()), 'chat': chat, 'from': user, 'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}]}}
+
+    @staticmethod
+    def key_for(update):
+        if 'callback_query' in update:
+            return f"cb:{update['callback_query']['id']}"
+        return f"chat:{update['message']['chat']['id']}"
+
+    def post_webhook(self, update):
+        request = urllib.request.Request(self.webhook_url, data=json.dumps(update).encode(), method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        if self.secret_token:
+            request.add_header('X-Telegram-Bot-Api-Secret-Token', self.secret_token)
+        with self.lock:
+            self.sent_at[self.key_for(update)] = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+    def feed(self):
+        # Give the bot a moment to say how it wants its updates
+        webhook = self.webhook_ready.wait(self.args.wait)
+        print(f"Delivering {self.args.count} '{self.args.kind}' updates via {'webhook' if webhook else 'getUpdates'}")
+        for n in range(1, self.args.count + 1):
+            update = self.make_update(n)
+            if webhook:
+                self.post_webhook(update)
+            else:
+                # Timed from when the update exists, so the polling delay is included
+                with self.lock:
+                    self.sent_at[self.key_for(update)] = time.perf_counter()
+                self.poll_queue.put(update)
+            time.sleep(self.args.interval)
+
+    def report(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            print("No replies received")
+            return
+        pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        print(f"replies: {len(latencies)}/{self.args.count}")
+        print(f"latency ms: mean {statistics.mean(latencies):.1f}  p50 {pct(0.5):.1f}  "
+              f"p90 {pct(0.9):.1f}  p99 {pct(0.99):.1f}  max {latencies[-1]:.1f}")
+
+
+def make_api_handler(harness):
+    class BotApiHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            # Paths look like /bot<token>/<method>
+            method = self.path.rstrip('/').rsplit('/', 1)[-1]
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                params = json.loads(body or b'{}')
+            else:
+                params = {key: values[0] for key, values in urllib.parse.parse_qs(body.decode()).items()}
+            payload = json.dumps({'ok': True, 'result': harness.handle_method(method, params)}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return BotApiHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Bot API that measures the bot's update-to-reply latency")
+    parser.add_argument('--port', type=int, default=8081, help="port of the fake Bot API (TELEGRAM_BASE_URL)")
+    parser.add_argument('--user-id', type=int, required=True, help="sender id, must be an admin of the bot")
+    parser.add_argument('--count', type=int, default=100, help="number of updates to send")
+    parser.add_argument('--kind', choices=['menu', 'start'], default='menu', help="kind of synthetic update")
+    parser.add_argument('--interval', type=float, default=0.05, help="seconds between updates")
+    parser.add_argument('--wait', type=float, default=30, help="seconds to wait for the bot to set a webhook")
+    parser.add_argument('--timeout', type=float, default=60, help="seconds to wait for all replies")
+    args = parser.parse_args()
+
+    harness = Harness(args)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_api_handler(harness))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Fake Bot API on http://127.0.0.1:{args.port}/bot - start the bot now")
+
+    try:
+        harness.feed()
+        harness.done.wait(args.timeout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        harness.report()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
 from .database import db
+from .async_database import adb
 
-__all__ = ['db']
\ No newline at end of file
+__all__ = ['db', 'adb']
\ No newline at end of file
@@ -0,0 +1,111 @@
+from contextlib import asynccontextmanager
+from config import DB_CONFIG, DB_ASYNC_MODE
+from services.database import db, ThreadedDatabase
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTransaction:
+    """Query helpers bound to the connection of one ``AsyncDatabase.transaction()``"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def execute_query(self, query, params=None):
+        cur = await self.conn.execute(query, params)
+        return cur.rowcount
+
+    async def fetch_one(self, query, params=None):
+        cur = await self.conn.execute(query, params)
+        return await cur.fetchone()
+
+    async def fetch_all(self, query, params=None):
+        cur = await self.conn.execute(query, params)
+        return await cur.fetchall()
+
+
+class AsyncDatabase:
+    """asyncio counterpart of ``Database`` backed by psycopg 3 and its own pool.
+
+    Queries use the same ``%s`` placeholders as the psycopg2 layer, so SQL can be
+    shared between the sync and async model methods. Rows come back as dicts.
+    """
+
+    def __init__(self):
+        self.db_config = {
+            ('dbname' if key == 'database' else key): value
+            for key, value in DB_CONFIG.items()
+            if key != 'pool' and value is not None
+        }
+        self.pool_config = DB_CONFIG.get('pool', {})
+        self.pool = None
+
+    async def open(self):
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+
+        if self.pool is not None:
+            return
+
+        self.pool = AsyncConnectionPool(
+            kwargs={
+                **self.db_config,
+                'row_factory': dict_row,
+                # pgbouncer in transaction mode does not keep server-side prepared statements
+                'prepare_threshold': None,
+            },
+            min_size=self.pool_config.get('min_size', 1),
+            max_size=self.pool_config.get('max_size', 10),
+            timeout=self.pool_config.get('timeout', 30.0),
+            max_idle=self.pool_config.get('max_idle', 300.0),
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        await self.pool.open()
+        logger.info("Async database pool opened")
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    def get_pool_stats(self):
+        return self.pool.get_stats() if self.pool is not None else {}
+
+    @asynccontextmanager
+    async def get_connection(self):
+        if self.pool is None:
+            raise RuntimeError("Async database pool is not open")
+        try:
+            # The pool commits on success and rolls back on error
+            async with self.pool.connection() as conn:
+                yield conn
+        except Exception as e:
+            logger.error(f"Async database error: {e}")
+            raise
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Run several statements atomically; yields an object with the query helpers"""
+        async with self.get_connection() as conn:
+            yield AsyncTransaction(conn)
+
+    async def execute_query(self, query, params=None):
+        async with self.get_connection() as conn:
+            cur = await conn.execute(query, params)
+            return cur.rowcount
+
+    async def fetch_one(self, query, params=None):
+        async with self.get_connection() as conn:
+            cur = await conn.execute(query, params)
+            return await cur.fetchone()
+
+    async def fetch_all(self, query, params=None):
+        async with self.get_connection() as conn:
+            cur = await conn.execute(query, params)
+            return await cur.fetchall()
+
+
+# 'native' talks to Postgres through psycopg 3; 'threads' offloads the psycopg2 pool
+adb = AsyncDatabase() if DB_ASYNC_MODE == 'native' else ThreadedDatabase(db)
@@ -1,33 +1,249 @@
+import asyncio
+import functools
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
-from contextlib import contextmanager
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from config import DB_CONFIG
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the pool timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections.
+
+    Connections are opened lazily up to ``max_size``; callers block for up to
+    ``timeout`` seconds when the pool is exhausted. Idle connections are
+    health-checked on checkout and broken ones are replaced transparently.
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, timeout=30.0,
+                 max_idle=300.0, health_check_interval=30.0):
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()  # (conn, returned_at)
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def _connect(self):
+        return psycopg2.connect(
+            **self.connect_kwargs,
+            cursor_factory=psycopg2.extras.DictCursor
+        )
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def open(self):
+        """Pre-open ``min_size`` connections"""
+        with self._cond:
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+
+        for _ in range(max(missing, 0)):
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        conn = None
+        returned_at = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                if not waited:
+                    waited = True
+                    self._waits += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No free connection within {self.timeout}s")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, returned_at):
+                self._close_quietly(conn)
+                conn = None
+                with self._cond:
+                    self._reconnects += 1
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return conn
+
+    def putconn(self, conn):
+        if not conn.closed and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._close_quietly(conn)
+
+        now = time.monotonic()
+        to_close = []
+        with self._cond:
+            if conn.closed or self._closed:
+                self._size -= 1
+                to_close.append(conn)
+            else:
+                self._idle.append((conn, now))
+                # Trim connections that sat idle for too long, keeping min_size around
+                while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+                    to_close.append(self._idle.popleft()[0])
+                    self._size -= 1
+            self._cond.notify()
+
+        for stale in to_close:
+            self._close_quietly(stale)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def get_stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'reconnects': self._reconnects,
+                'avg_checkout_ms': round(self._checkout_time_total / self._checkouts * 1000, 2)
+                if self._checkouts else 0.0,
+                'max_checkout_ms': round(self._checkout_time_max * 1000, 2),
+            }
+
+
 class Database:
     def __init__(self):
-        self.db_config = DB_CONFIG
+        self.db_config = {k: v for k, v in DB_CONFIG.items() if k != 'pool'}
+        self.pool_config = DB_CONFIG.get('pool', {})
+        self.pool = ConnectionPool(self.db_config, **self.pool_config)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def open(self):
+        self.pool.open()
+
+    def close(self):
+        self.shutdown_executor()
+        self.pool.close()
+
+    @property
+    def executor(self):
+        # One worker per pooled connection: more threads would only queue on the pool
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool.max_size, thread_name_prefix='db')
+            return self._executor
+
+    def shutdown_executor(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call (usually one of the query helpers) on the DB thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def get_pool_stats(self):
+        return self.pool.get_stats()
 
     @contextmanager
     def get_connection(self):
-        conn = None
+        conn = self.pool.getconn()
         try:
-            conn = psycopg2.connect(
-                **self.db_config,
-                cursor_factory=psycopg2.extras.DictCursor
-            )
             yield conn
         except Exception as e:
             logger.error(f"Database connection error: {e}")
-            if conn:
-                conn.rollback()
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    conn.close()
             raise
         finally:
-            if conn:
-                conn.close()
+            self.pool.putconn(conn)
 
     @contextmanager
     def get_cursor(self, conn):
@@ -37,7 +253,8 @@ class Database:
             yield cur
             conn.commit()
         except Exception as e:
-            conn.rollback()
+            if not conn.closed:
+                conn.rollback()
             logger.error(f"Database cursor error: {e}")
             raise
         finally:
@@ -63,4 +280,77 @@ class Database:
                 return cur.fetchall()
 
 
-db = Database()
\ No newline at end of file
+class ThreadedTransaction:
+    """Query helpers bound to the pinned connection of one ``ThreadedDatabase.transaction()``.
+
+    Statements run on the default executor rather than the database one: they
+    already own a connection, so they must not queue behind workers that are
+    waiting for the pool (which could be waiting for this very connection).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _execute(self, query, params, fetch):
+        with self.conn.cursor() as cur:
+            cur.execute(query, params)
+            if fetch == 'one':
+                return cur.fetchone()
+            if fetch == 'all':
+                return cur.fetchall()
+            return cur.rowcount
+
+    async def execute_query(self, query, params=None):
+        return await asyncio.to_thread(self._execute, query, params, None)
+
+    async def fetch_one(self, query, params=None):
+        return await asyncio.to_thread(self._execute, query, params, 'one')
+
+    async def fetch_all(self, query, params=None):
+        return await asyncio.to_thread(self._execute, query, params, 'all')
+
+
+class ThreadedDatabase:
+    """Awaitable facade over ``Database`` with the same interface as ``AsyncDatabase``.
+
+    Every query runs the existing psycopg2 helpers on the database's bounded
+    thread pool, so the event loop never blocks on a round trip.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    async def open(self):
+        await self.database.run(self.database.open)
+
+    async def close(self):
+        self.database.shutdown_executor()
+
+    def get_pool_stats(self):
+        return self.database.get_pool_stats()
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Run several statements atomically; yields an object with the query helpers"""
+        conn = await self.database.run(self.database.pool.getconn)
+        try:
+            yield ThreadedTransaction(conn)
+            await asyncio.to_thread(conn.commit)
+        except BaseException:
+            if not conn.closed:
+                await asyncio.to_thread(conn.rollback)
+            raise
+        finally:
+            await asyncio.to_thread(self.database.pool.putconn, conn)
+
+    async def execute_query(self, query, params=None):
+        return await self.database.run(self.database.execute_query, query, params)
+
+    async def fetch_one(self, query, params=None):
+        return await self.database.run(self.database.fetch_one, query, params)
+
+    async def fetch_all(self, query, params=None):
+        return await self.database.run(self.database.fetch_all, query, params)
+
+
+db = Database()
@@ -1,4 +1,7 @@
-from services.notification_service import NotificationService
+from services.async_database import adb
+from services.notification_service import NotificationService, outbox
+from services.status_service import StatusService
+from services.stats_cache import stats_cache
 from datetime import datetime, timedelta
 import pytz
 from config import TIMEZONE, FEEDING_INTERVAL_HOURS, REMINDER_MINUTES_BEFORE
@@ -27,8 +30,7 @@ class EventService:
         from models.event import Event
         from models.baby import Baby
 
-        event_id = Event.add(baby_id, Event.SLEEP_START, user_id, timestamp=timestamp)
-        baby = Baby.get_by_id(baby_id)
+        baby = await Baby.get_by_id_async(baby_id)
 
         sleep_text = EventService.get_gender_specific_text(
             baby,
@@ -37,54 +39,63 @@ class EventService:
             "начал(а) спать"
         )
 
-        await NotificationService.notify_group(
-            context,
-            f"😴 {baby['name']} {sleep_text}",
-            user_name,
-            timestamp
-        )
+        event_time = timestamp or datetime.now(pytz.timezone(TIMEZONE))
+        async with adb.transaction() as tx:
+            event_id = await Event.add_async(baby_id, Event.SLEEP_START, user_id, timestamp=event_time, tx=tx)
+            await NotificationService.enqueue(
+                f"😴 {baby['name']} {sleep_text}",
+                user_name,
+                timestamp,
+                baby_id=baby_id,
+                tx=tx
+            )
+        outbox.wake()
+        stats_cache.record_session_start(baby_id, Event.SESSION_SLEEP, event_id, Event.SLEEP_START, event_time)
+        StatusService.request_update(context)
         return event_id
 
     @staticmethod
     async def end_sleep(context, baby_id, user_id, user_name, timestamp=None):
         from models.event import Event
-        from models.baby import Baby
 
-        sleep_start = Event.get_active_sleep(baby_id)
-        if not sleep_start:
-            return None
-
-        start_time = sleep_start['timestamp']
         end_time = timestamp or datetime.now(pytz.timezone(TIMEZONE))
-        duration = int((end_time - start_time).total_seconds() / 60)
-
-        event_id = Event.add(baby_id, Event.SLEEP_END, user_id, duration=duration, timestamp=end_time)
-        baby = Baby.get_by_id(baby_id)
-
-        hours = duration // 60
-        minutes = duration % 60
-        duration_text = f"{hours}ч {minutes}м" if hours > 0 else f"{minutes}м"
-
-        wake_text = EventService.get_gender_specific_text(
-            baby,
-            "проснулся",
-            "проснулась",
-            "проснулся(ась)"
-        )
-
-        sleep_text = EventService.get_gender_specific_text(
-            baby,
-            "Спал",
-            "Спала",
-            "Спал(а)"
-        )
-
-        await NotificationService.notify_group(
-            context,
-            f"😴 {baby['name']} {wake_text}. {sleep_text}: {duration_text}",
-            user_name,
-            end_time
-        )
+        async with adb.transaction() as tx:
+            closed = await Event.close_session_async(baby_id, Event.SESSION_SLEEP, user_id, end_time, tx=tx)
+            if not closed:
+                return None
+
+            event_id = closed['id']
+            duration = closed['duration']
+            baby = closed['baby']
+
+            hours = duration // 60
+            minutes = duration % 60
+            duration_text = f"{hours}ч {minutes}м" if hours > 0 else f"{minutes}м"
+
+            wake_text = EventService.get_gender_specific_text(
+                baby,
+                "проснулся",
+                "проснулась",
+                "проснулся(ась)"
+            )
+
+            sleep_text = EventService.get_gender_specific_text(
+                baby,
+                "Спал",
+                "Спала",
+                "Спал(а)"
+            )
+
+            await NotificationService.enqueue(
+                f"😴 {baby['name']} {wake_text}. {sleep_text}: {duration_text}",
+                user_name,
+                end_time,
+                baby_id=baby_id,
+                tx=tx
+            )
+        outbox.wake()
+        stats_cache.record_session_end(baby_id, Event.SESSION_SLEEP, closed)
+        StatusService.request_update(context)
         return event_id, duration
 
     @staticmethod
@@ -92,8 +103,7 @@ class EventService:
         from models.event import Event
         from models.baby import Baby
 
-        event_id = Event.add(baby_id, Event.BREAST_FEEDING_START, user_id, timestamp=timestamp)
-        baby = Baby.get_by_id(baby_id)
+        baby = await Baby.get_by_id_async(baby_id)
 
         feeding_text = EventService.get_gender_specific_text(
             baby,
@@ -102,45 +112,56 @@ class EventService:
             "Начато грудное кормление"
         )
 
-        await NotificationService.notify_group(
-            context,
-            f"🤱 {feeding_text} {baby['name']}",
-            user_name,
-            timestamp
-        )
+        event_time = timestamp or datetime.now(pytz.timezone(TIMEZONE))
+        async with adb.transaction() as tx:
+            event_id = await Event.add_async(baby_id, Event.BREAST_FEEDING_START, user_id, timestamp=event_time,
+                                             tx=tx)
+            await NotificationService.enqueue(
+                f"🤱 {feeding_text} {baby['name']}",
+                user_name,
+                timestamp,
+                baby_id=baby_id,
+                tx=tx
+            )
+        outbox.wake()
+        stats_cache.record_session_start(baby_id, Event.SESSION_BREAST_FEEDING, event_id, Event.BREAST_FEEDING_START,
+                                         event_time)
+        StatusService.request_update(context)
         return event_id
 
     @staticmethod
     async def end_breast_feeding(context, baby_id, user_id, user_name, breast_side, timestamp=None):
         from models.event import Event
-        from models.baby import Baby
 
-        feeding_start = Event.get_active_breast_feeding(baby_id)
-        if not feeding_start:
-            return None
-
-        start_time = feeding_start['timestamp']
         end_time = timestamp or datetime.now(pytz.timezone(TIMEZONE))
-        duration = int((end_time - start_time).total_seconds() / 60)
-
-        breast_text = "левой" if breast_side == "left" else "правой"
-        event_id = Event.add(baby_id, Event.BREAST_FEEDING_END, user_id,
-                             duration=duration, notes=breast_side, timestamp=end_time)
-        baby = Baby.get_by_id(baby_id)
-
-        feeding_text = EventService.get_gender_specific_text(
-            baby,
-            "Завершено грудное кормление",
-            "Завершено грудное кормление",
-            "Завершено грудное кормление"
-        )
-
-        await NotificationService.notify_group(
-            context,
-            f"🤱 {feeding_text} {baby['name']} ({breast_text} грудью, {duration}м)",
-            user_name,
-            end_time
-        )
+        async with adb.transaction() as tx:
+            closed = await Event.close_session_async(baby_id, Event.SESSION_BREAST_FEEDING, user_id, end_time,
+                                                     notes=breast_side, tx=tx)
+            if not closed:
+                return None
+
+            event_id = closed['id']
+            duration = closed['duration']
+            baby = closed['baby']
+            breast_text = "левой" if breast_side == "left" else "правой"
+
+            feeding_text = EventService.get_gender_specific_text(
+                baby,
+                "Завершено грудное кормление",
+                "Завершено грудное кормление",
+                "Завершено грудное кормление"
+            )
+
+            await NotificationService.enqueue(
+                f"🤱 {feeding_text} {baby['name']} ({breast_text} грудью, {duration}м)",
+                user_name,
+                end_time,
+                baby_id=baby_id,
+                tx=tx
+            )
+        outbox.wake()
+        stats_cache.record_session_end(baby_id, Event.SESSION_BREAST_FEEDING, closed, side=breast_side)
+        StatusService.request_update(context)
         return event_id, duration
 
     @staticmethod
@@ -152,8 +173,7 @@ class EventService:
         if timestamp is None:
             timestamp = datetime.now(pytz.timezone(TIMEZONE))
 
-        event_id = Event.add(baby_id, Event.BOTTLE_FEEDING, user_id, amount=amount, timestamp=timestamp)
-        baby = Baby.get_by_id(baby_id)
+        baby = await Baby.get_by_id_async(baby_id)
 
         feeding_text = EventService.get_gender_specific_text(
             baby,
@@ -162,16 +182,23 @@ class EventService:
             "покормлен(а) смесью"
         )
 
-        await NotificationService.notify_group(
-            context,
-            f"🍼 {baby['name']} {feeding_text}: {amount}мл",
-            user_name,
-            timestamp
-        )
+        async with adb.transaction() as tx:
+            event_id = await Event.add_async(baby_id, Event.BOTTLE_FEEDING, user_id, amount=amount,
+                                             timestamp=timestamp, tx=tx)
+            await NotificationService.enqueue(
+                f"🍼 {baby['name']} {feeding_text}: {amount}мл",
+                user_name,
+                timestamp,
+                baby_id=baby_id,
+                tx=tx
+            )
+        outbox.wake()
+        stats_cache.record_event(baby_id, event_id, Event.BOTTLE_FEEDING, timestamp, amount=amount)
+        StatusService.request_update(context)
 
         # Schedule next feeding reminder
         from services.reminder_service import ReminderService
-        reminder_id = ReminderService.schedule_feeding_reminder(baby_id, timestamp)
+        reminder_id = await ReminderService.schedule_feeding_reminder(context, baby_id, timestamp)
 
         if reminder_id:
             next_reminder_time = timestamp + timedelta(hours=FEEDING_INTERVAL_HOURS) - timedelta(
@@ -185,15 +212,21 @@ class EventService:
         from models.event import Event
         from models.baby import Baby
 
-        event_id = Event.add(baby_id, Event.WEIGHT, user_id, amount=weight, timestamp=timestamp)
-        baby = Baby.get_by_id(baby_id)
-
-        await NotificationService.notify_group(
-            context,
-            f"⚖️ {baby['name']}: {weight}г",
-            user_name,
-            timestamp
-        )
+        baby = await Baby.get_by_id_async(baby_id)
+
+        event_time = timestamp or datetime.now(pytz.timezone(TIMEZONE))
+        async with adb.transaction() as tx:
+            event_id = await Event.add_async(baby_id, Event.WEIGHT, user_id, amount=weight, timestamp=event_time,
+                                             tx=tx)
+            await NotificationService.enqueue(
+                f"⚖️ {baby['name']}: {weight}г",
+                user_name,
+                timestamp,
+                baby_id=baby_id,
+                tx=tx
+            )
+        outbox.wake()
+        stats_cache.record_event(baby_id, event_id, Event.WEIGHT, event_time, amount=weight)
         return event_id
 
     @staticmethod
@@ -201,8 +234,7 @@ class EventService:
         from models.event import Event
         from models.baby import Baby
 
-        event_id = Event.add(baby_id, Event.DIAPER, user_id, notes=diaper_type, timestamp=timestamp)
-        baby = Baby.get_by_id(baby_id)
+        baby = await Baby.get_by_id_async(baby_id)
 
         type_emojis = {
             'wet': '💦',
@@ -223,21 +255,30 @@ class EventService:
             "Смена подгузника"
         )
 
-        await NotificationService.notify_group(
-            context,
-            f"{type_emojis.get(diaper_type, '💩')} {diaper_text} {baby['name']} ({type_names.get(diaper_type, diaper_type)})",
-            user_name,
-            timestamp
-        )
+        event_time = timestamp or datetime.now(pytz.timezone(TIMEZONE))
+        async with adb.transaction() as tx:
+            event_id = await Event.add_async(baby_id, Event.DIAPER, user_id, notes=diaper_type, timestamp=event_time,
+                                             tx=tx)
+            await NotificationService.enqueue(
+                f"{type_emojis.get(diaper_type, '💩')} {diaper_text} {baby['name']} ({type_names.get(diaper_type, diaper_type)})",
+                user_name,
+                timestamp,
+                baby_id=baby_id,
+                tx=tx
+            )
+        outbox.wake()
+        stats_cache.record_event(baby_id, event_id, Event.DIAPER, event_time, notes=diaper_type)
         return event_id
 
     @staticmethod
-    def get_next_feeding_time(baby_id):
-        from models.event import Event
-
-        last_feeding = Event.get_last_by_type(baby_id, Event.BOTTLE_FEEDING)
+    def next_feeding_after(last_feeding):
         if not last_feeding:
             return None
+        return last_feeding['timestamp'] + timedelta(hours=FEEDING_INTERVAL_HOURS)
+
+    @staticmethod
+    async def get_next_feeding_time(baby_id):
+        from models.event import Event
 
-        next_time = last_feeding['timestamp'] + timedelta(hours=FEEDING_INTERVAL_HOURS)
-        return next_time
\ No newline at end of file
+        last_feeding = await Event.get_last_by_type_async(baby_id, Event.BOTTLE_FEEDING)
+        return EventService.next_feeding_after(last_feeding)
\ No newline at end of file
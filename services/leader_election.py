@@ -0,0 +1,134 @@
+import functools
+import psycopg2
+import psycopg2.extras
+from services.database import db
+from config import (LEADER_ELECTION_ENABLED, LEADER_LOCK_KEY, LEADER_CHECK_INTERVAL, LEADER_DB_HOST,
+                    LEADER_DB_PORT)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """One bot instance at a time runs the scheduled jobs.
+
+    Leadership is a session-level advisory lock. It is taken on a dedicated
+    connection opened straight to Postgres (``LEADER_DB_HOST``/``PORT``)
+    rather than a pooled one, because the pool goes through pgbouncer, which
+    would hand the locked server session to other clients. If the leader
+    dies, Postgres drops its session and the lock with it, and a standby
+    picks it up on its next check, within ``check_interval`` seconds.
+    """
+
+    def __init__(self, lock_key=LEADER_LOCK_KEY, check_interval=LEADER_CHECK_INTERVAL,
+                 enabled=LEADER_ELECTION_ENABLED):
+        self.lock_key = lock_key
+        self.check_interval = check_interval
+        self.enabled = enabled
+        self._conn = None
+        self._leading = False
+        self._on_elected = []
+
+    @property
+    def is_leader(self):
+        return not self.enabled or self._leading
+
+    def on_elected(self, callback):
+        """Register ``async callback(context)`` to run each time this instance becomes leader"""
+        self._on_elected.append(callback)
+
+    def gated(self, callback):
+        """Wrap a job callback so it only runs on the leader"""
+        @functools.wraps(callback)
+        async def wrapper(context):
+            if self.is_leader:
+                return await callback(context)
+        return wrapper
+
+    # Blocking helpers, run on the database thread pool
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(**dict(db.db_config, host=LEADER_DB_HOST, port=LEADER_DB_PORT),
+                                          cursor_factory=psycopg2.extras.DictCursor)
+        return self._conn
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.closed:
+            conn.close()
+
+    def _try_acquire(self):
+        conn = self._connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s) AS locked", (self.lock_key,))
+                locked = cur.fetchone()['locked']
+            conn.commit()
+        except psycopg2.Error:
+            self._close()
+            raise
+        self._leading = locked
+        return locked
+
+    def _still_held(self):
+        try:
+            with self._conn.cursor() as cur:
+                cur.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_locks
+                    WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted
+                      AND ((classid::bigint << 32) | objid::bigint) = %s
+                ) AS held
+                """, (self.lock_key,))
+                held = cur.fetchone()['held']
+            self._conn.commit()
+            return held
+        except psycopg2.Error as e:
+            logger.warning(f"Leader connection lost: {e}")
+            return False
+
+    def _release(self, unlock=True):
+        if not self._leading:
+            return
+        self._leading = False
+        if unlock and self._conn is not None and not self._conn.closed:
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (self.lock_key,))
+                self._conn.commit()
+                return
+            except psycopg2.Error:
+                pass
+        # Closing the session is the only sure way to drop the lock
+        self._close()
+
+    # Jobs
+
+    async def check(self, context):
+        """Repeating job: renew leadership, or try to take it over"""
+        if not self.enabled:
+            return
+        try:
+            if self._leading:
+                if await db.run(self._still_held):
+                    return
+                logger.warning("Lost job leadership")
+                await db.run(self._release, False)
+
+            if await db.run(self._try_acquire):
+                logger.info("This instance is now the job leader")
+                for callback in self._on_elected:
+                    await callback(context)
+        except Exception as e:
+            logger.error(f"Error in leader election: {e}")
+
+    async def resign(self):
+        """Give leadership up on shutdown so a standby takes over right away"""
+        if self._leading:
+            await db.run(self._release)
+            logger.info("Resigned job leadership")
+        await db.run(self._close)
+
+
+leader = LeaderElection()
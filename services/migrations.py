@@ -0,0 +1,143 @@
+import os
+import re
+import psycopg2
+import psycopg2.errors
+from services.database import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Files are named NNNN_description.sql and applied in version order
+MIGRATION_FILE_RE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+# A migration containing this line runs outside a transaction, one statement at a
+# time (needed for CREATE INDEX CONCURRENTLY). Such files must not use $$ bodies.
+NO_TRANSACTION_MARKER = '-- migrate: no-transaction'
+
+# Arbitrary key for the advisory lock that serialises concurrent migrators
+MIGRATION_LOCK_KEY = 4201001
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    @property
+    def sql(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    @property
+    def transactional(self):
+        return NO_TRANSACTION_MARKER not in self.sql.splitlines()
+
+    def statements(self):
+        # Drop comment lines so a separator inside a comment cannot split a statement
+        lines = [line for line in self.sql.splitlines() if not line.lstrip().startswith('--')]
+        return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def load_migrations():
+    migrations = []
+    for file_name in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_RE.match(file_name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(MIGRATIONS_DIR, file_name)))
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return migrations
+
+
+def get_current_version():
+    """Single query; 0 when schema_version does not exist yet"""
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+                version = cur.fetchone()['version']
+                conn.commit()
+                return version
+            except psycopg2.errors.UndefinedTable:
+                conn.rollback()
+                return 0
+
+
+def _ensure_version_table():
+    db.execute_query("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def _apply_transactional(migration):
+    with db.get_connection() as conn:
+        with db.get_cursor(conn) as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+            cur.execute("SELECT 1 FROM schema_version WHERE version = %s", (migration.version,))
+            if cur.fetchone():
+                return False
+            cur.execute(migration.sql)
+            cur.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                        (migration.version, migration.name))
+    return True
+
+
+def _apply_non_transactional(migration):
+    with db.get_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                for statement in migration.statements():
+                    cur.execute(statement)
+                cur.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s) "
+                            "ON CONFLICT (version) DO NOTHING", (migration.version, migration.name))
+                return cur.rowcount > 0
+        finally:
+            conn.autocommit = False
+
+
+def migrate(target=None):
+    """Apply pending migrations up to `target` (default: latest). Returns the resulting version."""
+    migrations = load_migrations()
+    latest = target if target is not None else (migrations[-1].version if migrations else 0)
+
+    current = get_current_version()
+    if current >= latest:
+        logger.info(f"Database schema is up to date (version {current})")
+        return current
+
+    _ensure_version_table()
+    for migration in migrations:
+        if migration.version <= current or migration.version > latest:
+            continue
+        logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+        if migration.transactional:
+            applied = _apply_transactional(migration)
+        else:
+            applied = _apply_non_transactional(migration)
+        if not applied:
+            logger.info(f"Migration {migration.version:04d} was already applied by another instance")
+        current = migration.version
+
+    logger.info(f"Database schema migrated to version {current}")
+    return current
+
+
+def get_status():
+    """List of (version, name, applied) for every known migration"""
+    current = get_current_version()
+    applied = set()
+    if current:
+        applied = {row['version'] for row in db.fetch_all("SELECT version FROM schema_version")}
+    return [(migration.version, migration.name, migration.version in applied) for migration in load_migrations()]
@@ -1,36 +1,79 @@
 from config import GROUP_CHAT_ID
+import asyncio
+import time
+from collections import deque
 from datetime import datetime
 import pytz
-from config import TIMEZONE
+from telegram.error import BadRequest, Forbidden, RetryAfter
+from config import (TIMEZONE, OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS, OUTBOX_POLL_INTERVAL,
+                    OUTBOX_RETRY_BASE_SECONDS, OUTBOX_RETRY_MAX_SECONDS, OUTBOX_DRAIN_TIMEOUT,
+                    CHAT_MIN_SEND_INTERVAL, GROUP_MAX_MESSAGES_PER_MINUTE, NOTIFICATION_COALESCE_SECONDS)
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Telegram's limit for a text message, and what goes between merged notifications
+MAX_MESSAGE_LENGTH = 4096
+MESSAGE_SEPARATOR = '\n\n'
+
 
 class NotificationService:
     @staticmethod
     async def notify_group(context, message, user_name=None, timestamp=None):
-        """Send notification to group chat"""
+        """Send notification to group chat; returns whether it was delivered"""
         if not GROUP_CHAT_ID:
             logger.warning("GROUP_CHAT_ID not configured")
-            return
+            return False
 
         try:
-            # Добавляем информацию о пользователе
-            if user_name:
-                message = f"{message} \n👤 {user_name}"
-
-            if timestamp:
-                time_str = timestamp.astimezone(pytz.timezone(TIMEZONE)).strftime('%H:%M')
-                message = f"{message} в {time_str}"
-
+            message = NotificationService.format_message(message, user_name, timestamp)
             await context.bot.send_message(
                 chat_id=GROUP_CHAT_ID,
                 text=message
             )
             logger.info(f"Message sent to group: {message}")
+            return True
         except Exception as e:
             logger.error(f"Failed to send message to group: {e}")
+            return False
+
+    @staticmethod
+    def format_message(message, user_name=None, timestamp=None):
+        # Добавляем информацию о пользователе
+        if user_name:
+            message = f"{message} \n👤 {user_name}"
+
+        if timestamp:
+            time_str = timestamp.astimezone(pytz.timezone(TIMEZONE)).strftime('%H:%M')
+            message = f"{message} в {time_str}"
+        return message
+
+    @staticmethod
+    async def enqueue(message, user_name=None, timestamp=None, baby_id=None, tx=None):
+        """Queue a group notification in the outbox.
+
+        Pass the transaction that records the event as `tx` so the message exists
+        exactly when the event does, then call ``outbox.wake()`` after it commits.
+        """
+        from models.notification import Notification
+
+        if not GROUP_CHAT_ID:
+            logger.warning("GROUP_CHAT_ID not configured")
+            return None
+        return await Notification.enqueue_async(int(GROUP_CHAT_ID), message, user_name, timestamp, baby_id,
+                                                delay=NOTIFICATION_COALESCE_SECONDS, tx=tx)
+
+    @staticmethod
+    async def cleanup_outbox(context):
+        """Daily job: drop delivered notifications older than a week"""
+        from models.notification import Notification
+
+        try:
+            deleted_count = await Notification.delete_old_async(7)
+            if deleted_count > 0:
+                logger.info(f"Cleaned up {deleted_count} sent notifications")
+        except Exception as e:
+            logger.error(f"Error cleaning up notification outbox: {e}")
 
     @staticmethod
     def format_next_feeding(baby, next_time):
@@ -48,4 +91,162 @@ class NotificationService:
         if hours > 0:
             return f"🍼 {baby['name']} - следующее кормление через {hours}ч {minutes}м"
         else:
-            return f"🍼 {baby['name']} - следующее кормление через {minutes}м"
\ No newline at end of file
+            return f"🍼 {baby['name']} - следующее кормление через {minutes}м"
+
+
+class ChatRateLimiter:
+    """Keeps sends within Telegram's limits: one message per second in a chat,
+    and at most ``GROUP_MAX_MESSAGES_PER_MINUTE`` per minute in a group"""
+
+    def __init__(self, min_interval=CHAT_MIN_SEND_INTERVAL, group_per_minute=GROUP_MAX_MESSAGES_PER_MINUTE):
+        self.min_interval = min_interval
+        self.group_per_minute = group_per_minute
+        self._sent = {}  # chat_id -> deque of monotonic send times within the last minute
+        self._blocked_until = {}  # chat_id -> monotonic time set by a RetryAfter
+
+    def delay(self, chat_id):
+        """Seconds to wait before the next message to `chat_id` may go out"""
+        now = time.monotonic()
+        sent = self._sent.setdefault(chat_id, deque())
+        while sent and now - sent[0] >= 60:
+            sent.popleft()
+
+        wait = self._blocked_until.get(chat_id, 0) - now
+        if sent:
+            wait = max(wait, sent[-1] + self.min_interval - now)
+        # Group and supergroup ids are negative
+        if chat_id < 0 and len(sent) >= self.group_per_minute:
+            wait = max(wait, sent[0] + 60 - now)
+        return max(wait, 0)
+
+    def record(self, chat_id):
+        self._sent.setdefault(chat_id, deque()).append(time.monotonic())
+
+    def block(self, chat_id, seconds):
+        self._blocked_until[chat_id] = time.monotonic() + seconds
+
+
+class OutboxSender:
+    """Background task that delivers the notification outbox.
+
+    Messages are claimed in batches (safe with several bot instances), merged
+    per chat and baby within ``NOTIFICATION_COALESCE_SECONDS``, sent in order
+    within the chat limits and retried with exponential backoff. The task
+    wakes up on ``wake()`` and otherwise polls every ``OUTBOX_POLL_INTERVAL``
+    seconds for retries and rows written by other instances.
+    """
+
+    def __init__(self, coalesce_seconds=NOTIFICATION_COALESCE_SECONDS):
+        self.bot = None
+        self.coalesce_seconds = coalesce_seconds
+        self.limiter = ChatRateLimiter()
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def start(self, bot):
+        self.bot = bot
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info("Notification outbox sender started")
+
+    def wake(self):
+        """Call after committing new notifications; they become due after the coalescing window"""
+        if self.coalesce_seconds > 0:
+            asyncio.get_running_loop().call_later(self.coalesce_seconds, self._wakeup.set)
+        else:
+            self._wakeup.set()
+
+    async def stop(self, timeout=OUTBOX_DRAIN_TIMEOUT):
+        """Send what is already due, for up to `timeout` seconds, then stop"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Notification outbox not drained before shutdown; the rest is sent on next start")
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.send_due()
+            except Exception as e:
+                logger.error(f"Error in notification outbox sender: {e}")
+                claimed = 0
+
+            if claimed >= OUTBOX_BATCH_SIZE:
+                continue
+            if self._stopping:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def coalesce(self, rows):
+        """Merge rows (oldest first) for the same chat and baby created within the coalescing window.
+
+        Returns (chat_id, ids, text) per outgoing message, ordered by the first row.
+        Every merged entry keeps its own user name and time.
+        """
+        messages = []
+        open_groups = {}  # (chat_id, baby_id) -> [chat_id, ids, parts, last created_at]
+        for row in rows:
+            key = (row['chat_id'], row['baby_id'])
+            part = NotificationService.format_message(row['text'], row['user_name'], row['event_time'])
+            group = open_groups.get(key)
+            if (group and self.coalesce_seconds > 0
+                    and (row['created_at'] - group[3]).total_seconds() <= self.coalesce_seconds
+                    and len(MESSAGE_SEPARATOR.join(group[2] + [part])) <= MAX_MESSAGE_LENGTH):
+                group[1].append(row['id'])
+                group[2].append(part)
+                group[3] = row['created_at']
+            else:
+                group = [row['chat_id'], [row['id']], [part], row['created_at']]
+                open_groups[key] = group
+                messages.append(group)
+        return [(chat_id, ids, MESSAGE_SEPARATOR.join(parts)) for chat_id, ids, parts, _ in messages]
+
+    async def send_due(self):
+        """Send one claimed batch; returns how many rows were claimed"""
+        from models.notification import Notification
+
+        claimed = await Notification.claim_due_async(OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS)
+        postponed = {}  # chat_id -> seconds, after a RetryAfter the chat's remaining messages wait too
+        for chat_id, ids, text in self.coalesce(claimed):
+            if chat_id in postponed:
+                await Notification.retry_async(ids, postponed[chat_id], 'rate limited')
+                continue
+
+            await asyncio.sleep(self.limiter.delay(chat_id))
+            attempts = max(row['attempts'] for row in claimed if row['id'] in ids)
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+            except RetryAfter as e:
+                retry_after = e.retry_after if isinstance(e.retry_after, (int, float)) \
+                    else e.retry_after.total_seconds()
+                self.limiter.block(chat_id, retry_after)
+                postponed[chat_id] = retry_after
+                await Notification.retry_async(ids, retry_after, str(e))
+            except (BadRequest, Forbidden) as e:
+                # Retrying cannot fix these
+                logger.error(f"Dropping notifications {ids}: {e}")
+                await Notification.give_up_async(ids, OUTBOX_MAX_ATTEMPTS, str(e))
+            except Exception as e:
+                delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+                logger.warning(f"Failed to send notifications {ids} (attempt {attempts}), "
+                               f"retrying in {delay}s: {e}")
+                await Notification.retry_async(ids, delay, str(e))
+            else:
+                self.limiter.record(chat_id)
+                # Marked one message at a time: a throttled batch can outlive its lease
+                await Notification.mark_sent_async(ids)
+                logger.info(f"Message sent to group ({len(ids)} notification(s)): {text}")
+        return len(claimed)
+
+
+outbox = OutboxSender()
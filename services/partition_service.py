@@ -0,0 +1,106 @@
+import gzip
+import os
+import re
+import pytz
+from datetime import date, datetime
+import psycopg2
+from psycopg2 import sql
+from services.database import db
+from config import EVENTS_PARTITIONS_AHEAD, EVENTS_RETENTION_MONTHS, EVENTS_ARCHIVE_DIR
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionService:
+    """Maintenance of the monthly partitions of the events table"""
+
+    PARTITION_NAME_RE = re.compile(r'^events_(\d{4})_(\d{2})$')
+
+    @staticmethod
+    def ensure_partitions(months_ahead=EVENTS_PARTITIONS_AHEAD):
+        """Create the partitions for the current month and `months_ahead` months after it.
+
+        Each month is its own statement: creating a partition fails while
+        events_default holds rows for that month, and that must not keep the
+        other months from being created. Returns the names of the partitions
+        that exist.
+        """
+        today = datetime.now(pytz.utc).date()
+        names = []
+        for n in range(months_ahead + 1):
+            year, month = divmod(today.year * 12 + today.month - 1 + n, 12)
+            first_day = date(year, month + 1, 1)
+            try:
+                names.append(db.fetch_one("SELECT create_events_partition(%s) AS name", (first_day,))['name'])
+            except psycopg2.Error as e:
+                logger.error(f"Could not create the events partition for {first_day:%Y-%m} "
+                             f"(rows for it in events_default?): {str(e).strip()}")
+        return names
+
+    @staticmethod
+    def get_partitions():
+        """Monthly partitions as (name, first day of month), oldest first"""
+        query = """
+        SELECT c.relname AS name FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'events'::regclass
+        """
+        partitions = []
+        for row in db.fetch_all(query):
+            match = PartitionService.PARTITION_NAME_RE.match(row['name'])
+            if match:
+                partitions.append((row['name'], date(int(match.group(1)), int(match.group(2)), 1)))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    @staticmethod
+    def archive_partition(name, output_dir):
+        """Dump a partition to <output_dir>/<name>.csv.gz, then detach and drop it.
+
+        Everything happens in one transaction holding a lock on the partition, so
+        no row can be written between the dump and the drop, and a failed dump
+        leaves the partition attached.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"{name}.csv.gz")
+        tmp_path = path + '.tmp'
+        table = sql.Identifier(name)
+
+        with db.get_connection() as conn:
+            with db.get_cursor(conn) as cur:
+                cur.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(table))
+                with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                    cur.copy_expert(sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(table), f)
+                os.replace(tmp_path, path)
+                cur.execute(sql.SQL("ALTER TABLE events DETACH PARTITION {}").format(table))
+                cur.execute(sql.SQL("DROP TABLE {}").format(table))
+
+        logger.info(f"Archived partition {name} to {path}")
+        return path
+
+    @staticmethod
+    def archive_partitions(older_than_months, output_dir=EVENTS_ARCHIVE_DIR):
+        """Archive every monthly partition that ended more than `older_than_months` months ago"""
+        today = datetime.now(pytz.utc).date()
+        months = today.year * 12 + today.month - 1 - older_than_months
+        cutoff = date(months // 12, months % 12 + 1, 1)
+
+        archived = []
+        for name, month in PartitionService.get_partitions():
+            if month < cutoff:
+                archived.append(PartitionService.archive_partition(name, output_dir))
+        return archived
+
+    @staticmethod
+    async def run_maintenance(context):
+        """Scheduled job: create upcoming partitions and apply the retention policy"""
+        try:
+            created = await db.run(PartitionService.ensure_partitions)
+            logger.info(f"Events partitions ensured: {', '.join(created)}")
+
+            if EVENTS_RETENTION_MONTHS > 0:
+                archived = await db.run(PartitionService.archive_partitions, EVENTS_RETENTION_MONTHS)
+                if archived:
+                    logger.info(f"Archived {len(archived)} old events partition(s)")
+        except Exception as e:
+            logger.error(f"Error in partition maintenance: {e}")
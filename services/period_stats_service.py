@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
+import pytz
+from config import TIMEZONE
+from utils.time_utils import format_duration
+
+
+@lru_cache(maxsize=4096)
+def _local_midnight_epoch(day):
+    # pytz localize is the slowest step for a year-long period, and past days never change
+    return pytz.timezone(TIMEZONE).localize(datetime.combine(day, datetime.min.time())).timestamp()
+
+
+class PeriodStatsService:
+    """Stats for long periods (week, month, all time, a custom range).
+
+    Events and sessions of the period are fetched as a few parallel arrays in
+    one row each and reduced with NumPy: per-day totals via bincount over local
+    day bins, then averages, medians and percentiles of those and of the single
+    feedings and sleeps. A year of history is a few thousand array elements.
+    """
+
+    EVENT_TYPES = ('bottle_feeding', 'diaper', 'weight')
+    BOTTLE, DIAPER, WEIGHT = range(3)
+    SESSION_KINDS = ('sleep', 'breast_feeding')
+    SLEEP, BREAST = range(2)
+    LEFT, RIGHT = 1, 2
+
+    @staticmethod
+    def _day_bounds(start_time, end_time):
+        """Epoch seconds of the local midnights from the day of start_time to the one after end_time"""
+        tz = pytz.timezone(TIMEZONE)
+        day = start_time.astimezone(tz).date()
+        last_day = end_time.astimezone(tz).date()
+        bounds = []
+        while day <= last_day + timedelta(days=1):
+            bounds.append(_local_midnight_epoch(day))
+            day += timedelta(days=1)
+        return np.array(bounds, dtype=np.int64)
+
+    @staticmethod
+    def _per_day(day_index, days, weights=None):
+        return np.bincount(day_index, weights=weights, minlength=days)[:days]
+
+    @staticmethod
+    def get_stats(baby, start_time, end_time, events, sessions):
+        """Reduce the columns of Event/Session.get_columns_async to a dict of numbers"""
+        bounds = PeriodStatsService._day_bounds(start_time, end_time)
+        days = len(bounds) - 1
+        # Days lying entirely inside the period; medians of daily totals use only those
+        full_days = (bounds[:-1] >= start_time.timestamp()) & (bounds[1:] <= end_time.timestamp())
+        period_days = max((end_time - start_time).total_seconds() / 86400, 1 / 24)
+
+        timestamps = np.array(events['timestamps'], dtype=np.int64)
+        types = np.array(events['types'], dtype=np.int8)
+        amounts = np.array(events['amounts'], dtype=np.int64)
+        event_days = np.searchsorted(bounds, timestamps, side='right') - 1
+
+        end_times = np.array(sessions['end_times'], dtype=np.int64)
+        durations = np.array(sessions['durations'], dtype=np.int64)
+        kinds = np.array(sessions['kinds'], dtype=np.int8)
+        sides = np.array(sessions['sides'], dtype=np.int8)
+        session_days = np.searchsorted(bounds, end_times, side='right') - 1
+
+        stats = {'baby': baby, 'start': start_time, 'end': end_time, 'days': period_days,
+                 'full_days': int(full_days.sum())}
+
+        def daily_median(per_day):
+            return float(np.median(per_day[full_days])) if full_days.any() else None
+
+        bottle = types == PeriodStatsService.BOTTLE
+        bottle_ml = amounts[bottle]
+        bottle_ml_per_day = PeriodStatsService._per_day(event_days[bottle], days, bottle_ml)
+        stats['bottle'] = {
+            'count': int(bottle.sum()),
+            'total_ml': int(bottle_ml.sum()),
+            'count_per_day': bottle.sum() / period_days,
+            'ml_per_day': bottle_ml.sum() / period_days,
+            'ml_per_day_median': daily_median(bottle_ml_per_day),
+            'ml_percentiles': np.percentile(bottle_ml, [10, 50, 90]) if bottle_ml.size else None,
+            'interval_median_minutes': (float(np.median(np.diff(timestamps[bottle]))) / 60
+                                        if bottle.sum() > 1 else None),
+        }
+
+        for name, kind in (('sleep', PeriodStatsService.SLEEP), ('breast', PeriodStatsService.BREAST)):
+            mask = kinds == kind
+            minutes = durations[mask]
+            minutes_per_day = PeriodStatsService._per_day(session_days[mask], days, minutes)
+            stats[name] = {
+                'count': int(mask.sum()),
+                'total_minutes': int(minutes.sum()),
+                'count_per_day': mask.sum() / period_days,
+                'minutes_per_day': minutes.sum() / period_days,
+                'minutes_per_day_median': daily_median(minutes_per_day),
+                'duration_percentiles': np.percentile(minutes, [10, 50, 90]) if minutes.size else None,
+            }
+        breast = kinds == PeriodStatsService.BREAST
+        stats['breast']['left'] = int((breast & (sides == PeriodStatsService.LEFT)).sum())
+        stats['breast']['right'] = int((breast & (sides == PeriodStatsService.RIGHT)).sum())
+
+        diaper = types == PeriodStatsService.DIAPER
+        stats['diapers'] = {
+            'count': int(diaper.sum()),
+            'count_per_day': diaper.sum() / period_days,
+            'count_per_day_median': daily_median(PeriodStatsService._per_day(event_days[diaper], days)),
+        }
+
+        weight = (types == PeriodStatsService.WEIGHT) & (amounts > 0)
+        stats['weight'] = None
+        if weight.any():
+            weight_times, weights = timestamps[weight], amounts[weight]
+            stats['weight'] = {'first': int(weights[0]), 'last': int(weights[-1])}
+            span_days = (weight_times[-1] - weight_times[0]) / 86400
+            stats['weight']['gain_per_day'] = (weights[-1] - weights[0]) / span_days if span_days >= 1 else None
+
+        return stats
+
+    @staticmethod
+    async def get_period_stats(baby_id, start_time, end_time):
+        from models.baby import Baby
+        from models.event import Event
+        from models.session import Session
+
+        baby = await Baby.get_by_id_async(baby_id)
+        if not baby:
+            return None
+
+        events = await Event.get_columns_async(baby_id, start_time, end_time, PeriodStatsService.EVENT_TYPES)
+        sessions = await Session.get_columns_async(baby_id, start_time, end_time, PeriodStatsService.SESSION_KINDS)
+        return PeriodStatsService.get_stats(baby, start_time, end_time, events, sessions)
+
+    @staticmethod
+    def _minutes(value):
+        return format_duration(int(round(value)))
+
+    @staticmethod
+    def format_stats(stats):
+        if not stats:
+            return "❌ Не удалось получить статистику"
+
+        tz = pytz.timezone(TIMEZONE)
+        minutes = PeriodStatsService._minutes
+        start = stats['start'].astimezone(tz).strftime('%d.%m.%Y')
+        # A custom range ends at the midnight after its last day
+        end = (stats['end'] - timedelta(seconds=1)).astimezone(tz).strftime('%d.%m.%Y')
+        text = f"📊 Статистика для {stats['baby']['name']}\n\n"
+        text += f"📅 Период: {start} – {end} ({stats['days']:.0f} дн.)\n\n"
+
+        bottle = stats['bottle']
+        text += "🍼 Кормление из бутылочки:\n"
+        if bottle['count']:
+            text += f"  • Всего: {bottle['count']} ({bottle['total_ml']} мл)\n"
+            text += f"  • В среднем за день: {bottle['count_per_day']:.1f} раз, {bottle['ml_per_day']:.0f} мл\n"
+            if bottle['ml_per_day_median'] is not None:
+                text += f"  • Медиана за день: {bottle['ml_per_day_median']:.0f} мл\n"
+            p10, p50, p90 = bottle['ml_percentiles']
+            text += f"  • Объем кормления: медиана {p50:.0f} мл (10–90%: {p10:.0f}–{p90:.0f} мл)\n"
+            if bottle['interval_median_minutes'] is not None:
+                text += f"  • Интервал между кормлениями: медиана {minutes(bottle['interval_median_minutes'])}\n"
+        else:
+            text += "  • Не было кормлений\n"
+
+        text += "\n😴 Сон:\n"
+        sleep = stats['sleep']
+        if sleep['count']:
+            text += f"  • Всего снов: {sleep['count']} ({minutes(sleep['total_minutes'])})\n"
+            text += f"  • В среднем за день: {minutes(sleep['minutes_per_day'])}, {sleep['count_per_day']:.1f} раз\n"
+            if sleep['minutes_per_day_median'] is not None:
+                text += f"  • Медиана за день: {minutes(sleep['minutes_per_day_median'])}\n"
+            p10, p50, p90 = sleep['duration_percentiles']
+            text += f"  • Длительность сна: медиана {minutes(p50)} (10–90%: {minutes(p10)}–{minutes(p90)})\n"
+        else:
+            text += "  • Не было сна\n"
+
+        text += "\n🤱 Грудное кормление:\n"
+        breast = stats['breast']
+        if breast['count']:
+            text += f"  • Всего: {breast['count']} ({minutes(breast['total_minutes'])})\n"
+            text += f"  • В среднем за день: {breast['count_per_day']:.1f} раз, {minutes(breast['minutes_per_day'])}\n"
+            p10, p50, p90 = breast['duration_percentiles']
+            text += f"  • Длительность: медиана {minutes(p50)} (10–90%: {minutes(p10)}–{minutes(p90)})\n"
+            if breast['left'] or breast['right']:
+                text += f"  • Левая грудь: {breast['left']} раз\n"
+                text += f"  • Правая грудь: {breast['right']} раз\n"
+        else:
+            text += "  • Не было кормлений\n"
+
+        diapers = stats['diapers']
+        text += f"\n💩 Подгузники: {diapers['count']} смен, в среднем {diapers['count_per_day']:.1f} в день\n"
+
+        weight = stats['weight']
+        if weight:
+            text += f"⚖️ Вес: {weight['first']}г → {weight['last']}г"
+            if weight['gain_per_day'] is not None:
+                text += f" ({weight['gain_per_day']:+.0f} г/день)"
+            text += "\n"
+
+        return text
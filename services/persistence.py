@@ -0,0 +1,174 @@
+import asyncio
+import json
+from telegram.ext import BasePersistence, PersistenceInput
+from services.async_database import adb
+from utils.serialization import dumps, loads
+from config import PERSISTENCE_UPDATE_INTERVAL, PERSISTENCE_FLUSH_DELAY
+import logging
+
+logger = logging.getLogger(__name__)
+
+USER_DATA = 'user_data'
+CHAT_DATA = 'chat_data'
+BOT_DATA = 'bot_data'
+CALLBACK_DATA = 'callback_data'
+CONVERSATION_PREFIX = 'conversation:'
+
+
+class PostgresPersistence(BasePersistence):
+    """PTB persistence stored in the bot_persistence table.
+
+    ``update_*`` calls only stage a JSON snapshot of the changed entry; staged
+    entries are written in one upsert shortly after PTB's periodic persistence
+    pass (every ``update_interval`` seconds) and on shutdown via ``flush()``.
+    Snapshots identical to what is already stored are not written again.
+    """
+
+    _SELECT_KIND = "SELECT key, data FROM bot_persistence WHERE kind = %s"
+    _UPSERT = """
+    INSERT INTO bot_persistence (kind, key, data)
+    SELECT * FROM unnest(%s::text[], %s::text[], %s::jsonb[])
+    ON CONFLICT (kind, key)
+    DO UPDATE SET data = EXCLUDED.data, updated_at = CURRENT_TIMESTAMP
+    """
+    _DELETE = """
+    DELETE FROM bot_persistence
+    WHERE (kind, key) IN (SELECT * FROM unnest(%s::text[], %s::text[]))
+    """
+
+    def __init__(self, store_data=None, update_interval=PERSISTENCE_UPDATE_INTERVAL,
+                 flush_delay=PERSISTENCE_FLUSH_DELAY):
+        super().__init__(store_data=store_data or PersistenceInput(), update_interval=update_interval)
+        self.flush_delay = flush_delay
+        self._pending = {}  # (kind, key) -> JSON string, or None to delete
+        self._written = {}  # (kind, key) -> JSON string last stored
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._conversations = {}  # name -> {key tuple: state}
+
+    # Loading (called once by Application.initialize, before post_init)
+
+    async def _load(self, kind):
+        # The persistence is initialized before post_init, so the pool may not be open yet
+        await adb.open()
+        rows = await adb.fetch_all(self._SELECT_KIND, (kind,))
+        entries = {}
+        for row in rows:
+            entries[row['key']] = loads(row['data'])
+            self._written[(kind, row['key'])] = dumps(entries[row['key']])
+        return entries
+
+    async def get_user_data(self):
+        return {int(key): data for key, data in (await self._load(USER_DATA)).items()}
+
+    async def get_chat_data(self):
+        return {int(key): data for key, data in (await self._load(CHAT_DATA)).items()}
+
+    async def get_bot_data(self):
+        return (await self._load(BOT_DATA)).get('', {})
+
+    async def get_callback_data(self):
+        data = (await self._load(CALLBACK_DATA)).get('')
+        if data is None:
+            return None
+        # JSON has no tuples: stored as [[uuid, time, {button: data}], ...], {callback: uuid}
+        return [tuple(item) for item in data[0]], data[1]
+
+    async def get_conversations(self, name):
+        if name not in self._conversations:
+            entries = await self._load(CONVERSATION_PREFIX + name)
+            self._conversations[name] = {tuple(json.loads(key)): state for key, state in entries.items()}
+        return dict(self._conversations[name])
+
+    # Staging
+
+    def _stage(self, kind, key, data):
+        snapshot = dumps(data) if data is not None else None
+        if snapshot == self._written.get((kind, key)) and (kind, key) not in self._pending:
+            return
+        self._pending[(kind, key)] = snapshot
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # Let the rest of PTB's persistence pass stage its entries first
+        try:
+            await asyncio.sleep(self.flush_delay)
+        except asyncio.CancelledError:
+            return
+        try:
+            await self._write_pending()
+        except Exception as e:
+            logger.error(f"Error flushing bot persistence: {e}")
+
+    async def update_user_data(self, user_id, data):
+        self._stage(USER_DATA, str(user_id), data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._stage(CHAT_DATA, str(chat_id), data)
+
+    async def update_bot_data(self, data):
+        self._stage(BOT_DATA, '', data)
+
+    async def update_callback_data(self, data):
+        self._stage(CALLBACK_DATA, '', data)
+
+    async def update_conversation(self, name, key, new_state):
+        states = self._conversations.setdefault(name, {})
+        if new_state is None:
+            states.pop(key, None)
+        else:
+            states[key] = new_state
+        self._stage(CONVERSATION_PREFIX + name, json.dumps(list(key)), new_state)
+
+    async def drop_user_data(self, user_id):
+        self._stage(USER_DATA, str(user_id), None)
+
+    async def drop_chat_data(self, chat_id):
+        self._stage(CHAT_DATA, str(chat_id), None)
+
+    # The in-process dicts are the source of truth while the bot runs
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # Writing
+
+    async def _write_pending(self):
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            upserts = [(kind, key, data) for (kind, key), data in pending.items() if data is not None]
+            deletes = [(kind, key) for (kind, key), data in pending.items() if data is None]
+            try:
+                if upserts:
+                    await adb.execute_query(self._UPSERT, tuple(map(list, zip(*upserts))))
+                if deletes:
+                    await adb.execute_query(self._DELETE, tuple(map(list, zip(*deletes))))
+            except Exception:
+                # Keep the entries for the next flush unless they were staged again meanwhile
+                for entry, data in pending.items():
+                    self._pending.setdefault(entry, data)
+                raise
+
+            for entry, data in pending.items():
+                if data is None:
+                    self._written.pop(entry, None)
+                else:
+                    self._written[entry] = data
+            logger.debug(f"Bot persistence flushed: {len(upserts)} upserted, {len(deletes)} deleted")
+
+    async def flush(self):
+        """Called by PTB on shutdown: write everything still staged"""
+        await self._write_pending()
+        # A delayed flush that is still sleeping has nothing left to write
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
@@ -1,21 +1,49 @@
-from services.database import db
+from services.async_database import adb
 from services.notification_service import NotificationService
 from datetime import datetime, timedelta
 import pytz
-from config import TIMEZONE, FEEDING_INTERVAL_HOURS, REMINDER_MINUTES_BEFORE
+from config import (FEEDING_INTERVAL_HOURS, REMINDER_MINUTES_BEFORE, REMINDER_CLAIM_BATCH, REMINDER_MAX_ATTEMPTS,
+                    REMINDER_RETRY_BASE_SECONDS, REMINDER_RETRY_MAX_SECONDS, REMINDER_LEASE_SECONDS)
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class ReminderService:
+    """Reminders are rows in the reminders table, each backed by a run_once job.
+
+    A job only wakes the delivery code at the right moment: what gets sent is
+    decided by the table, so a job left behind by a superseded reminder sends
+    nothing.
+    """
+
+    @staticmethod
+    def _job_name(baby_id, reminder_type):
+        return f"reminder_{baby_id}_{reminder_type}"
+
+    @staticmethod
+    def _schedule_job(job_queue, baby_id, reminder_type, scheduled_time):
+        """Replace the job for (baby, type) with one firing at scheduled_time"""
+        ReminderService._cancel_jobs(job_queue, baby_id, reminder_type)
+        delay = max((scheduled_time - datetime.now(pytz.utc)).total_seconds(), 0)
+        job_queue.run_once(
+            ReminderService.check_and_send_reminders,
+            when=delay,
+            name=ReminderService._job_name(baby_id, reminder_type)
+        )
+
     @staticmethod
-    def schedule_feeding_reminder(baby_id, feeding_time=None):
+    def _cancel_jobs(job_queue, baby_id, reminder_type):
+        for job in job_queue.get_jobs_by_name(ReminderService._job_name(baby_id, reminder_type)):
+            job.schedule_removal()
+
+    @staticmethod
+    async def schedule_feeding_reminder(context, baby_id, feeding_time=None):
         from models.event import Event
         from models.reminder import Reminder
 
         if feeding_time is None:
-            last_feeding = Event.get_last_by_type(baby_id, Event.BOTTLE_FEEDING)
+            last_feeding = await Event.get_last_by_type_async(baby_id, Event.BOTTLE_FEEDING)
             if not last_feeding:
                 logger.info(f"No previous feeding found for baby {baby_id}")
                 return None
@@ -25,59 +53,126 @@ class ReminderService:
             minutes=REMINDER_MINUTES_BEFORE)
         reminder_now_time = feeding_time + timedelta(hours=FEEDING_INTERVAL_HOURS)
 
-        ReminderService.cancel_pending_reminders(baby_id, 'feeding')
-        ReminderService.cancel_pending_reminders(baby_id, 'feeding_now')
+        await ReminderService.cancel_pending_reminders(context, baby_id, 'feeding')
+        await ReminderService.cancel_pending_reminders(context, baby_id, 'feeding_now')
 
-        reminder_id = Reminder.add(baby_id, 'feeding', reminder_time)
+        reminder_id = await Reminder.add_async(baby_id, 'feeding', reminder_time)
+        ReminderService._schedule_job(context.job_queue, baby_id, 'feeding', reminder_time)
         logger.info(f"Scheduled feeding reminder for baby {baby_id} at {reminder_time}")
 
-        Reminder.add(baby_id, 'feeding_now', reminder_now_time)
+        await Reminder.add_async(baby_id, 'feeding_now', reminder_now_time)
+        ReminderService._schedule_job(context.job_queue, baby_id, 'feeding_now', reminder_now_time)
         logger.info(f"Scheduled feeding now reminder for baby {baby_id} at {reminder_now_time}")
         return reminder_id
 
     @staticmethod
-    def cancel_pending_reminders(baby_id, reminder_type=None):
-        from models.reminder import Reminder
-
+    async def cancel_pending_reminders(context, baby_id, reminder_type=None):
         if reminder_type:
             query = "DELETE FROM reminders WHERE baby_id = %s AND reminder_type = %s AND sent = FALSE"
-            db.execute_query(query, (baby_id, reminder_type))
+            await adb.execute_query(query, (baby_id, reminder_type))
+            ReminderService._cancel_jobs(context.job_queue, baby_id, reminder_type)
         else:
             query = "DELETE FROM reminders WHERE baby_id = %s AND sent = FALSE"
-            db.execute_query(query, (baby_id,))
+            await adb.execute_query(query, (baby_id,))
+            prefix = ReminderService._job_name(baby_id, '')
+            for job in context.job_queue.jobs():
+                if job.name and job.name.startswith(prefix):
+                    job.schedule_removal()
+
+    @staticmethod
+    async def restore_reminders(job_queue):
+        """Re-create jobs for every unsent reminder (one query); overdue ones fire right away.
+
+        A reminder still leased by a worker that died fires when its lease runs out.
+        """
+        from models.reminder import Reminder
+
+        reminders = await Reminder.get_unsent_reminders_async()
+        for reminder in reminders:
+            fire_at = max(reminder['scheduled_time'], reminder['claimed_until'] or reminder['scheduled_time'])
+            ReminderService._schedule_job(job_queue, reminder['baby_id'], reminder['reminder_type'], fire_at)
+        logger.info(f"Restored {len(reminders)} pending reminders")
 
     @staticmethod
     async def check_and_send_reminders(context):
+        """Job callback: claim and send every due reminder, batch by batch.
+
+        Claiming leases the rows, so several bot instances can run this at once
+        without duplicates. A reminder is marked sent only once delivered; failed
+        ones are requeued, and any left leased by an error here or a dead
+        process are claimed again when the lease runs out.
+        """
         from models.reminder import Reminder
-        from models.baby import Baby
 
         try:
-            pending_reminders = Reminder.get_pending_reminders()
-            logger.info(f"Found {len(pending_reminders)} pending reminders")
-
-            for reminder in pending_reminders:
-                baby = Baby.get_by_id(reminder['baby_id'])
-                if not baby:
-                    logger.warning(f"Baby {reminder['baby_id']} not found for reminder {reminder['id']}")
-                    continue
-
-                if reminder['reminder_type'] == 'feeding':
-                    await ReminderService.send_feeding_reminder(context, baby, reminder)
-                if reminder['reminder_type'] == 'feeding_now':
-                    await ReminderService.send_feeding_now_reminder(context, baby, reminder)
-
-                Reminder.mark_as_sent(reminder['id'])
-                logger.info(f"Sent and marked reminder {reminder['id']} as sent")
-
-            # Clean up old reminders once a day (check if it's a new hour)
-            now = datetime.now(pytz.timezone(TIMEZONE))
-            if now.minute == 0:
-                deleted_count = Reminder.delete_old_reminders(7)
-                if deleted_count > 0:
-                    logger.info(f"Cleaned up {deleted_count} old reminders")
+            while True:
+                claimed = await Reminder.claim_due_async(REMINDER_CLAIM_BATCH, REMINDER_LEASE_SECONDS)
+                if not claimed:
+                    break
+                logger.info(f"Claimed {len(claimed)} due reminders")
+
+                failed = []
+                for reminder in claimed:
+                    baby = reminder['baby']
+                    if not baby:
+                        logger.warning(f"Baby {reminder['baby_id']} not found for reminder {reminder['id']}")
+                        await Reminder.mark_as_sent_async(reminder['id'])
+                        continue
+
+                    sent = False
+                    if reminder['reminder_type'] == 'feeding':
+                        sent = await ReminderService.send_feeding_reminder(context, baby, reminder)
+                    if reminder['reminder_type'] == 'feeding_now':
+                        sent = await ReminderService.send_feeding_now_reminder(context, baby, reminder)
+
+                    if sent:
+                        # Marked one at a time: a crash mid-batch must not resend the ones delivered
+                        await Reminder.mark_as_sent_async(reminder['id'])
+                        logger.info(f"Sent reminder {reminder['id']}")
+                    else:
+                        failed.append(reminder['id'])
+
+                if failed:
+                    await ReminderService._requeue(context.job_queue, failed)
+                if len(claimed) < REMINDER_CLAIM_BATCH:
+                    break
 
         except Exception as e:
             logger.error(f"Error in check_and_send_reminders: {e}")
+            # Whatever this run still holds becomes claimable when its lease runs out
+            context.job_queue.run_once(
+                ReminderService.check_and_send_reminders,
+                when=REMINDER_LEASE_SECONDS + 1,
+                name="reminder_lease_retry"
+            )
+
+    @staticmethod
+    async def _requeue(job_queue, reminder_ids):
+        from models.reminder import Reminder
+
+        rows = await Reminder.requeue_async(reminder_ids, REMINDER_RETRY_BASE_SECONDS,
+                                            REMINDER_RETRY_MAX_SECONDS, REMINDER_MAX_ATTEMPTS)
+        requeued = [row for row in rows if row['requeued']]
+        for reminder in requeued:
+            job_queue.run_once(
+                ReminderService.check_and_send_reminders,
+                when=max((reminder['scheduled_time'] - datetime.now(pytz.utc)).total_seconds(), 0),
+                name=f"reminder_retry_{reminder['id']}"
+            )
+        dropped = len(reminder_ids) - len(requeued)
+        logger.warning(f"Requeued {len(requeued)} failed reminders, dropped {dropped}")
+
+    @staticmethod
+    async def cleanup_old_reminders(context):
+        """Daily job: drop sent reminders older than a week"""
+        from models.reminder import Reminder
+
+        try:
+            deleted_count = await Reminder.delete_old_reminders_async(7)
+            if deleted_count > 0:
+                logger.info(f"Cleaned up {deleted_count} old reminders")
+        except Exception as e:
+            logger.error(f"Error cleaning up reminders: {e}")
 
     @staticmethod
     async def send_feeding_reminder(context, baby, reminder):
@@ -85,7 +180,7 @@ class ReminderService:
 
         logger.info(f"Sending feeding reminder for {baby['name']}")
 
-        await NotificationService.notify_group(
+        return await NotificationService.notify_group(
             context,
             message
         )
@@ -96,7 +191,7 @@ class ReminderService:
 
         logger.info(f"Sending feeding now reminder for {baby['name']}")
 
-        await NotificationService.notify_group(
+        return await NotificationService.notify_group(
             context,
             message
         )
\ No newline at end of file
@@ -0,0 +1,175 @@
+import time
+from datetime import datetime, timedelta
+import pytz
+from config import TIMEZONE, STATS_CACHE_ENABLED, STATS_CACHE_RECONCILE_INTERVAL
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StatsCache:
+    """Per-baby in-memory copy of the last day of history, for the "today" and "24h" stats.
+
+    Holds the bottle / diaper / weight events and completed sessions of the
+    last ``WINDOW``, the open sessions and the last bottle feeding. It is
+    loaded at startup, updated by EventService after each committed write and
+    reloaded from the database every ``reconcile_interval`` seconds (which
+    picks up writes made by other instances) and just after local midnight.
+    A baby whose copy has not been reconciled for three intervals is served
+    from the database again until the next successful reload.
+    """
+
+    # Longer than any "today" (a day with a DST shift has 25 hours) and than 24h
+    WINDOW = timedelta(hours=26)
+
+    def __init__(self, enabled=STATS_CACHE_ENABLED, reconcile_interval=STATS_CACHE_RECONCILE_INTERVAL):
+        self.enabled = enabled
+        self.reconcile_interval = reconcile_interval
+        self._babies = {}  # baby_id -> {'events', 'sessions', 'open', 'last_bottle', 'synced_at'}
+        self._writes = {}  # baby_id -> number of writes recorded, to detect writes racing a reload
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _now():
+        return datetime.now(pytz.timezone(TIMEZONE))
+
+    async def _load_baby(self, baby_id, now):
+        from models.event import Event
+        from models.session import Session
+
+        since = now - self.WINDOW
+        # Completed sessions are keyed by their end; back-dated ends are fine, future ones are bounded
+        until = now + timedelta(days=1)
+        return {
+            'events': list(await Event.get_since_async(baby_id, since,
+                                                       (Event.BOTTLE_FEEDING, Event.DIAPER, Event.WEIGHT))),
+            'sessions': {
+                kind: list(await Session.get_by_period_async(baby_id, kind, since, until))
+                for kind in Event.SESSION_TYPES
+            },
+            'open': {
+                Event.SESSION_SLEEP: await Event.get_active_sleep_async(baby_id),
+                Event.SESSION_BREAST_FEEDING: await Event.get_active_breast_feeding_async(baby_id),
+            },
+            'last_bottle': await Event.get_last_by_type_async(baby_id, Event.BOTTLE_FEEDING),
+            'synced_at': time.monotonic(),
+        }
+
+    async def load(self):
+        """(Re)load every baby from the database; returns the number of babies loaded"""
+        from models.baby import Baby
+
+        if not self.enabled:
+            return 0
+        now = self._now()
+        loaded = 0
+        for baby in await Baby.get_all_async():
+            baby_id = baby['id']
+            writes = self._writes.get(baby_id, 0)
+            entry = await self._load_baby(baby_id, now)
+            # A write recorded while we were reading may be missing from what we read:
+            # keep the current copy, the next reconcile picks both up
+            if self._writes.get(baby_id, 0) != writes and baby_id in self._babies:
+                continue
+            self._babies[baby_id] = entry
+            loaded += 1
+        return loaded
+
+    async def reconcile(self, context):
+        """Job: reload from the database (runs on every instance, each has its own copy)"""
+        try:
+            loaded = await self.load()
+            logger.debug(f"Stats cache reconciled: {loaded} baby(ies)")
+        except Exception as e:
+            logger.error(f"Error reconciling stats cache: {e}")
+
+    def _entry(self, baby_id):
+        entry = self._babies.get(baby_id)
+        if entry is None or time.monotonic() - entry['synced_at'] > 3 * self.reconcile_interval:
+            return None
+        return entry
+
+    def _prune(self, entry, now):
+        since = now - self.WINDOW
+        entry['events'] = [event for event in entry['events'] if event['timestamp'] >= since]
+        for kind, sessions in entry['sessions'].items():
+            entry['sessions'][kind] = [session for session in sessions if session['end_time'] >= since]
+
+    def _record(self, baby_id):
+        self._writes[baby_id] = self._writes.get(baby_id, 0) + 1
+        return self._babies.get(baby_id)
+
+    # Writes, called by EventService once the transaction has committed
+
+    def record_event(self, baby_id, event_id, event_type, timestamp, amount=None, notes=None):
+        """A bottle feeding, diaper or weight event"""
+        from models.event import Event
+
+        entry = self._record(baby_id)
+        if entry is None:
+            return
+        event = {'id': event_id, 'baby_id': baby_id, 'event_type': event_type, 'timestamp': timestamp,
+                 'amount': amount, 'duration': None, 'notes': notes}
+        entry['events'].append(event)
+        if event_type == Event.BOTTLE_FEEDING and (
+                entry['last_bottle'] is None or timestamp >= entry['last_bottle']['timestamp']):
+            entry['last_bottle'] = event
+        self._prune(entry, self._now())
+
+    def record_session_start(self, baby_id, kind, event_id, event_type, timestamp):
+        entry = self._record(baby_id)
+        if entry is None:
+            return
+        current = entry['open'].get(kind)
+        # Same rule as the open_sessions upsert: a back-dated start never replaces a later one
+        if current is None or current['timestamp'] <= timestamp:
+            entry['open'][kind] = {'id': event_id, 'baby_id': baby_id, 'event_type': event_type,
+                                   'timestamp': timestamp, 'amount': None, 'duration': None, 'notes': None}
+
+    def record_session_end(self, baby_id, kind, closed, side=None):
+        """`closed` is the row returned by Event.close_session_async"""
+        entry = self._record(baby_id)
+        if entry is None:
+            return
+        entry['open'][kind] = None
+        entry['sessions'][kind].append({
+            'baby_id': baby_id, 'kind': kind, 'start_time': closed['start_timestamp'],
+            'end_time': closed['timestamp'], 'duration': closed['duration'], 'side': side,
+        })
+        self._prune(entry, self._now())
+
+    # Reads
+
+    def get(self, baby_id, start_time, now):
+        """The cached history since start_time, shaped like the database reads, or None when not cached.
+
+        Returns {'events', 'sleep_sessions', 'breast_sessions' (newest first),
+        'active_sleep', 'active_breast_feeding', 'last_bottle'}.
+        """
+        from models.event import Event
+
+        entry = self._entry(baby_id) if self.enabled else None
+        if entry is None or start_time < now - self.WINDOW:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        def between(rows, key):
+            return sorted((row for row in rows if start_time <= row[key] < now), key=lambda row: row[key],
+                          reverse=True)
+
+        return {
+            'events': between(entry['events'], 'timestamp'),
+            'sleep_sessions': between(entry['sessions'][Event.SESSION_SLEEP], 'end_time'),
+            'breast_sessions': between(entry['sessions'][Event.SESSION_BREAST_FEEDING], 'end_time'),
+            'active_sleep': entry['open'][Event.SESSION_SLEEP],
+            'active_breast_feeding': entry['open'][Event.SESSION_BREAST_FEEDING],
+            'last_bottle': entry['last_bottle'],
+        }
+
+    def get_stats(self):
+        return {'babies': len(self._babies), 'hits': self.hits, 'misses': self.misses}
+
+
+stats_cache = StatsCache()
@@ -1,33 +1,26 @@
-from services.database import db
 from datetime import datetime, timedelta
 import pytz
-from config import TIMEZONE
+from config import TIMEZONE, STATS_AGGREGATE_IN_SQL
 
 
 class StatsService:
     @staticmethod
-    def get_stats(baby_id, period_hours=None):
-        from models.baby import Baby
-        from models.event import Event
-
-        baby = Baby.get_by_id(baby_id)
-        if not baby:
-            return None
-
-        if period_hours:
-            start_time = datetime.now(pytz.timezone(TIMEZONE)) - timedelta(hours=period_hours)
-        else:
-            today = datetime.now(pytz.timezone(TIMEZONE)).date()
-            start_time = pytz.timezone(TIMEZONE).localize(datetime.combine(today, datetime.min.time()))
+    def _local_midnight(day):
+        return pytz.timezone(TIMEZONE).localize(datetime.combine(day, datetime.min.time()))
 
-        query = """
-        SELECT * FROM events 
-        WHERE baby_id = %s AND timestamp >= %s 
-        ORDER BY timestamp DESC
-        """
-        events = db.fetch_all(query, (baby_id, start_time))
+    @staticmethod
+    def _full_days(start_time, now):
+        """(first, last) local days lying entirely within [start_time, now), or None"""
+        tz = pytz.timezone(TIMEZONE)
+        first_day = start_time.astimezone(tz).date()
+        if StatsService._local_midnight(first_day) < start_time:
+            first_day += timedelta(days=1)
+        last_day = now.astimezone(tz).date() - timedelta(days=1)
+        return (first_day, last_day) if first_day <= last_day else None
 
-        stats = {
+    @staticmethod
+    def _empty_stats(baby, start_time):
+        return {
             'baby': baby,
             'period_start': start_time,
             'total_bottle_ml': 0,
@@ -38,57 +31,79 @@ class StatsService:
             'last_bottle_feeding': None,
             'breast_feeding_sessions': 0,
             'total_breast_feeding_minutes': 0,
+            'breast_left_count': 0,
+            'breast_right_count': 0,
             'diaper_changes': 0,
-            'weight_entries': []
+            'weight_entries': [],
+            'sleep_sessions_list': [],
+            'breast_sessions_list': [],
         }
 
-        sleep_sessions = []
-        breast_sessions = []
-        current_sleep_start = None
-        current_breast_start = None
+    @staticmethod
+    def _keep_latest(current, candidate):
+        if current is None or candidate['timestamp'] > current['timestamp']:
+            return candidate
+        return current
+
+    @staticmethod
+    def _add_rollup(stats, rows):
+        """Fold daily_stats rows into stats"""
+        for row in rows:
+            stats['bottle_feedings'] += row['bottle_feedings']
+            stats['total_bottle_ml'] += row['bottle_ml']
+            if row['last_bottle_at']:
+                stats['last_bottle_feeding'] = StatsService._keep_latest(
+                    stats['last_bottle_feeding'], {'timestamp': row['last_bottle_at'], 'amount': row['last_bottle_ml']})
+
+            stats['sleep_sessions'] += row['sleep_sessions']
+            stats['total_sleep_minutes'] += row['sleep_minutes']
+            if row['last_sleep_end']:
+                stats['last_sleep_end'] = StatsService._keep_latest(
+                    stats['last_sleep_end'], {'timestamp': row['last_sleep_end'], 'duration': row['last_sleep_duration']})
+
+            stats['breast_feeding_sessions'] += row['breast_sessions']
+            stats['total_breast_feeding_minutes'] += row['breast_minutes']
+            stats['breast_left_count'] += row['breast_left']
+            stats['breast_right_count'] += row['breast_right']
+
+            stats['diaper_changes'] += row['diaper_changes']
+            if row['last_weight_at']:
+                stats['weight_entries'].append({'timestamp': row['last_weight_at'], 'amount': row['last_weight']})
+
+    @staticmethod
+    async def _add_aggregated(stats, baby_id, start_time, end_time):
+        """Like _add_raw, but counted by Postgres; leaves the session lists alone"""
+        from models.daily_stats import DailyStats
+
+        StatsService._add_rollup(stats, [await DailyStats.aggregate_range_async(baby_id, start_time, end_time)])
+
+    @staticmethod
+    async def _add_raw(stats, baby_id, start_time, end_time):
+        """Fold the events and completed sessions within [start_time, end_time) into stats"""
+        from models.event import Event
+        from models.session import Session
+
+        # Session start/end events are covered by the sessions and open_sessions tables
+        events = await Event.get_between_async(baby_id, start_time, end_time,
+                                               (Event.BOTTLE_FEEDING, Event.DIAPER, Event.WEIGHT))
+        # Completed sessions are counted by their end, even if they started before the period
+        sleep_sessions = await Session.get_by_period_async(baby_id, Event.SESSION_SLEEP, start_time, end_time)
+        breast_sessions = await Session.get_by_period_async(baby_id, Event.SESSION_BREAST_FEEDING, start_time,
+                                                            end_time)
+        StatsService._fold_rows(stats, events, sleep_sessions, breast_sessions)
+
+    @staticmethod
+    def _fold_rows(stats, events, sleep_sessions, breast_sessions):
+        """Fold event and session rows (newest first) into stats"""
+        from models.event import Event
 
         for event in events:
             event_type = event['event_type']
-            timestamp = event['timestamp']
 
             if event_type == Event.BOTTLE_FEEDING:
                 stats['bottle_feedings'] += 1
                 stats['total_bottle_ml'] += event['amount'] or 0
-                if not stats['last_bottle_feeding']:
-                    stats['last_bottle_feeding'] = event
-
-            elif event_type == Event.SLEEP_START:
-                current_sleep_start = event
-
-            elif event_type == Event.SLEEP_END:
-                if current_sleep_start:
-                    stats['sleep_sessions'] += 1
-                    sleep_duration = event['duration'] or 0
-                    stats['total_sleep_minutes'] += sleep_duration
-                    sleep_sessions.append({
-                        'start': current_sleep_start['timestamp'],
-                        'end': event['timestamp'],
-                        'duration': sleep_duration
-                    })
-                    if not stats['last_sleep_end']:
-                        stats['last_sleep_end'] = event
-                    current_sleep_start = None
-
-            elif event_type == Event.BREAST_FEEDING_START:
-                current_breast_start = event
-
-            elif event_type == Event.BREAST_FEEDING_END:
-                if current_breast_start:
-                    stats['breast_feeding_sessions'] += 1
-                    breast_duration = event['duration'] or 0
-                    stats['total_breast_feeding_minutes'] += breast_duration
-                    breast_sessions.append({
-                        'start': current_breast_start['timestamp'],
-                        'end': event['timestamp'],
-                        'duration': breast_duration,
-                        'breast_side': event['notes']
-                    })
-                    current_breast_start = None
+                stats['last_bottle_feeding'] = StatsService._keep_latest(stats['last_bottle_feeding'], event)
 
             elif event_type == Event.DIAPER:
                 stats['diaper_changes'] += 1
@@ -96,33 +111,104 @@ class StatsService:
             elif event_type == Event.WEIGHT:
                 stats['weight_entries'].append(event)
 
-        if current_sleep_start:
-            active_sleep_duration = int(
-                (datetime.now(pytz.timezone(TIMEZONE)) - current_sleep_start['timestamp']).total_seconds() / 60)
-            stats['sleep_sessions'] += 1
-            stats['total_sleep_minutes'] += active_sleep_duration
-            stats['active_sleep'] = current_sleep_start
+        stats['sleep_sessions'] += len(sleep_sessions)
+        stats['total_sleep_minutes'] += sum(session['duration'] or 0 for session in sleep_sessions)
+        if sleep_sessions:
+            stats['last_sleep_end'] = StatsService._keep_latest(stats['last_sleep_end'], {
+                'timestamp': sleep_sessions[0]['end_time'],
+                'duration': sleep_sessions[0]['duration']
+            })
+
+        stats['breast_feeding_sessions'] += len(breast_sessions)
+        stats['total_breast_feeding_minutes'] += sum(session['duration'] or 0 for session in breast_sessions)
+        stats['breast_left_count'] += sum(1 for session in breast_sessions if session['side'] == 'left')
+        stats['breast_right_count'] += sum(1 for session in breast_sessions if session['side'] == 'right')
+
+        stats['sleep_sessions_list'] += [
+            {'start': session['start_time'], 'end': session['end_time'], 'duration': session['duration'] or 0}
+            for session in sleep_sessions
+        ]
+        stats['breast_sessions_list'] += [
+            {'start': session['start_time'], 'end': session['end_time'], 'duration': session['duration'] or 0,
+             'breast_side': session['side']}
+            for session in breast_sessions
+        ]
 
-        if current_breast_start:
-            active_breast_duration = int(
-                (datetime.now(pytz.timezone(TIMEZONE)) - current_breast_start['timestamp']).total_seconds() / 60)
-            stats['breast_feeding_sessions'] += 1
-            stats['total_breast_feeding_minutes'] += active_breast_duration
-            stats['active_breast_feeding'] = current_breast_start
+    @staticmethod
+    async def get_stats(baby_id, period_hours=None, aggregate_in_sql=STATS_AGGREGATE_IN_SQL):
+        """Stats since local midnight, or for the last `period_hours` hours.
+
+        Whole local days inside the period come from the daily_stats rollup
+        once it has been built, only the partial days at its ends are read
+        from events and sessions: aggregated by Postgres, or with
+        `aggregate_in_sql` off fetched row by row, in which case the session
+        lists cover those partial days.
+        Periods within the last day come from the in-memory stats cache when
+        it holds the baby.
+        """
+        from models.baby import Baby
+        from models.daily_stats import DailyStats
+        from models.event import Event
+        from services.event_service import EventService
+        from services.stats_cache import stats_cache
+
+        baby = await Baby.get_by_id_async(baby_id)
+        if not baby:
+            return None
 
-        sleep_sessions.sort(key=lambda x: x['end'], reverse=True)
-        breast_sessions.sort(key=lambda x: x['end'], reverse=True)
+        now = datetime.now(pytz.timezone(TIMEZONE))
+        if period_hours:
+            start_time = now - timedelta(hours=period_hours)
+        else:
+            start_time = StatsService._local_midnight(now.date())
 
-        stats['sleep_sessions_list'] = sleep_sessions
-        stats['breast_sessions_list'] = breast_sessions
+        stats = StatsService._empty_stats(baby, start_time)
+
+        # Today and 24h are normally answered from memory without any query
+        cached = stats_cache.get(baby_id, start_time, now)
+        if cached:
+            StatsService._fold_rows(stats, cached['events'], cached['sleep_sessions'], cached['breast_sessions'])
+            active_sleep = cached['active_sleep']
+            active_breast_feeding = cached['active_breast_feeding']
+            stats['next_feeding_time'] = EventService.next_feeding_after(cached['last_bottle'])
+        else:
+            full_days = StatsService._full_days(start_time, now)
+            # Before the first full rebuild the rollup lacks older days: count everything from the raw tables
+            if full_days and await DailyStats.is_built_async():
+                first_day, last_day = full_days
+                StatsService._add_rollup(stats, await DailyStats.get_range_async(baby_id, first_day, last_day))
+                raw_ranges = [(start_time, StatsService._local_midnight(first_day)),
+                              (StatsService._local_midnight(last_day + timedelta(days=1)), now)]
+            else:
+                raw_ranges = [(start_time, now)]
+
+            add_range = StatsService._add_aggregated if aggregate_in_sql else StatsService._add_raw
+            for range_start, range_end in raw_ranges:
+                if range_start < range_end:
+                    await add_range(stats, baby_id, range_start, range_end)
+
+            active_sleep = await Event.get_active_sleep_async(baby_id)
+            active_breast_feeding = await Event.get_active_breast_feeding_async(baby_id)
+            stats['next_feeding_time'] = await EventService.get_next_feeding_time(baby_id)
+
+        stats['sleep_sessions_list'].sort(key=lambda session: session['end'], reverse=True)
+        stats['breast_sessions_list'].sort(key=lambda session: session['end'], reverse=True)
+
+        if active_sleep:
+            stats['sleep_sessions'] += 1
+            stats['total_sleep_minutes'] += int((now - active_sleep['timestamp']).total_seconds() / 60)
+            stats['active_sleep'] = active_sleep
+
+        if active_breast_feeding:
+            stats['breast_feeding_sessions'] += 1
+            stats['total_breast_feeding_minutes'] += int(
+                (now - active_breast_feeding['timestamp']).total_seconds() / 60)
+            stats['active_breast_feeding'] = active_breast_feeding
 
         return stats
 
     @staticmethod
     def format_stats(stats):
-        from services.event_service import EventService
-        from models.event import Event
-
         if not stats:
             return "❌ Не удалось получить статистику"
 
@@ -150,7 +236,7 @@ class StatsService:
                 last_time = last_bottle['timestamp'].astimezone(pytz.timezone(TIMEZONE)).strftime('%H:%M')
                 text += f"  • Последнее: {last_time} ({last_bottle['amount']} мл)\n"
 
-            next_time = EventService.get_next_feeding_time(baby['id'])
+            next_time = stats.get('next_feeding_time')
             if next_time:
                 time_left = next_time - datetime.now(pytz.timezone(TIMEZONE))
                 if time_left.total_seconds() > 0:
@@ -209,10 +295,8 @@ class StatsService:
             if stats['breast_feeding_sessions'] > 0:
                 text += f"  • Средняя продолжительность: {stats['total_breast_feeding_minutes'] // stats['breast_feeding_sessions']}м\n"
 
-            left_breast_count = sum(
-                1 for session in stats['breast_sessions_list'] if session.get('breast_side') == 'left')
-            right_breast_count = sum(
-                1 for session in stats['breast_sessions_list'] if session.get('breast_side') == 'right')
+            left_breast_count = stats['breast_left_count']
+            right_breast_count = stats['breast_right_count']
 
             if left_breast_count > 0 or right_breast_count > 0:
                 text += f"  • Левая грудь: {left_breast_count} раз\n"
@@ -0,0 +1,129 @@
+import time
+from collections import deque
+from datetime import datetime
+import pytz
+from telegram.error import BadRequest
+from config import GROUP_CHAT_ID, TIMEZONE, STATUS_MESSAGE_ENABLED, STATUS_MESSAGE_PIN, STATUS_MAX_EDITS_PER_MINUTE
+from utils.time_utils import format_duration
+import logging
+
+logger = logging.getLogger(__name__)
+
+# bot_data key: {str(baby_id): {'chat_id', 'message_id', 'text'}}, saved by the bot persistence
+STATUS_MESSAGES_KEY = 'status_messages'
+
+
+class StatusService:
+    """A pinned message per baby in the group chat, edited in place.
+
+    It shows how long the current sleep / breast feeding has been going and
+    when the next bottle is due. Edits are skipped when the text is unchanged
+    and capped at ``STATUS_MAX_EDITS_PER_MINUTE`` per message.
+    """
+
+    _edits = {}  # baby_id -> deque of monotonic edit times within the last minute
+
+    @staticmethod
+    def build_text(baby, open_sessions, next_feeding_time, now):
+        from models.event import Event
+
+        tz = pytz.timezone(TIMEZONE)
+        lines = [f"📌 {baby['name']}"]
+
+        for session in open_sessions:
+            elapsed = format_duration(int((now - session['started_at']).total_seconds() // 60))
+            since = session['started_at'].astimezone(tz).strftime('%H:%M')
+            if session['kind'] == Event.SESSION_SLEEP:
+                lines.append(f"😴 Спит {elapsed} (с {since})")
+            elif session['kind'] == Event.SESSION_BREAST_FEEDING:
+                lines.append(f"🤱 Грудное кормление {elapsed} (с {since})")
+        if not open_sessions:
+            lines.append("🙂 Не спит")
+
+        if next_feeding_time:
+            minutes_left = int((next_feeding_time - now).total_seconds() // 60)
+            if minutes_left <= 0:
+                lines.append("🍼 Пора кормить смесью!")
+            else:
+                lines.append(f"🍼 Следующее кормление через {format_duration(minutes_left)} "
+                             f"(в {next_feeding_time.astimezone(tz).strftime('%H:%M')})")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _may_edit(baby_id):
+        now = time.monotonic()
+        edits = StatusService._edits.setdefault(baby_id, deque())
+        while edits and now - edits[0] >= 60:
+            edits.popleft()
+        if len(edits) >= STATUS_MAX_EDITS_PER_MINUTE:
+            return False
+        edits.append(now)
+        return True
+
+    @staticmethod
+    async def _create(context, baby_id, text):
+        message = await context.bot.send_message(chat_id=GROUP_CHAT_ID, text=text, disable_notification=True)
+        if STATUS_MESSAGE_PIN:
+            try:
+                await context.bot.pin_chat_message(chat_id=GROUP_CHAT_ID, message_id=message.message_id,
+                                                   disable_notification=True)
+            except BadRequest as e:
+                logger.warning(f"Could not pin status message: {e}")
+        logger.info(f"Created status message {message.message_id} for baby {baby_id}")
+        return {'chat_id': message.chat_id, 'message_id': message.message_id, 'text': text}
+
+    @staticmethod
+    async def _update_one(context, baby, text):
+        messages = context.bot_data.setdefault(STATUS_MESSAGES_KEY, {})
+        key = str(baby['id'])
+        current = messages.get(key)
+
+        if current is None:
+            messages[key] = await StatusService._create(context, baby['id'], text)
+            return
+        if current['text'] == text or not StatusService._may_edit(baby['id']):
+            return
+
+        try:
+            await context.bot.edit_message_text(chat_id=current['chat_id'], message_id=current['message_id'],
+                                                text=text)
+            current['text'] = text
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                current['text'] = text
+            elif 'not found' in str(e).lower():
+                # Someone deleted the message: post a new one
+                messages[key] = await StatusService._create(context, baby['id'], text)
+            else:
+                raise
+
+    @staticmethod
+    async def update_status_messages(context):
+        """Job: refresh the status message of every baby (two queries per run, plus one per baby)"""
+        from models.baby import Baby
+        from models.event import Event
+        from services.event_service import EventService
+
+        if not GROUP_CHAT_ID:
+            return
+        try:
+            now = datetime.now(pytz.utc)
+            babies = await Baby.get_all_async()
+            open_sessions = await Event.get_open_sessions_async()
+            for baby in babies:
+                sessions = [session for session in open_sessions if session['baby_id'] == baby['id']]
+                next_feeding_time = await EventService.get_next_feeding_time(baby['id'])
+                text = StatusService.build_text(baby, sessions, next_feeding_time, now)
+                await StatusService._update_one(context, baby, text)
+        except Exception as e:
+            logger.error(f"Error updating status messages: {e}")
+
+    @staticmethod
+    def request_update(context):
+        """Refresh soon after a session started or ended instead of at the next tick"""
+        from services.leader_election import leader
+
+        if not STATUS_MESSAGE_ENABLED or context.job_queue.get_jobs_by_name('status_refresh'):
+            return
+        context.job_queue.run_once(leader.gated(StatusService.update_status_messages), when=2,
+                                   name='status_refresh')
@@ -0,0 +1,55 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from config import UPDATE_CONCURRENCY, UPDATE_MAX_PENDING
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates of different users concurrently, each user's strictly in order.
+
+    Updates wait on a per-user (or per-chat, when there is no user) lock before
+    taking one of ``concurrency`` processing slots, so a user tapping quickly
+    queues behind themselves without occupying slots other users need.
+    ``max_pending`` bounds how many updates may be in flight at all, queued or
+    running, which is the limit PTB itself enforces.
+    """
+
+    def __init__(self, concurrency=UPDATE_CONCURRENCY, max_pending=UPDATE_MAX_PENDING):
+        super().__init__(max_concurrent_updates=max(max_pending, concurrency))
+        self.concurrency = concurrency
+        self._slots = asyncio.BoundedSemaphore(concurrency)
+        self._locks = {}  # key -> [asyncio.Lock, number of updates holding or waiting for it]
+
+    @staticmethod
+    def _key(update):
+        if isinstance(update, Update):
+            if update.effective_user:
+                return 'user', update.effective_user.id
+            if update.effective_chat:
+                return 'chat', update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self._key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters first-come first-served, which keeps the order
+            async with entry[0]:
+                async with self._slots:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
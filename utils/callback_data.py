@@ -0,0 +1,119 @@
+"""
+callback_data codec for inline keyboard buttons.
+
+Buttons carry "action:arg1:arg2..." built with ``encode``; ``decode`` turns it
+back into (action, [args]) in one pass. Buttons on messages sent before this
+format existed use the old underscore strings ("time_sleep_start_10",
+"breast_left", ...); those are resolved through a prefix trie that always
+takes the longest matching prefix, so "breast_start_menu" can never be read
+as a breast side.
+"""
+
+SEPARATOR = ':'
+MAX_LENGTH = 64  # Telegram's limit for callback_data, in bytes
+
+# Actions
+MAIN_MENU = 'main_menu'
+GENDER = 'gender'
+SLEEP_START_MENU = 'sleep_start_menu'
+SLEEP_END_MENU = 'sleep_end_menu'
+SLEEP_TIME = 'sleep_time'
+BREAST_START_MENU = 'breast_start_menu'
+BREAST_END_MENU = 'breast_end_menu'
+BREAST_TIME = 'breast_time'
+BREAST_SIDE = 'breast_side'
+BOTTLE_FEEDING = 'bottle_feeding'
+BOTTLE_VOLUME = 'bottle_volume'
+BOTTLE_TIME = 'bottle_time'
+NEXT_FEEDING = 'next_feeding'
+STATS = 'stats'
+STATS_PERIOD = 'stats_period'
+WEIGHT = 'weight'
+DIAPER = 'diaper'
+DIAPER_TYPE = 'diaper_type'
+
+ACTIONS = {
+    MAIN_MENU, GENDER, SLEEP_START_MENU, SLEEP_END_MENU, SLEEP_TIME, BREAST_START_MENU, BREAST_END_MENU,
+    BREAST_TIME, BREAST_SIDE, BOTTLE_FEEDING, BOTTLE_VOLUME, BOTTLE_TIME, NEXT_FEEDING, STATS, STATS_PERIOD,
+    WEIGHT, DIAPER, DIAPER_TYPE,
+}
+
+# Old formats: prefix -> (action, fixed args). For prefixes ending in "_" whatever
+# follows is the last argument; the others must match the whole string.
+LEGACY_PREFIXES = {
+    'main_menu': (MAIN_MENU, ()),
+    'gender_': (GENDER, ()),
+    'sleep_start_menu': (SLEEP_START_MENU, ()),
+    'sleep_end_menu': (SLEEP_END_MENU, ()),
+    'time_sleep_start_': (SLEEP_TIME, ('start',)),
+    'time_sleep_end_': (SLEEP_TIME, ('end',)),
+    'breast_start_menu': (BREAST_START_MENU, ()),
+    'breast_end_menu': (BREAST_END_MENU, ()),
+    'time_breast_start_': (BREAST_TIME, ('start',)),
+    'time_breast_end_': (BREAST_TIME, ('end',)),
+    'breast_': (BREAST_SIDE, ()),
+    'bottle_feeding': (BOTTLE_FEEDING, ()),
+    'volume_': (BOTTLE_VOLUME, ()),
+    'time_bottle_feeding_': (BOTTLE_TIME, ()),
+    'next_feeding': (NEXT_FEEDING, ()),
+    'stats': (STATS, ()),
+    'stats_': (STATS_PERIOD, ()),
+    'weight': (WEIGHT, ()),
+    'diaper': (DIAPER, ()),
+    'diaper_': (DIAPER_TYPE, ()),
+}
+
+
+class PrefixTrie:
+    """Character trie answering "which stored prefix is the longest match for this string" """
+
+    _VALUE = object()
+
+    def __init__(self, items=None):
+        self._root = {}
+        for prefix, value in (items or {}).items():
+            self.insert(prefix, value)
+
+    def insert(self, prefix, value):
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self._VALUE] = value
+
+    def longest_match(self, text):
+        """Returns (value, rest of text) for the longest stored prefix of `text`, or (None, text)"""
+        node = self._root
+        match, end = node.get(self._VALUE), 0
+        for i, char in enumerate(text):
+            node = node.get(char)
+            if node is None:
+                break
+            if self._VALUE in node:
+                match, end = node[self._VALUE], i + 1
+        return (match, text[end:]) if match is not None else (None, text)
+
+
+_legacy = PrefixTrie({prefix: (action, args, prefix.endswith('_'))
+                      for prefix, (action, args) in LEGACY_PREFIXES.items()})
+
+
+def encode(action, *args):
+    data = SEPARATOR.join([action, *map(str, args)])
+    if len(data.encode('utf-8')) > MAX_LENGTH:
+        raise ValueError(f"callback_data longer than {MAX_LENGTH} bytes: {data}")
+    return data
+
+
+def decode(data):
+    """Parse callback_data into (action, [args]); raises ValueError for unknown data"""
+    if SEPARATOR in data or data in ACTIONS:
+        action, *args = data.split(SEPARATOR)
+        if action in ACTIONS:
+            return action, args
+        raise ValueError(f"Unknown callback action: {data}")
+
+    match, rest = _legacy.longest_match(data)
+    if match is None or bool(rest) != match[2]:
+        raise ValueError(f"Unknown callback data: {data}")
+    action, fixed_args, _ = match
+    return action, [*fixed_args, rest] if rest else list(fixed_args)
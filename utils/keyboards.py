@@ -1,86 +1,92 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from utils import callback_data as cb
 from utils.time_utils import format_time_with_offset
 
 def main_menu_keyboard():
     keyboard = [
-        [InlineKeyboardButton("😴 Начать сон", callback_data="sleep_start_menu")],
-        [InlineKeyboardButton("🛌 Завершить сон", callback_data="sleep_end_menu")],
-        [InlineKeyboardButton("🤱 Начать кормление грудью", callback_data="breast_start_menu")],
-        [InlineKeyboardButton("✅ Завершить кормление грудью", callback_data="breast_end_menu")],
-        [InlineKeyboardButton("🍼 Кормление из бутылочки", callback_data="bottle_feeding")],
-        [InlineKeyboardButton("💩 Подгузник", callback_data="diaper")],
-        [InlineKeyboardButton("⚖️ Вес", callback_data="weight")],
-        [InlineKeyboardButton("📊 Статистика", callback_data="stats")],
-        [InlineKeyboardButton("⏰ След. кормление", callback_data="next_feeding")]
+        [InlineKeyboardButton("😴 Начать сон", callback_data=cb.encode(cb.SLEEP_START_MENU))],
+        [InlineKeyboardButton("🛌 Завершить сон", callback_data=cb.encode(cb.SLEEP_END_MENU))],
+        [InlineKeyboardButton("🤱 Начать кормление грудью", callback_data=cb.encode(cb.BREAST_START_MENU))],
+        [InlineKeyboardButton("✅ Завершить кормление грудью", callback_data=cb.encode(cb.BREAST_END_MENU))],
+        [InlineKeyboardButton("🍼 Кормление из бутылочки", callback_data=cb.encode(cb.BOTTLE_FEEDING))],
+        [InlineKeyboardButton("💩 Подгузник", callback_data=cb.encode(cb.DIAPER))],
+        [InlineKeyboardButton("⚖️ Вес", callback_data=cb.encode(cb.WEIGHT))],
+        [InlineKeyboardButton("📊 Статистика", callback_data=cb.encode(cb.STATS))],
+        [InlineKeyboardButton("⏰ След. кормление", callback_data=cb.encode(cb.NEXT_FEEDING))]
     ]
     return InlineKeyboardMarkup(keyboard)
 
 def gender_selection_keyboard():
     keyboard = [
         [
-            InlineKeyboardButton("👦 Мальчик", callback_data="gender_male"),
-            InlineKeyboardButton("👧 Девочка", callback_data="gender_female")
+            InlineKeyboardButton("👦 Мальчик", callback_data=cb.encode(cb.GENDER, "male")),
+            InlineKeyboardButton("👧 Девочка", callback_data=cb.encode(cb.GENDER, "female"))
         ]
     ]
     return InlineKeyboardMarkup(keyboard)
 
-def time_selection_keyboard(action):
+def time_selection_keyboard(action, *args):
+    """Time offsets for `action` (a callback_data action); the chosen offset is its last argument"""
     keyboard = [
-        [InlineKeyboardButton(format_time_with_offset(0), callback_data=f"time_{action}_0")],
+        [InlineKeyboardButton(format_time_with_offset(0), callback_data=cb.encode(action, *args, 0))],
         [
-            InlineKeyboardButton(format_time_with_offset(10), callback_data=f"time_{action}_10"),
-            InlineKeyboardButton(format_time_with_offset(20), callback_data=f"time_{action}_20")
+            InlineKeyboardButton(format_time_with_offset(10), callback_data=cb.encode(action, *args, 10)),
+            InlineKeyboardButton(format_time_with_offset(20), callback_data=cb.encode(action, *args, 20))
         ],
         [
-            InlineKeyboardButton(format_time_with_offset(30), callback_data=f"time_{action}_30"),
-            InlineKeyboardButton(format_time_with_offset(40), callback_data=f"time_{action}_40")
+            InlineKeyboardButton(format_time_with_offset(30), callback_data=cb.encode(action, *args, 30)),
+            InlineKeyboardButton(format_time_with_offset(40), callback_data=cb.encode(action, *args, 40))
         ],
-        [InlineKeyboardButton("Свое время", callback_data=f"time_{action}_custom")],
-        [InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")]
+        [InlineKeyboardButton("Свое время", callback_data=cb.encode(action, *args, "custom"))],
+        [InlineKeyboardButton("🔙 Главное меню", callback_data=cb.encode(cb.MAIN_MENU))]
     ]
     return InlineKeyboardMarkup(keyboard)
 
 def bottle_volume_keyboard():
     keyboard = [
         [
-            InlineKeyboardButton("20мл", callback_data="volume_20"),
-            InlineKeyboardButton("30мл", callback_data="volume_30"),
-            InlineKeyboardButton("40мл", callback_data="volume_40")
+            InlineKeyboardButton("20мл", callback_data=cb.encode(cb.BOTTLE_VOLUME, 20)),
+            InlineKeyboardButton("30мл", callback_data=cb.encode(cb.BOTTLE_VOLUME, 30)),
+            InlineKeyboardButton("40мл", callback_data=cb.encode(cb.BOTTLE_VOLUME, 40))
         ],
         [
-            InlineKeyboardButton("50мл", callback_data="volume_50"),
-            InlineKeyboardButton("60мл", callback_data="volume_60"),
-            InlineKeyboardButton("70мл", callback_data="volume_70")
+            InlineKeyboardButton("50мл", callback_data=cb.encode(cb.BOTTLE_VOLUME, 50)),
+            InlineKeyboardButton("60мл", callback_data=cb.encode(cb.BOTTLE_VOLUME, 60)),
+            InlineKeyboardButton("70мл", callback_data=cb.encode(cb.BOTTLE_VOLUME, 70))
         ],
-        [InlineKeyboardButton("Свой объем", callback_data="volume_custom")],
-        [InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")]
+        [InlineKeyboardButton("Свой объем", callback_data=cb.encode(cb.BOTTLE_VOLUME, "custom"))],
+        [InlineKeyboardButton("🔙 Главное меню", callback_data=cb.encode(cb.MAIN_MENU))]
     ]
     return InlineKeyboardMarkup(keyboard)
 
 def breast_side_keyboard():
     keyboard = [
         [
-            InlineKeyboardButton("👈 Левая", callback_data="breast_left"),
-            InlineKeyboardButton("Правая 👉", callback_data="breast_right")
+            InlineKeyboardButton("👈 Левая", callback_data=cb.encode(cb.BREAST_SIDE, "left")),
+            InlineKeyboardButton("Правая 👉", callback_data=cb.encode(cb.BREAST_SIDE, "right"))
         ],
-        [InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")]
+        [InlineKeyboardButton("🔙 Главное меню", callback_data=cb.encode(cb.MAIN_MENU))]
     ]
     return InlineKeyboardMarkup(keyboard)
 
 def diaper_type_keyboard():
     keyboard = [
-        [InlineKeyboardButton("💦 Мокрый", callback_data="diaper_wet")],
-        [InlineKeyboardButton("💩 Грязный", callback_data="diaper_dirty")],
-        [InlineKeyboardButton("💦💩 Смешанный", callback_data="diaper_mixed")],
-        [InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")]
+        [InlineKeyboardButton("💦 Мокрый", callback_data=cb.encode(cb.DIAPER_TYPE, "wet"))],
+        [InlineKeyboardButton("💩 Грязный", callback_data=cb.encode(cb.DIAPER_TYPE, "dirty"))],
+        [InlineKeyboardButton("💦💩 Смешанный", callback_data=cb.encode(cb.DIAPER_TYPE, "mixed"))],
+        [InlineKeyboardButton("🔙 Главное меню", callback_data=cb.encode(cb.MAIN_MENU))]
     ]
     return InlineKeyboardMarkup(keyboard)
 
 def stats_period_keyboard():
     keyboard = [
-        [InlineKeyboardButton("📅 Сегодня", callback_data="stats_today")],
-        [InlineKeyboardButton("📆 Последние 24 часа", callback_data="stats_24h")],
-        [InlineKeyboardButton("🗓️ Последние 3 дня", callback_data="stats_3days")],
-        [InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")]
+        [InlineKeyboardButton("📅 Сегодня", callback_data=cb.encode(cb.STATS_PERIOD, "today"))],
+        [InlineKeyboardButton("📆 Последние 24 часа", callback_data=cb.encode(cb.STATS_PERIOD, "24h"))],
+        [InlineKeyboardButton("🗓️ Последние 3 дня", callback_data=cb.encode(cb.STATS_PERIOD, "3days"))],
+        [InlineKeyboardButton("🗓️ Неделя", callback_data=cb.encode(cb.STATS_PERIOD, "week")),
+         InlineKeyboardButton("🗓️ Месяц", callback_data=cb.encode(cb.STATS_PERIOD, "month"))],
+        [InlineKeyboardButton("📚 Всё время", callback_data=cb.encode(cb.STATS_PERIOD, "all")),
+         InlineKeyboardButton("✏️ Свой период", callback_data=cb.encode(cb.STATS_PERIOD, "custom"))],
+        [InlineKeyboardButton("🔙 Главное меню", callback_data=cb.encode(cb.MAIN_MENU))]
     ]
     return InlineKeyboardMarkup(keyboard)
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+JSON (de)serialization that round-trips dates and datetimes.
+
+Values are tagged as {"__type__": "date" | "datetime", "value": <ISO string>},
+so conversation data stored as JSONB comes back with the same Python types.
+"""
+import json
+from datetime import date, datetime
+
+TYPE_KEY = '__type__'
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {TYPE_KEY: 'datetime', 'value': value.isoformat()}
+    if isinstance(value, date):
+        return {TYPE_KEY: 'date', 'value': value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(obj):
+    value_type = obj.get(TYPE_KEY)
+    if value_type == 'datetime':
+        return datetime.fromisoformat(obj['value'])
+    if value_type == 'date':
+        return date.fromisoformat(obj['value'])
+    return obj
+
+
+def _decode_value(value):
+    # JSONB columns arrive already parsed by the driver
+    if isinstance(value, dict):
+        return _decode_object({key: _decode_value(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    return value
+
+
+def dumps(data):
+    return json.dumps(data, default=_encode)
+
+
+def loads(data):
+    """Decode a JSON string or an already parsed JSON value"""
+    if isinstance(data, (str, bytes)):
+        return json.loads(data, object_hook=_decode_object)
+    return _decode_value(data)
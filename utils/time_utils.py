@@ -20,6 +20,21 @@ def parse_custom_time(time_str):
     return None
 
 
+def parse_date_range(text):
+    """"ДД.ММ.ГГГГ-ДД.ММ.ГГГГ" (or a single date) -> (first_date, last_date), or None"""
+    try:
+        parts = [part.strip() for part in text.replace('–', '-').split('-')]
+        if len(parts) not in (1, 2):
+            return None
+        dates = [datetime.strptime(part, "%d.%m.%Y").date() for part in parts]
+        first_date, last_date = dates[0], dates[-1]
+        if first_date > last_date:
+            return None
+        return first_date, last_date
+    except ValueError:
+        return None
+
+
 def get_time_with_offset(minutes_ago):
     return datetime.now(pytz.timezone(TIMEZONE)) - timedelta(minutes=minutes_ago)
 